@@ -3,6 +3,8 @@ import os
 from pages.ressources.components import Navbar , display_quiz 
 from src.db.utils import QuizDatabase ,CoursesDatabase
 from src.rag import RAGPipeline
+from src.inventory import get_inventory_worker
+from src.telemetry import start_exporter
 from dotenv import find_dotenv, load_dotenv
 st.set_page_config(page_title="WikiLLM", page_icon="📚", layout="wide")
 
@@ -39,12 +41,14 @@ def main():
     db_manager = QuizDatabase()
     db_courses = CoursesDatabase()
     db_rag = QuizDatabase()
+    # Le modèle est choisi par opération par le routeur (src.model_router)
     rag = RAGPipeline(
-        generation_model="mistral-large-latest",
         max_tokens=900,
         temperature=0.5,
         top_n=1,
     )
+    # Service d'arrière-plan qui maintient le stock de questions de chaque chapitre
+    get_inventory_worker()
     # Barre de navigation
     Navbar()
 
@@ -150,30 +154,34 @@ def main():
                     
 
    
-    def get_chapter_summary(rag_chap, chapter: str, course_text: str) -> str:
+    def display_chapter_summary(get_rag_chap, chapter: str, course_text: str) -> str:
         """
-        Récupère le résumé du chapitre depuis le cache de la session.
-        Si le résumé n'est pas présent, il est généré via rag_chap.generate_summary()
-        et stocké dans le cache.
+        Affiche le résumé du chapitre depuis la table chapter_summaries de courses.db,
+        partagée par tous les utilisateurs et conservée entre les redémarrages.
+        Si aucun résumé n'existe pour la version actuelle du contenu, il est généré
+        en streaming via rag_chap.generate_summary_stream(), affiché au fil de l'eau
+        puis enregistré.
         
         Args:
-            rag_chap: Instance de RAGPipeline utilisée pour générer le résumé.
+            get_rag_chap: Fonction retournant l'instance de RAGPipeline utilisée pour générer le résumé.
             chapter (str): Le nom du chapitre.
             course_text (str): Le contenu du cours pour le chapitre donné.
         
         Returns:
-            str: Le résumé généré pour le chapitre.
+            str: Le résumé du chapitre.
         """
-        # Initialisation du cache si nécessaire
-        if "cached_summaries" not in st.session_state:
-            st.session_state.cached_summaries = {}
+        content_hash = db_courses.hash_content(course_text)
+        summary = db_courses.get_summary(chapter, content_hash)
 
-        # Si le résumé pour ce chapitre n'est pas en cache, on le génère et on le stocke
-        if chapter not in st.session_state.cached_summaries:
-            summary = rag_chap.generate_summary(chapitre=chapter, txt=course_text)
-            st.session_state.cached_summaries[chapter] = summary
+        if summary is not None:
+            st.markdown(summary)
+            return summary
 
-        return st.session_state.cached_summaries[chapter]
+        # Le résumé n'est régénéré que si le contenu du chapitre a changé
+        rag_chap = get_rag_chap()
+        summary = st.write_stream(rag_chap.generate_summary_stream(chapitre=chapter, txt=course_text))
+        db_courses.save_summary(chapter, content_hash, summary, model=rag_chap.model)
+        return summary
     
     def load_course_content(course: str):
         """
@@ -206,13 +214,18 @@ def main():
         chapters = load_course_content(st.session_state.selected_course)
 
         if chapters:
-            # Création de l'instance du pipeline
-            rag_chap = RAGPipeline(
-                generation_model="ministral-8b-latest",
-                max_tokens=850,
-                temperature=0.7,
-                top_n=1,
-            )
+            # Le pipeline n'est créé qu'en cas de résumé manquant
+            rag_chap = None
+
+            def get_rag_chap():
+                nonlocal rag_chap
+                if rag_chap is None:
+                    rag_chap = RAGPipeline(
+                        max_tokens=850,
+                        temperature=0.7,
+                        top_n=1,
+                    )
+                return rag_chap
             
             with st.spinner('Chargement des chapitres...'):
                 for chapter in chapters:
@@ -220,9 +233,8 @@ def main():
                         with st.spinner('Chargement du contenu du cours...'):
                             # Récupération du texte du chapitre depuis la base de données
                             course_text = db_courses.get_courses_content_by_chapter(chapter)
-                            # Récupère (et met en cache) le résumé généré pour ce chapitre
-                            summary = get_chapter_summary(rag_chap, chapter, course_text)
-                            st.markdown(summary)
+                        # Affiche le résumé enregistré (ou le génère en streaming) pour ce chapitre
+                        display_chapter_summary(get_rag_chap, chapter, course_text)
         else:
             st.warning("Impossible de charger le contenu du cours.")
         # Appel de la fonction du quiz
@@ -246,4 +258,7 @@ def main():
             display_course_content()
 
 if __name__ == '__main__':
+    # Exposition Prometheus si METRICS_PORT ou METRICS_TEXTFILE est défini (une fois par processus)
+    load_dotenv(find_dotenv())
+    start_exporter()
     main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+# FILE: benchmarks/answer_ingestion_benchmark.py
+"""
+Débit d'enregistrement des réponses aux quiz : une transaction par réponse
+(`QuizDatabase.insert_result`) contre les lots de src.answer_ingestion.
+
+Des sessions simulées (threads) répondent chacune à une série de questions, comme une
+classe en mode speed_test. La base quiz.db est copiée dans un répertoire temporaire ; le
+benchmark affiche les réponses enregistrées par seconde et vérifie qu'aucune n'est perdue.
+
+Exemple :
+    python benchmarks/answer_ingestion_benchmark.py --sessions 30 --answers 200 --synchronous FULL
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(mode: str, db, ingestor, sessions: int, answers: int, question_ids: List[int]) -> Dict[str, Any]:
+    before = db.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def session(user_id: int) -> None:
+        rng = random.Random(user_id)
+        batch = ingestor.batch(db) if mode == "batched" else None
+        record = batch.add if batch is not None else db.insert_result
+        for _ in range(answers):
+            correct = rng.random() < 0.6
+            record(
+                quiz_id=1,
+                user_id=user_id,
+                question_id=rng.choice(question_ids),
+                selected_option=rng.randint(1, 4),
+                is_correct=correct,
+                answer_time=rng.uniform(1, 30),
+                hint_used=rng.random() < 0.1
+            )
+        if batch is not None:
+            batch.flush()  # Fin du quiz
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(session, range(1000, 1000 + sessions)))
+    wall = time.perf_counter() - start
+    written = db.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - before
+    return {"mode": mode, "answers": written, "expected": sessions * answers, "wall_s": wall, "answers_per_s": written / wall}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=30, help="sessions simultanées")
+    parser.add_argument("--answers", type=int, default=200, help="réponses par session")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--max-delay", type=float, default=5.0)
+    parser.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL"], default="NORMAL",
+                        help="PRAGMA synchronous des connexions (FULL : un fsync par commit)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="wikillm-answers-")
+    os.makedirs(os.path.join(workdir, "src", "db"))
+    shutil.copy(os.path.join(ROOT, "src", "db", "quiz.db"), os.path.join(workdir, "src", "db", "quiz.db"))
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from src.answer_ingestion import AnswerIngestor
+    from src.db.utils import QuizDatabase
+    from src.sqlite_connections import get_connection_manager
+
+    get_connection_manager("src/db/quiz.db").options["synchronous"] = args.synchronous
+    db = QuizDatabase()
+    question_ids = [row[0] for row in db.conn.execute("SELECT question_id FROM questions")]
+    ingestor = AnswerIngestor(batch_size=args.batch_size, max_delay=args.max_delay)
+
+    results = [run(mode, db, ingestor, args.sessions, args.answers, question_ids) for mode in ("per-answer", "batched")]
+    ingestor.close()
+
+    print(f"{args.sessions} session(s) x {args.answers} réponses, lots de {args.batch_size}, synchronous={args.synchronous}")
+    header = f"{'mode':<12}{'réponses':>10}{'durée s':>10}{'réponses/s':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lost = f"  ({r['expected'] - r['answers']} perdue(s))" if r["answers"] != r["expected"] else ""
+        print(f"{r['mode']:<12}{r['answers']:>10}{r['wall_s']:>10.2f}{r['answers_per_s']:>12.0f}{lost}")
+    print(f"Gain : x{results[1]['answers_per_s'] / results[0]['answers_per_s']:.1f}")
+    db.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
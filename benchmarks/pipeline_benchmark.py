@@ -0,0 +1,226 @@
+# FILE: benchmarks/pipeline_benchmark.py
+"""
+Benchmark de bout en bout de RAGPipeline avec le fournisseur local (src.fake_llm),
+sans appel réseau ni clé d'API.
+
+Les bases de src/db sont copiées dans un répertoire temporaire : le benchmark n'écrit
+jamais dans les bases du projet. Pour chaque scénario (quiz, résumé, brevet blanc), il
+affiche le débit, les latences p50/p95/p99 et le nombre de tokens par question.
+
+Avec --trace, les spans de src.tracing sont collectés et le temps passé dans chaque
+étape (recherche du contexte, construction du prompt, attente du limiteur, appel au
+modèle, analyse, écriture des métriques, ...) est affiché par scénario.
+
+Exemple :
+    python benchmarks/pipeline_benchmark.py --quiz-runs 20 --summary-runs 20 --brevet-runs 2 --clients 4
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def hashing_encoder(texts: List[str], dim: int = 256) -> np.ndarray:
+    """Encodeur sac-de-mots haché : remplace le modèle d'embeddings, qui nécessite un téléchargement."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r"\w+", text.lower()):
+            vectors[i, hash(word) % dim] += 1.0
+    return vectors
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def stage_breakdown(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Nombre de spans, durée totale et durée moyenne par étape."""
+    stages: Dict[str, Dict[str, float]] = {}
+    for span in spans:
+        stage = stages.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+        stage["count"] += 1
+        stage["total_ms"] += span["duration_ms"] or 0.0
+    for stage in stages.values():
+        stage["mean_ms"] = stage["total_ms"] / stage["count"]
+    return stages
+
+
+def run_scenario(name: str, runs: int, clients: int, job: Callable[[int], int], metrics_db, trace=None) -> Dict[str, Any]:
+    """
+    Exécute `runs` fois `job(i)` (qui retourne le nombre de questions produites) avec
+    `clients` appelants simultanés, et agrège les latences et la consommation de tokens,
+    ainsi que le temps par étape si `trace` (src.tracing.MemoryExporter) est fourni.
+    """
+    metrics_db.flush()
+    first_span = len(trace.spans) if trace is not None else 0
+    first_id = metrics_db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM rag_metrics").fetchone()[0]
+    latencies, items, errors = [], [], []
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            items.append(job(i))
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(timed, range(runs)))
+    wall = time.perf_counter() - start
+
+    # Les métriques sont écrites par lots en arrière-plan
+    metrics_db.flush()
+    tokens, questions, calls = metrics_db.conn.execute("""
+        SELECT COALESCE(SUM(input_tokens + output_tokens), 0), COALESCE(SUM(question_count), 0), COUNT(*)
+        FROM rag_metrics WHERE id > ?
+    """, (first_id,)).fetchone()
+    return {
+        "scenario": name,
+        "runs": runs,
+        "errors": len(errors),
+        "llm_calls": calls,
+        "wall_s": wall,
+        "runs_per_s": len(latencies) / wall if wall else 0.0,
+        "questions_per_s": sum(items) / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "tokens_per_question": tokens / questions if questions else None,
+        "first_errors": errors[:3],
+        "stages": stage_breakdown(trace.spans[first_span:]) if trace is not None else None,
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<10}{'runs':>6}{'err':>5}{'calls':>7}{'runs/s':>9}{'q/s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'tok/q':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        tokens = f"{r['tokens_per_question']:.0f}" if r["tokens_per_question"] else "-"
+        print(
+            f"{r['scenario']:<10}{r['runs']:>6}{r['errors']:>5}{r['llm_calls']:>7}{r['runs_per_s']:>9.2f}"
+            f"{r['questions_per_s']:>8.2f}{r['p50_s']:>8.2f}{r['p95_s']:>8.2f}{r['p99_s']:>8.2f}{tokens:>8}"
+        )
+        for error in r["first_errors"]:
+            print(f"    {error}")
+
+
+def print_stages(results: List[Dict[str, Any]]) -> None:
+    for r in results:
+        if not r["stages"]:
+            continue
+        print()
+        header = f"{r['scenario'] + ' : étape':<24}{'spans':>8}{'total s':>10}{'moy. ms':>10}"
+        print(header)
+        print("-" * len(header))
+        for name, stage in sorted(r["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"{name:<24}{stage['count']:>8}{stage['total_ms'] / 1000:>10.2f}{stage['mean_ms']:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quiz-runs", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=10, help="questions par quiz")
+    parser.add_argument("--batch-size", type=int, default=5, help="questions par appel")
+    parser.add_argument("--summary-runs", type=int, default=10)
+    parser.add_argument("--brevet-runs", type=int, default=1)
+    parser.add_argument("--brevet-bank", choices=["empty", "full"], default="empty",
+                        help="vider la banque de questions avant chaque brevet (génération complète)")
+    parser.add_argument("--clients", type=int, default=1, help="appelants simultanés")
+    parser.add_argument("--ttft-median", type=float, default=0.4)
+    parser.add_argument("--ttft-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=150.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=float, default=10_000)
+    parser.add_argument("--tokens-per-minute", type=float, default=10_000_000)
+    parser.add_argument("--encoder", choices=["hashing", "model"], default="hashing",
+                        help="'model' utilise le modèle sentence-transformers (téléchargement requis)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", action="store_true", help="afficher le temps passé dans chaque étape")
+    parser.add_argument("--json", help="fichier où écrire les résultats")
+    args = parser.parse_args()
+
+    # Copie des bases : les chemins relatifs du projet (src/db/...) pointent vers la copie
+    workdir = tempfile.mkdtemp(prefix="wikillm-bench-")
+    shutil.copytree(os.path.join(ROOT, "src", "db"), os.path.join(workdir, "src", "db"),
+                    ignore=shutil.ignore_patterns("llm_cache.db", "rate_limit.db", "*.npz"))
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from src.fake_llm import FakeLLMProvider
+    from src.rag import RAGPipeline
+    from src.rate_limiter import RateLimiter
+    from src.retrieval import EmbeddingIndex
+    from src.tracing import TRACER, MemoryExporter
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    provider = FakeLLMProvider(
+        ttft_median=args.ttft_median,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    index = EmbeddingIndex(encoder=hashing_encoder, cache_path=None) if args.encoder == "hashing" else None
+    rag = RAGPipeline(
+        max_tokens=900,
+        provider=provider,
+        index=index,
+        cached_operations=(),
+        limiter=RateLimiter(requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute),
+    )
+    rag.index  # Construction de l'index hors mesure
+    trace = None
+    if args.trace:
+        trace = MemoryExporter()
+        TRACER.add_exporter(trace)
+
+    themes = rag.coursesdb.get_themes()
+    chapters = [c for theme in themes for c in rag.coursesdb.get_all_chapters_by_theme(theme)]
+
+    def quiz(i: int) -> int:
+        return len(rag.generate_quizz_questions(random.choice(themes), nbr_questions=args.questions, batch_size=args.batch_size))
+
+    def summary(i: int) -> int:
+        rag.generate_summary(random.choice(chapters))
+        return 0
+
+    def brevet(i: int) -> int:
+        if args.brevet_bank == "empty":
+            rag.quizdb.conn.execute("DELETE FROM questions")
+            rag.quizdb.conn.commit()
+        return sum(len(questions) for questions in rag.generate_brevet_quiz().values())
+
+    results = []
+    for name, runs, job in (("quiz", args.quiz_runs, quiz), ("summary", args.summary_runs, summary), ("brevet", args.brevet_runs, brevet)):
+        if runs > 0:
+            # Le brevet vide la banque : ses exécutions ne sont pas lancées en parallèle
+            clients = 1 if name == "brevet" else args.clients
+            results.append(run_scenario(name, runs, clients, job, rag.metrics_db, trace))
+
+    print()
+    print(f"Fournisseur local : ttft médian {args.ttft_median}s, {args.tokens_per_second} tokens/s, "
+          f"{args.error_rate:.0%} d'erreurs, {args.clients} client(s)")
+    print_report(results)
+    print_stages(results)
+    if args.json:
+        with open(os.path.join(ROOT, args.json) if not os.path.isabs(args.json) else args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
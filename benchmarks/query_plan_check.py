@@ -0,0 +1,177 @@
+# FILE: benchmarks/query_plan_check.py
+"""
+Vérification des plans d'exécution des requêtes de src/db/utils.py.
+
+Chaque requête SQL passée à `execute` / `executemany` dans CoursesDatabase et
+QuizDatabase est extraite du code source (les f-strings reçoivent une valeur
+représentative, voir SUBSTITUTIONS), puis passée à `EXPLAIN QUERY PLAN` sur une copie
+des bases de src/db, migrations appliquées. Toute lecture complète d'une table
+(`SCAN table`, sans index) est signalée, sauf celles d'EXPECTED_SCANS : agrégats sur
+toute la table, pour lesquels un index n'apporterait rien. Les statistiques d'ANALYZE
+de la copie sont effacées : les plans sont ceux de tables volumineuses, et non ceux que
+le planificateur choisit pour les quelques lignes des bases du dépôt.
+
+Le script se termine en erreur si une lecture complète inattendue ou une requête
+invalide est trouvée, pour repérer une requête ajoutée sans index.
+
+Exemple :
+    python benchmarks/query_plan_check.py --verbose
+"""
+import argparse
+import ast
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "src", "db", "utils.py")
+# Classe -> base interrogée
+DATABASES = {"CoursesDatabase": "courses.db", "QuizDatabase": "quiz.db"}
+# (méthode, expression) -> valeur utilisée pour les parties dynamiques des f-strings
+SUBSTITUTIONS = {
+    ("get_average_answer_time", "condition"): "WHERE is_correct = 1",
+    ("_select_chunks", "condition"): "WHERE course_info.chapitre = ?",
+    ("get_taux_reussite_topics_user", "topics"): "subject",
+    ("get_questions_by_ids", "placeholders"): "?, ?, ?",
+}
+# Méthode -> tables dont la lecture complète est attendue, et pourquoi
+EXPECTED_SCANS = {
+    "sync_chunks": ({"course_info"}, "découpage de tous les cours"),
+    "clean_database": ({"users"}, "suppression de tous les utilisateurs sauf root"),
+    "get_total_users": ({"users"}, "comptage des utilisateurs"),
+    "get_questions_metrics": ({"questions"}, "agrégat par question sur toutes les réponses"),
+    "get_users_metrics_by_chapter": ({"users"}, "agrégat par utilisateur"),
+}
+# Méthodes dont la requête est invalide sur le schéma actuel (non utilisées par l'application)
+KNOWN_INVALID = {
+    "get_users_data": "quizzes n'a pas de colonne user_id",
+    "get_user_success_rates": "quizzes n'a pas de colonne user_id",
+}
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?!\w| USING)")
+
+
+def render(node: ast.AST, method: str) -> Optional[str]:
+    """Texte SQL d'une constante ou d'une f-string, None si l'argument n'est pas du SQL littéral."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            else:
+                expression = ast.unparse(value.value)
+                if (method, expression) not in SUBSTITUTIONS:
+                    raise KeyError(f"{method} : pas de valeur pour {{{expression}}} dans SUBSTITUTIONS")
+                parts.append(SUBSTITUTIONS[(method, expression)])
+        return "".join(parts)
+    return None
+
+
+def extract_queries(path: str) -> List[Tuple[str, str, int, str]]:
+    """Retourne (classe, méthode, ligne, requête) pour chaque requête des classes d'accès aux bases."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    queries = []
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef) or cls.name not in DATABASES:
+            continue
+        for method in cls.body:
+            if not isinstance(method, ast.FunctionDef):
+                continue
+            # Requêtes construites dans une variable avant l'appel (query = f"...")
+            assigned = {}
+            for node in ast.walk(method):
+                if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                    assigned[node.targets[0].id] = node.value
+            for node in ast.walk(method):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in ("execute", "executemany") and node.args):
+                    continue
+                argument = node.args[0]
+                if isinstance(argument, ast.Name):
+                    argument = assigned.get(argument.id, argument)
+                sql = render(argument, method.name)
+                if sql is not None:
+                    queries.append((cls.name, method.name, node.lineno, sql))
+    return sorted(queries, key=lambda query: query[2])
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> List[str]:
+    names = re.findall(r":(\w+)", sql)
+    parameters = {name: None for name in names} if names else (None,) * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+
+
+def forget_statistics(conn: sqlite3.Connection) -> None:
+    """Efface les statistiques d'ANALYZE : le planificateur suppose alors de grandes tables."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+        conn.execute("DELETE FROM sqlite_stat1")
+        conn.commit()
+        conn.execute("ANALYZE sqlite_schema")
+
+
+def check(connections: Dict[str, sqlite3.Connection], verbose: bool) -> int:
+    problems = 0
+    for cls, method, line, sql in extract_queries(SOURCE):
+        statement = " ".join(sql.split())
+        if re.match(r"(CREATE|ALTER|PRAGMA|DROP)\b", statement, re.IGNORECASE):
+            continue
+        if method in KNOWN_INVALID:
+            if verbose:
+                print(f"{'ignorée':<10}{cls}.{method} (ligne {line}) [{KNOWN_INVALID[method]}]")
+            continue
+        try:
+            plan = query_plan(connections[DATABASES[cls]], statement)
+        except sqlite3.Error as e:
+            problems += 1
+            print(f"ERREUR    {cls}.{method} (ligne {line}) : {e}\n          {statement[:160]}")
+            continue
+        scanned = {match.group(1) for step in plan for match in [FULL_SCAN.match(step)] if match}
+        expected, reason = EXPECTED_SCANS.get(method, (set(), ""))
+        unexpected = scanned - expected
+        if unexpected:
+            problems += 1
+            status = "SCAN"
+        else:
+            status = "ok"
+        if unexpected or verbose:
+            note = f" [{reason}]" if scanned and not unexpected else ""
+            print(f"{status:<10}{cls}.{method} (ligne {line}){note}")
+            print(f"          {statement[:160]}")
+            for step in plan:
+                print(f"            {step}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="afficher le plan de toutes les requêtes")
+    args = parser.parse_args()
+
+    # Copie des bases : les migrations s'appliquent à la copie, jamais aux bases du projet
+    workdir = tempfile.mkdtemp(prefix="wikillm-plans-")
+    shutil.copytree(os.path.join(ROOT, "src", "db"), os.path.join(workdir, "src", "db"),
+                    ignore=shutil.ignore_patterns("llm_cache.db", "rate_limit.db", "*.npz", "*.py", "__pycache__"))
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from src.db.utils import CoursesDatabase, QuizDatabase
+
+    databases = {"courses.db": CoursesDatabase(), "quiz.db": QuizDatabase()}
+    for db in databases.values():
+        forget_statistics(db.conn)
+    problems = check({name: db.conn for name, db in databases.items()}, args.verbose)
+    shutil.rmtree(workdir, ignore_errors=True)
+    if problems:
+        print(f"\n{problems} requête(s) à revoir.")
+        sys.exit(1)
+    print("Aucune lecture complète inattendue.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# FILE: benchmarks/startup_benchmark.py
+"""
+Temps de démarrage à froid des pages Streamlit, mesuré avec `python -X importtime`.
+
+Pour chaque page, les imports de premier niveau du script sont rejoués dans un
+interpréteur neuf. Le benchmark affiche le temps d'import cumulé (médiane sur
+plusieurs exécutions) et les modules les plus coûteux. Avec --max-ms, il se termine en
+erreur si une page dépasse le budget, pour repérer les régressions.
+
+Exemple :
+    python benchmarks/startup_benchmark.py --runs 5 --max-ms 3000
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["app.py", "pages/admin.py", "pages/brevet.py"]
+# Ligne de -X importtime : "import time: <self µs> | <cumulé µs> | <indentation><module>"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)")
+
+
+def page_imports(path: str) -> str:
+    """Retourne les instructions d'import de premier niveau d'un script."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Retourne (module, profondeur, µs propres, µs cumulées) pour chaque ligne de -X importtime."""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, (len(indent) - 1) // 2, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(page: str, runs: int, top: int) -> Dict[str, Any]:
+    code = page_imports(os.path.join(ROOT, page))
+    totals, heaviest = [], {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Échec de l'import de {page} :\n{result.stderr[-2000:]}")
+        entries = parse_importtime(result.stderr)
+        # Le temps total est la somme des imports de premier niveau (profondeur 0)
+        totals.append(sum(cumulative for _, depth, _, cumulative in entries if depth == 0) / 1000)
+        for module, depth, _, cumulative in entries:
+            # Paquets importés (premier composant du nom), au niveau le plus haut où ils apparaissent
+            package = module.split(".")[0]
+            heaviest[package] = max(heaviest.get(package, 0), cumulative / 1000)
+    return {
+        "page": page,
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "heaviest": sorted(heaviest.items(), key=lambda item: -item[1])[:top],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages", nargs="*", default=PAGES)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="modules les plus coûteux affichés")
+    parser.add_argument("--max-ms", type=float, help="budget de démarrage par page (code de sortie 1 si dépassé)")
+    parser.add_argument("--json", help="fichier où écrire les résultats")
+    args = parser.parse_args()
+
+    results = [measure(page, args.runs, args.top) for page in args.pages]
+    for r in results:
+        print(f"{r['page']:<18} médiane {r['median_ms']:8.0f} ms   (min {r['min_ms']:.0f}, max {r['max_ms']:.0f})")
+        for package, ms in r["heaviest"]:
+            print(f"    {package:<28}{ms:8.0f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    over = [r["page"] for r in results if args.max_ms is not None and r["median_ms"] > args.max_ms]
+    if over:
+        print(f"Budget de {args.max_ms:.0f} ms dépassé : {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@
 import streamlit as st
 from pages.ressources.components import Navbar
 from src.db.utils import QuizDatabase, CoursesDatabase
+from src.telemetry import start_exporter
+from dotenv import find_dotenv, load_dotenv
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
@@ -140,7 +142,7 @@ def main():
             global_success_rate = db.get_global_success_rate()
             
         else : 
-            cursor = db.conn.execute("""
+            cursor = db.reader.execute("""
             SELECT DISTINCT chapter
             FROM questions
             WHERE subject = ?;
@@ -205,7 +207,7 @@ def main():
             selected_chapter = st.selectbox("Choisir un chapitre", chapters)
 
         # Récupérer toutes les questions
-        questions = db.conn.execute("""
+        questions = db.reader.execute("""
             SELECT DISTINCT questions.question_id, questions.question_text
             FROM questions
             JOIN answers ON questions.question_id = answers.question_id
@@ -265,7 +267,7 @@ def main():
         
 
         # Récupérer toutes les questions
-        questions = db.conn.execute(f"""
+        questions = db.reader.execute(f"""
             SELECT DISTINCT questions.question_id, questions.question_text, correct_index
             FROM questions
             JOIN answers ON questions.question_id = answers.question_id
@@ -330,7 +332,7 @@ def main():
             """, unsafe_allow_html=True)
             
             # Récupérer toutes les réponses pour la question sélectionnée
-            answers = db.conn.execute("""
+            answers = db.reader.execute("""
                 SELECT selected_option, COUNT(*) as count
                 FROM answers
                 WHERE question_id = ?
@@ -346,7 +348,7 @@ def main():
                     option_counts[option] = count
             
             # Obtenir les textes des options
-            options = db.conn.execute("""
+            options = db.reader.execute("""
                 SELECT option1, option2, option3, option4 FROM questions WHERE question_id = ?;
             """, (selected_question_id,)).fetchall()[0]
             
@@ -391,7 +393,7 @@ def main():
             if selected_subject_filter != "Tous les sujets":
                 chapters = db.get_chapters_by_subject(selected_subject_filter)
             else:
-                chapters = db.conn.execute("SELECT DISTINCT chapter FROM questions;").fetchall()
+                chapters = db.reader.execute("SELECT DISTINCT chapter FROM questions;").fetchall()
                 chapters = [chapter[0] for chapter in chapters]
 
         with col2:
@@ -442,7 +444,7 @@ def main():
     else : 
         st.title(f"Bienvenue {username} sur votre Tableau de bords")
  
-        users = db.conn.execute(
+        users = db.reader.execute(
             "SELECT username FROM users WHERE username = ?;",
             (username,)).fetchall()
         if users:
@@ -551,4 +553,7 @@ def main():
                 return
 
 if __name__ == '__main__':
+    # Exposition Prometheus si METRICS_PORT ou METRICS_TEXTFILE est défini (une fois par processus)
+    load_dotenv(find_dotenv())
+    start_exporter()
     main()
\ No newline at end of file
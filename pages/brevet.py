@@ -2,10 +2,11 @@ import streamlit as st
 from pages.ressources.components import Navbar , display_brevet_blanc
 from src.rag import RAGPipeline
 from src.db.utils import QuizDatabase
+from src.telemetry import start_exporter
+from dotenv import find_dotenv, load_dotenv
 
 
 rag = RAGPipeline(
-        generation_model="mistral-large-latest",
         max_tokens=900,
         temperature=0.5,
         top_n=1,
@@ -40,4 +41,7 @@ def main():
     
     
 if __name__ == "__main__":
+    # Exposition Prometheus si METRICS_PORT ou METRICS_TEXTFILE est défini (une fois par processus)
+    load_dotenv(find_dotenv())
+    start_exporter()
     main()
\ No newline at end of file
@@ -1,9 +1,13 @@
 import streamlit as st
 
-from src.metrics_database import RAGMetricsDatabase
+from src.metrics_database import get_default_metrics_db
 import time
+from datetime import datetime, timedelta
 from streamlit_autorefresh import st_autorefresh
 from src.db.utils import QuizDatabase
+from src.answer_ingestion import get_answer_ingestor
+from src.inventory import get_inventory_worker
+from src.rate_limiter import get_default_limiter
 
 # Function to handle user logout
 def logout():
@@ -24,6 +28,9 @@ def logout():
         unsafe_allow_html=True
     )
     
+    # Réponses du quiz en cours enregistrées avant la déconnexion
+    if "answer_batch" in st.session_state:
+        st.session_state.answer_batch.flush()
     st.session_state.authenticated = False
     st.session_state.username = ""
     st.success("You have been logged out.")
@@ -71,30 +78,69 @@ def project_description_dialog():
         unsafe_allow_html=True
     )
 
+# Fenêtres proposées dans le tableau de bord des métriques
+METRICS_WINDOWS = {
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(days=1),
+    "Last 7 days": timedelta(days=7),
+    "All time": None,
+}
+
+
 @st.dialog("Metrics Database")
 def metrics_database_dialog():
-    # Retrieve metrics from the database
-    metrics_db = RAGMetricsDatabase()
-    avg_metrics = metrics_db.get_average_metrics()
-    """    return {
-            "avg_latency": row[0],
-            "price_input_total": row[1],
-            "price_output_total": row[2],
-            "price_total": row[3],
-            "gwp_total": row[4],
-            "energy_usage_total": row[5]
-            
-        }
-"""
+    # Les indicateurs sont lus dans les agrégats par minute / par heure, pas dans rag_metrics
+    metrics_db = get_default_metrics_db()
+    window = st.selectbox("Period", list(METRICS_WINDOWS), index=len(METRICS_WINDOWS) - 1)
+    since = datetime.now() - METRICS_WINDOWS[window] if METRICS_WINDOWS[window] is not None else None
+    stats = metrics_db.get_rollup_stats(since=since)
     st.subheader("Metrics Database")
-    st.write(f"Average Latency: {round(avg_metrics['avg_latency'] , 2)} seconds")
-    st.write(f"Total Price Input: {round(avg_metrics['price_input_total'], 2)} €")
-    st.write(f"Total Price Output: {round(avg_metrics['price_output_total'], 2)} €")
-    st.write(f"Total Price: {round(avg_metrics['price_total'], 2)} €")
-    st.write(f"Total GWP: {round(avg_metrics['gwp_total'], 2)} kgCO2e")
-    st.write(f"Total Energy Usage: {round(avg_metrics['energy_usage_total'], 2)} kWh")
+    if not stats["calls"]:
+        st.write("No calls recorded over this period.")
+    else:
+        st.write(f"Calls: {stats['calls']}")
+        st.write(
+            f"Latency: {round(stats['avg_latency'], 2)} s average, {round(stats['p50_latency'], 2)} s p50, "
+            f"{round(stats['p95_latency'], 2)} s p95, {round(stats['p99_latency'], 2)} s p99"
+        )
+        if stats["avg_ttft"] is not None:
+            st.write(f"Average Time to First Token: {round(stats['avg_ttft'], 2)} seconds")
+        st.write(f"Total Price Input: {round(stats['price_input_total'], 2)} $")
+        st.write(f"Total Price Output: {round(stats['price_output_total'], 2)} $")
+        st.write(f"Total Price: {round(stats['price_total'], 2)} $")
+        st.write(f"Total GWP: {round(stats['gwp_total'], 2)} kgCO2e")
+        st.write(f"Total Energy Usage: {round(stats['energy_usage_total'], 2)} kWh")
+        st.write(f"Price per Question: {round(stats['price_per_question'], 5)} $")
+        st.write(f"Calls per Question: {round(stats['calls_per_question'], 2)}")
+        st.write(f"Cache Hit Rate: {round(stats['cache_hit_rate'] * 100, 1)} %")
+        st.write(f"Coalesced Request Rate: {round(stats['coalesced_rate'] * 100, 1)} %")
+        st.write(f"Duplicate Question Rate: {round(stats['duplicate_rate'] * 100, 1)} %")
+        st.write(f"Parse Failure Rate: {round(stats['parse_failure_rate'] * 100, 1)} %")
+        st.write(f"Rate Limiter Wait: {round(stats['avg_queue_wait'], 2)} s average, {round(stats['p95_queue_wait'], 2)} s p95")
+        st.dataframe(
+            [
+                {
+                    "Model": row["model"],
+                    "Operation": row["operation"],
+                    "Calls": row["calls"],
+                    "p50 (s)": round(row["p50_latency"] or 0, 2),
+                    "p95 (s)": round(row["p95_latency"] or 0, 2),
+                    "p99 (s)": round(row["p99_latency"] or 0, 2),
+                    "Tokens": row["input_tokens"] + row["output_tokens"],
+                    "Price ($)": round(row["price_total"], 4),
+                }
+                for row in metrics_db.get_rollup_breakdown(since=since)
+            ],
+            hide_index=True,
+        )
+    events = metrics_db.get_event_counts(since=since)
+    st.write(f"Retries: {events.get('retry', 0)} / {events.get('attempt', 0)} attempts")
+    st.write(f"Hedged Requests: {events.get('hedge', 0)} ({events.get('hedge_won', 0)} won by the hedge)")
+    st.write(f"Circuit Breaker Trips: {events.get('circuit_opened', 0)}")
+    queue_depth = get_default_limiter().queue_depth()
+    st.write(f"Queued Calls: {queue_depth.get('interactive', 0)} interactive, {queue_depth.get('background', 0)} background")
     st.write("")
-    st.write("Ces données sont calculées sur l'ensemble des métriques enregistrées dans la base de données.")
+    st.write("Ces données sont calculées à partir des agrégats par minute et par heure des métriques enregistrées (percentiles de latence à 2 % près).")
  
 
 
@@ -150,7 +196,8 @@ def display_quiz(db_manager, rag):
     """
     Crée et gère un quiz avec toutes les questions de la base de données
     liées au thème (matière+chapitre) sélectionné dans st.session_state.
-    Pour chaque question, le temps de réponse est calculé et le résultat est inséré en BDD.
+    Pour chaque question, le temps de réponse est calculé et le résultat est ajouté au lot
+    de réponses de la session, enregistré en BDD par paquets et à la fin du quiz.
     L'explication de la réponse et l'indice (optionnel) sont affichés.
     """
     
@@ -163,10 +210,10 @@ def display_quiz(db_manager, rag):
     )
     
     if not all_questions:
-        st.warning("Aucune question disponible pour ce thème.")
-        # Si aucune question n'existe, on peut générer et sauvegarder un quiz
-        quizz = rag.generate_quizz_questions(selected_course, nbr_questions=10)
-        rag.save_questions(quizz, subject=selected_subject, chapter=selected_course)
+        # La génération se fait en arrière-plan : on demande le réapprovisionnement prioritaire du thème
+        get_inventory_worker().request_refill(selected_subject, selected_course)
+        st.warning("Aucune question disponible pour ce thème pour le moment.")
+        st.info("Les questions sont en cours de génération, reviens dans quelques instants.")
         return
 
     # Récupération (ou création) du quiz en BDD
@@ -191,11 +238,15 @@ def display_quiz(db_manager, rag):
         st.session_state.answer_given = False
     if "show_hint" not in st.session_state:
         st.session_state.show_hint = False
+    if "answer_batch" not in st.session_state:
+        # Réponses enregistrées par lots (voir src.answer_ingestion)
+        st.session_state.answer_batch = get_answer_ingestor().batch(db_manager)
 
     # Choix du mode quiz
     if not st.session_state.quiz_started:
         mode = st.radio("Choisissez le mode de quiz :", ("speed_test", "chill"))
         if st.button("Commencer le quiz"):
+            st.session_state.answer_batch.flush()
             st.session_state.quiz_data = all_questions
             st.session_state.current_question_index = 0
             st.session_state.score = 0
@@ -240,7 +291,7 @@ def display_quiz(db_manager, rag):
                 if elapsed_time >= 30 and not st.session_state.answer_given:
                     
                     st.session_state.time_spent.append(30)
-                    db_manager.insert_result(
+                    st.session_state.answer_batch.add(
                         quiz_id=quiz_id,
                         user_id=st.session_state.user_id,
                         question_id=question_data["question_id"],
@@ -270,7 +321,7 @@ def display_quiz(db_manager, rag):
                         correct = (i == correct_index)
                         if correct:
                             st.session_state.score += 1
-                        db_manager.insert_result(
+                        st.session_state.answer_batch.add(
                             quiz_id=quiz_id,
                             user_id=st.session_state.user_id,
                             question_id=question_data["question_id"],
@@ -319,6 +370,7 @@ def display_quiz(db_manager, rag):
                     st.session_state.start_time = time.time()
                     st.session_state.timer_active = True
                     if st.session_state.current_question_index >= len(st.session_state.quiz_data):
+                        st.session_state.answer_batch.flush()
                         st.session_state.completed_quiz = True
                         st.session_state.quiz_started = False
                         st.session_state.time_spent = [round(t, 2) for t in st.session_state.time_spent]
@@ -328,6 +380,7 @@ def display_quiz(db_manager, rag):
                         st.success("Quiz terminé !")
                         
                 if st.button("Terminer le quiz", key="finish_quiz"):
+                    st.session_state.answer_batch.flush()
                     st.session_state.completed_quiz = True
                     st.session_state.quiz_started = False
                     st.session_state.time_spent = [round(t, 2) for t in st.session_state.time_spent]
@@ -0,0 +1,158 @@
+# FILE: src/answer_ingestion.py
+import atexit
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Set
+
+
+class AnswerBatch:
+    """
+    Réponses d'une session de quiz en attente d'enregistrement. Elles sont insérées en
+    une transaction (`QuizDatabase.insert_results`) dès que `batch_size` réponses sont
+    en attente, quand la plus ancienne attend depuis `max_delay` secondes, ou à l'appel
+    de `flush` (fin du quiz).
+
+    Un lot qui contient des réponses est suivi par son `AnswerIngestor`, qui l'enregistre
+    une fois le délai écoulé même si la session n'envoie plus rien (onglet fermé, quiz
+    abandonné) et le vide à l'arrêt du processus : les statistiques de pages/admin.py ont
+    au plus `max_delay` secondes de retard.
+    """
+
+    def __init__(self, db, ingestor: "AnswerIngestor", batch_size: int = 20, max_delay: float = 5.0) -> None:
+        self.db = db
+        self.ingestor = ingestor
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._pending: List[Dict[str, Any]] = []
+        self._first_at = None
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        quiz_id: int,
+        user_id: int,
+        question_id: int,
+        selected_option: int,
+        is_correct: bool,
+        answer_time: float,
+        hint_used: bool
+    ) -> None:
+        """Ajoute une réponse au lot (mêmes champs que `QuizDatabase.insert_result`)."""
+        with self._lock:
+            self._pending.append({
+                "quiz_id": quiz_id,
+                "user_id": user_id,
+                "question_id": question_id,
+                "selected_option": selected_option,
+                "is_correct": is_correct,
+                "answer_time": answer_time,
+                "hint_used": hint_used
+            })
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+                self.ingestor.track(self)
+            full = len(self._pending) >= self.batch_size
+        if full or self.due():
+            self.flush()
+
+    def due(self) -> bool:
+        """True si la plus ancienne réponse en attente a dépassé `max_delay`."""
+        first_at = self._first_at
+        return first_at is not None and time.monotonic() - first_at >= self.max_delay
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Enregistre les réponses en attente. En cas d'échec, elles restent dans le lot
+        pour la tentative suivante.
+
+        Returns:
+            int: Nombre de réponses enregistrées.
+        """
+        with self._lock:
+            rows, self._pending = self._pending, []
+            first_at, self._first_at = self._first_at, None
+        if not rows:
+            return 0
+        try:
+            self.db.insert_results(rows)
+        except sqlite3.Error as e:
+            print(f"Échec de l'enregistrement de {len(rows)} réponse(s), nouvel essai plus tard : {e}")
+            with self._lock:
+                self._pending[:0] = rows
+                self._first_at = first_at
+            return 0
+        with self._lock:
+            if not self._pending:
+                self.ingestor.untrack(self)
+        return len(rows)
+
+
+class AnswerIngestor:
+    """
+    Suit les lots de réponses de toutes les sessions du processus : un thread enregistre
+    toutes les `check_interval` secondes ceux dont le délai est écoulé, et `close` (appelé
+    à l'arrêt de l'interpréteur) enregistre tout ce qui reste.
+    """
+
+    def __init__(self, batch_size: int = 20, max_delay: float = 5.0, check_interval: float = 1.0) -> None:
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.check_interval = check_interval
+        self._batches: Set[AnswerBatch] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="answer-ingestor", daemon=True)
+        self._thread.start()
+
+    def batch(self, db) -> AnswerBatch:
+        """Crée le lot de réponses d'une session, enregistré dans la base `db` (QuizDatabase)."""
+        return AnswerBatch(db, self, batch_size=self.batch_size, max_delay=self.max_delay)
+
+    def track(self, batch: AnswerBatch) -> None:
+        with self._lock:
+            self._batches.add(batch)
+
+    def untrack(self, batch: AnswerBatch) -> None:
+        with self._lock:
+            self._batches.discard(batch)
+
+    def pending(self) -> int:
+        """Nombre de réponses en attente, toutes sessions confondues."""
+        with self._lock:
+            batches = list(self._batches)
+        return sum(batch.pending() for batch in batches)
+
+    def flush_all(self, due_only: bool = False) -> int:
+        with self._lock:
+            batches = list(self._batches)
+        return sum(batch.flush() for batch in batches if not due_only or batch.due())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self.flush_all(due_only=True)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(self.check_interval + 1)
+        self.flush_all()
+
+
+_default_ingestor = None
+_default_ingestor_lock = threading.Lock()
+
+
+def get_answer_ingestor() -> AnswerIngestor:
+    """
+    Retourne le suivi des lots de réponses partagé par toutes les sessions du processus ;
+    les réponses en attente sont enregistrées à l'arrêt de l'interpréteur.
+    """
+    global _default_ingestor
+    with _default_ingestor_lock:
+        if _default_ingestor is None:
+            _default_ingestor = AnswerIngestor()
+            atexit.register(_default_ingestor.close)
+        return _default_ingestor
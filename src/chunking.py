@@ -0,0 +1,107 @@
+# FILE: src/chunking.py
+import re
+from typing import Any, Dict, List
+
+# Unités de découpage : mots (avec apostrophes) et signes de ponctuation.
+# Ce décompte local approche celui du tokenizer du modèle sans le charger.
+TOKEN_PATTERN = re.compile(r"\w+(?:['’]\w+)*|[^\w\s]")
+SENTENCE_END = {".", "!", "?", "…"}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estime localement le nombre de tokens d'un texte.
+
+    Args:
+        text (str): Texte à mesurer.
+
+    Returns:
+        int: Nombre de tokens estimé.
+    """
+    return len(TOKEN_PATTERN.findall(text or ""))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Tronque un texte après ses `max_tokens` premiers tokens.
+
+    Args:
+        text (str): Texte à tronquer.
+        max_tokens (int): Nombre de tokens conservés.
+
+    Returns:
+        str: Le début du texte, sans token coupé.
+    """
+    if max_tokens <= 0:
+        return ""
+    for i, match in enumerate(TOKEN_PATTERN.finditer(text or "")):
+        if i == max_tokens - 1:
+            return text[:match.end()]
+    return text or ""
+
+
+def split_into_chunks(text: str, max_tokens: int = 200, overlap: int = 40) -> List[Dict[str, Any]]:
+    """
+    Découpe un texte en morceaux d'au plus `max_tokens` tokens qui se chevauchent
+    de `overlap` tokens. Un morceau s'arrête de préférence en fin de phrase lorsque
+    celle-ci tombe dans le dernier tiers de la fenêtre.
+
+    Args:
+        text (str): Texte à découper.
+        max_tokens (int): Taille maximale d'un morceau, en tokens.
+        overlap (int): Nombre de tokens repris du morceau précédent.
+
+    Returns:
+        List[Dict[str, Any]]: Morceaux avec les clés "chunk_index", "start_char",
+            "end_char" (positions dans le texte source), "token_count" et "content".
+    """
+    if overlap >= max_tokens:
+        raise ValueError("Le chevauchement doit être inférieur à la taille des morceaux.")
+    tokens = list(TOKEN_PATTERN.finditer(text or ""))
+    chunks = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        if end < len(tokens):
+            # Recherche d'une fin de phrase dans le dernier tiers de la fenêtre
+            for i in range(end - 1, start + (2 * max_tokens) // 3, -1):
+                if tokens[i].group() in SENTENCE_END:
+                    end = i + 1
+                    break
+        start_char = tokens[start].start()
+        end_char = tokens[end - 1].end()
+        chunks.append({
+            "chunk_index": len(chunks),
+            "start_char": start_char,
+            "end_char": end_char,
+            "token_count": end - start,
+            "content": text[start_char:end_char],
+        })
+        if end == len(tokens):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def merge_chunks(chunks: List[Dict[str, Any]]) -> List[str]:
+    """
+    Retire le chevauchement entre morceaux consécutifs d'une même source, à partir de leurs positions.
+
+    Args:
+        chunks (List[Dict[str, Any]]): Morceaux triés par source puis par position, avec
+            "course_id", "start_char", "end_char" et "content".
+
+    Returns:
+        List[str]: Le texte propre à chaque morceau.
+    """
+    texts = []
+    previous_source, previous_end = None, None
+    for chunk in chunks:
+        content = chunk["content"]
+        same_source = chunk.get("course_id") == previous_source
+        if same_source and previous_end is not None and chunk["start_char"] < previous_end <= chunk["end_char"]:
+            content = content[previous_end - chunk["start_char"]:].lstrip()
+        if content:
+            texts.append(content)
+        previous_source, previous_end = chunk.get("course_id"), chunk["end_char"]
+    return texts
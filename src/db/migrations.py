@@ -0,0 +1,68 @@
+# FILE: src/db/migrations.py
+import sqlite3
+from typing import List, Tuple
+
+# Migration : (version, description, instructions SQL). Les versions sont croissantes et
+# une migration publiée n'est jamais modifiée : un changement de schéma en ajoute une.
+Migration = Tuple[int, str, List[str]]
+
+QUIZ_MIGRATIONS: List[Migration] = [
+    (1, "index des réponses, des questions et des quiz", [
+        # Taux de réussite et statistiques d'une question : couvert, sans lecture de la table
+        "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id, is_correct, answer_time, hint_used)",
+        # Métriques par utilisateur (jointures users -> answers -> questions / quizzes) : couvert
+        "CREATE INDEX IF NOT EXISTS idx_answers_user ON answers (user_id, question_id, quiz_id, is_correct, answer_time)",
+        "CREATE INDEX IF NOT EXISTS idx_answers_quiz ON answers (quiz_id)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_subject_chapter ON questions (subject, chapter)",
+        "CREATE INDEX IF NOT EXISTS idx_questions_chapter ON questions (chapter)",
+        "CREATE INDEX IF NOT EXISTS idx_quizzes_subject_chapter ON quizzes (subject, chapter)",
+        "ANALYZE",
+    ]),
+]
+
+COURSES_MIGRATIONS: List[Migration] = [
+    (1, "index des cours par matière, thème et chapitre", [
+        "CREATE INDEX IF NOT EXISTS idx_course_info_matiere ON course_info (matiere, theme)",
+        "CREATE INDEX IF NOT EXISTS idx_course_info_theme ON course_info (theme, chapitre)",
+        "CREATE INDEX IF NOT EXISTS idx_course_info_chapitre ON course_info (chapitre)",
+        "ANALYZE",
+    ]),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration], name: str) -> int:
+    """
+    Applique les migrations dont la version dépasse celle de la base (PRAGMA user_version),
+    chacune dans sa propre transaction avec la mise à jour de la version : une migration
+    interrompue est annulée et rejouée au démarrage suivant. La version est relue une fois
+    le verrou d'écriture pris, si bien que deux processus ne l'appliquent pas deux fois.
+    Appelée à chaque démarrage, après la création des tables.
+
+    Args:
+        conn (sqlite3.Connection): Connexion en lecture-écriture à la base.
+        migrations (List[Migration]): Migrations de la base, par version croissante.
+        name (str): Nom de la base, pour les messages.
+
+    Returns:
+        int: Nombre de migrations appliquées.
+    """
+    applied = 0
+    for version, description, statements in migrations:
+        if version <= schema_version(conn):
+            continue
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if version <= schema_version(conn):
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+        print(f"Migration {version} de {name} appliquée : {description}.")
+        applied += 1
+    # Statistiques du planificateur (ANALYZE) rafraîchies si les tables ont beaucoup changé
+    conn.execute("PRAGMA optimize")
+    return applied
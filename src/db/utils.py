@@ -1,15 +1,27 @@
 # FILE: src/quiz_database.py
 import sqlite3
+import threading
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import hashlib
+import os
+from src.chunking import split_into_chunks
+from src.db.migrations import COURSES_MIGRATIONS, QUIZ_MIGRATIONS, migrate
+from src.sqlite_connections import get_connection_manager
+from src.telemetry import QUIZ_ANSWERS, timed_queries
 
+@timed_queries("courses")
 class CoursesDatabase:
     def __init__(self, db_path: str = "src/db/courses.db") -> None:
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connections = get_connection_manager(self.db_path)
         self.create_tables()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread courant (voir src.sqlite_connections)."""
+        return self.connections.connection()
+
     def create_tables(self) -> None:
         cursor = self.conn.cursor()
         cursor.execute("""
@@ -23,7 +35,35 @@ class CoursesDatabase:
                 link TEXT
             )
         """)
+        # Résumés générés, partagés entre sessions et indexés par le hash du contenu source
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chapter_summaries (
+                chapitre TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                model TEXT,
+                summary TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (chapitre, content_hash)
+            )
+        """)
+        # Morceaux de cours bornés en tokens, avec leurs positions dans course_info.content
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS course_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id INTEGER NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                start_char INTEGER NOT NULL,
+                end_char INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                FOREIGN KEY(course_id) REFERENCES course_info(id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_course_chunks_course ON course_chunks(course_id, chunk_index)")
         self.conn.commit()
+        # Index et autres évolutions du schéma (voir src.db.migrations)
+        migrate(self.conn, COURSES_MIGRATIONS, os.path.basename(self.db_path))
 
     def insert_course(self, site: str, matiere: str, theme: str, chapitre: str, content: str, link: str) -> None:
         cursor = self.conn.cursor()
@@ -74,16 +114,176 @@ class CoursesDatabase:
         chapters = cursor.fetchall()
         return [chapitre[0] for chapitre in chapters]
     
+    def sync_chunks(self, max_tokens: int = 200, overlap: int = 40, chapitre: str = None) -> int:
+        """
+        Met à jour la table course_chunks de façon incrémentale : seuls les cours dont
+        le contenu (ou les paramètres de découpage) a changé sont redécoupés, et les
+        morceaux des cours supprimés sont retirés.
+
+        Args:
+            max_tokens (int): Taille maximale d'un morceau, en tokens.
+            overlap (int): Chevauchement entre morceaux consécutifs, en tokens.
+            chapitre (str, optionnel): Limite la mise à jour aux cours de ce chapitre.
+
+        Returns:
+            int: Nombre de cours redécoupés.
+        """
+        if chapitre is None:
+            existing = dict(self.conn.execute(
+                "SELECT course_id, MIN(source_hash) FROM course_chunks GROUP BY course_id;"
+            ).fetchall())
+            rows = self.conn.execute("SELECT id, content FROM course_info;").fetchall()
+        else:
+            rows = self.conn.execute("SELECT id, content FROM course_info WHERE chapitre = ?;", (chapitre,)).fetchall()
+            existing = dict(self.conn.execute("""
+                SELECT course_chunks.course_id, MIN(course_chunks.source_hash) FROM course_chunks
+                JOIN course_info ON course_info.id = course_chunks.course_id
+                WHERE course_info.chapitre = ? GROUP BY course_chunks.course_id;
+            """, (chapitre,)).fetchall())
+        rechunked = 0
+        for course_id, content in rows:
+            source_hash = self.hash_content(f"{max_tokens}:{overlap}:{content or ''}")
+            if existing.pop(course_id, None) == source_hash:
+                continue
+            self.conn.execute("DELETE FROM course_chunks WHERE course_id = ?;", (course_id,))
+            self.conn.executemany("""
+                INSERT INTO course_chunks (course_id, chunk_index, start_char, end_char, token_count, content, source_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, [
+                (course_id, c["chunk_index"], c["start_char"], c["end_char"], c["token_count"], c["content"], source_hash)
+                for c in split_into_chunks(content or "", max_tokens=max_tokens, overlap=overlap)
+            ])
+            rechunked += 1
+        # Cours supprimés de course_info
+        self.conn.executemany("DELETE FROM course_chunks WHERE course_id = ?;", [(i,) for i in existing])
+        self.conn.commit()
+        return rechunked
+
+    def get_chunks_version(self) -> tuple:
+        """
+        Empreinte de la table course_chunks : (nombre de morceaux, plus grand identifiant).
+        Les identifiants n'étant jamais réutilisés, elle change dès qu'un cours est redécoupé.
+        """
+        return tuple(self.conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM course_chunks;").fetchone())
+
+    def get_all_chunks(self) -> List[Dict[str, Any]]:
+        """
+        Récupère l'ensemble des morceaux de cours avec le thème et le chapitre de leur source.
+
+        Returns:
+            List[Dict[str, Any]]: Liste de dictionnaires avec les clés "id", "course_id",
+                "theme", "chapitre", "chunk_index", "start_char", "end_char" et "content".
+        """
+        return self._select_chunks("", ())
+
+    def get_chunks_by_chapter(self, chapitre: str) -> List[Dict[str, Any]]:
+        """
+        Récupère les morceaux d'un chapitre, dans l'ordre du texte source.
+
+        Args:
+            chapitre (str): Nom du chapitre.
+
+        Returns:
+            List[Dict[str, Any]]: Morceaux du chapitre (voir `get_all_chunks`).
+        """
+        return self._select_chunks("WHERE course_info.chapitre = ?", (chapitre,))
+
+    def _select_chunks(self, condition: str, params: tuple) -> List[Dict[str, Any]]:
+        cursor = self.conn.execute(f"""
+            SELECT course_chunks.id, course_chunks.course_id, course_info.theme, course_info.chapitre,
+                   course_chunks.chunk_index, course_chunks.start_char, course_chunks.end_char, course_chunks.content
+            FROM course_chunks
+            JOIN course_info ON course_chunks.course_id = course_info.id
+            {condition}
+            ORDER BY course_chunks.course_id, course_chunks.chunk_index;
+        """, params)
+        return [
+            {
+                "id": row[0],
+                "course_id": row[1],
+                "theme": row[2],
+                "chapitre": row[3],
+                "chunk_index": row[4],
+                "start_char": row[5],
+                "end_char": row[6],
+                "content": row[7]
+            } for row in cursor.fetchall()
+        ]
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """
+        Calcule l'empreinte SHA-256 du contenu d'un chapitre.
+
+        Args:
+            content (str): Contenu du cours.
+
+        Returns:
+            str: Empreinte hexadécimale du contenu.
+        """
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get_summary(self, chapitre: str, content_hash: str) -> Optional[str]:
+        """
+        Récupère le résumé enregistré pour un chapitre et une version de son contenu.
+
+        Args:
+            chapitre (str): Nom du chapitre.
+            content_hash (str): Empreinte du contenu (voir `hash_content`).
+
+        Returns:
+            Optional[str]: Le résumé, ou None si le contenu a changé ou n'a jamais été résumé.
+        """
+        cursor = self.conn.execute("""
+            SELECT summary FROM chapter_summaries
+            WHERE chapitre = ? AND content_hash = ?;
+        """, (chapitre, content_hash))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def save_summary(self, chapitre: str, content_hash: str, summary: str, model: str = None) -> None:
+        """
+        Enregistre le résumé d'un chapitre et supprime ceux des versions précédentes du contenu.
+
+        Args:
+            chapitre (str): Nom du chapitre.
+            content_hash (str): Empreinte du contenu résumé.
+            summary (str): Résumé généré.
+            model (str, optionnel): Modèle ayant généré le résumé.
+        """
+        self.conn.execute("""
+            DELETE FROM chapter_summaries WHERE chapitre = ? AND content_hash != ?;
+        """, (chapitre, content_hash))
+        self.conn.execute("""
+            INSERT OR REPLACE INTO chapter_summaries (chapitre, content_hash, model, summary)
+            VALUES (?, ?, ?, ?);
+        """, (chapitre, content_hash, model, summary))
+        self.conn.commit()
+
     def close(self) -> None:
-        self.conn.close()
+        self.connections.close()
     
 
+@timed_queries("quiz")
 class QuizDatabase:
     def __init__(self, db_path: str = "src/db/quiz.db") -> None:
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connections = get_connection_manager(self.db_path)
         self.create_tables()
         self.insert_super_root()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread courant (voir src.sqlite_connections)."""
+        return self.connections.connection()
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """
+        Connexion en lecture seule du thread courant, pour les statistiques des tableaux
+        de bord : elles ne bloquent pas l'enregistrement des réponses.
+        """
+        return self.connections.reader()
      
 
     def create_tables(self) -> None:
@@ -171,6 +371,8 @@ class QuizDatabase:
         
         # Assuming there exists a users table as described.
         self.conn.commit()
+        # Index et autres évolutions du schéma (voir src.db.migrations)
+        migrate(self.conn, QUIZ_MIGRATIONS, os.path.basename(self.db_path))
         
     def count_completed_courses_by_user(self, username: str) -> int:
         """
@@ -260,6 +462,35 @@ class QuizDatabase:
             })
         return questions
 
+    def get_question_texts_by_chapter(self, chapter: str) -> List[str]:
+        """
+        Récupère le texte de toutes les questions enregistrées pour un chapitre.
+
+        Args:
+            chapter (str): Nom du chapitre.
+
+        Returns:
+            List[str]: Liste des énoncés.
+        """
+        cursor = self.conn.execute("""
+            SELECT question_text FROM questions WHERE chapter = ?;
+        """, (chapter,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def count_questions_by_chapter(self) -> Dict[tuple, int]:
+        """
+        Compte les questions exploitables (quatre options, réponse valide) par couple (matière, chapitre).
+
+        Returns:
+            Dict[tuple, int]: Nombre de questions pour chaque couple (subject, chapter) présent en base.
+        """
+        cursor = self.conn.execute("""
+            SELECT subject, chapter, COUNT(*) FROM questions
+            WHERE correct_index BETWEEN 0 AND 3 AND option4 IS NOT NULL AND option4 != 'N/A'
+            GROUP BY subject, chapter;
+        """)
+        return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+
     def get_or_create_quiz(self, subject: str, chapter: str) -> int:
         """
         Retourne l'ID du quiz existant pour le (subject, chapter) donné,
@@ -292,15 +523,43 @@ class QuizDatabase:
         """
         Enregistre la réponse d'un utilisateur pour une question du quiz.
         """
-        self.conn.execute("""
-            INSERT INTO answers (quiz_id, user_id, question_id, selected_option, is_correct, answer_time, hint_used)
-            VALUES (?, ?, ?, ?, ?, ?, ?);
-        """, (quiz_id, user_id, question_id, selected_option, is_correct, answer_time, hint_used))
-        self.conn.commit()
+        self.insert_results([{
+            "quiz_id": quiz_id,
+            "user_id": user_id,
+            "question_id": question_id,
+            "selected_option": selected_option,
+            "is_correct": is_correct,
+            "answer_time": answer_time,
+            "hint_used": hint_used
+        }])
+
+    def insert_results(self, answers: List[Dict[str, Any]]) -> int:
+        """
+        Enregistre un lot de réponses en une seule transaction (`executemany`, un seul commit).
+
+        Args:
+            answers (List[Dict[str, Any]]): Réponses, avec les champs de `insert_result`.
+
+        Returns:
+            int: Nombre de réponses enregistrées.
+        """
+        if not answers:
+            return 0
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO answers (quiz_id, user_id, question_id, selected_option, is_correct, answer_time, hint_used)
+                VALUES (:quiz_id, :user_id, :question_id, :selected_option, :is_correct, :answer_time, :hint_used);
+            """, answers)
+        correct = sum(1 for answer in answers if answer["is_correct"])
+        if correct:
+            QUIZ_ANSWERS.inc(correct, correct="true")
+        if correct < len(answers):
+            QUIZ_ANSWERS.inc(len(answers) - correct, correct="false")
+        return len(answers)
 
 
     def close(self) -> None:
-        self.conn.close()
+        self.connections.close()
         
     def hash_password(self, password: str) -> str:
         """
@@ -382,7 +641,7 @@ class QuizDatabase:
                 SELECT AVG(answer_time) FROM answers
                 {condition};
             """
-            cursor = self.conn.execute(query)
+            cursor = self.reader.execute(query)
             result = cursor.fetchone()[0]
             return round(result, 2) if result is not None else 0.0
         
@@ -424,7 +683,7 @@ class QuizDatabase:
         Returns:
             float: Taux de réussite global en pourcentage.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT 
                 CAST(SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS FLOAT) / 
                 COUNT(*) AS success_rate
@@ -491,7 +750,7 @@ class QuizDatabase:
             (float) : taux de réponses correctes
         """
         # Nombre de bonnes réponses (result_correct)
-        cursor_correct = self.conn.execute("""
+        cursor_correct = self.reader.execute("""
             SELECT COUNT(*) 
             FROM answers 
             WHERE question_id = ? AND is_correct = 1
@@ -499,7 +758,7 @@ class QuizDatabase:
         result_correct = cursor_correct.fetchone()[0]
         
         # Nombre total de réponses (result_total)
-        cursor_total = self.conn.execute("""
+        cursor_total = self.reader.execute("""
             SELECT COUNT(*)
             FROM answers
             WHERE question_id = ?
@@ -528,7 +787,7 @@ class QuizDatabase:
         Returns:
             Dict[str, Any]: Dictionnaire contenant le taux de réussite, le nombre d'apparitions, le temps de réponse moyen, le nombre d'indices demandés et la bonne réponse.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT 
                 COUNT(*) as total_attempts,
                 SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) as correct_attempts,
@@ -547,7 +806,7 @@ class QuizDatabase:
         success_rate = correct_attempts / total_attempts if total_attempts > 0 else 0.0
         
         # Récupérer la bonne réponse
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT correct_index, option1, option2, option3, option4
             FROM questions
             WHERE question_id = ?;
@@ -574,27 +833,15 @@ class QuizDatabase:
         Returns :
             (float) : taux de réponses correctes
         """
-        # Nombre de bonnes réponses (result_correct))
-        cursor_total = self.conn.execute("""
-            SELECT COUNT(*)
-            FROM answers
-            WHERE question_id IN (
-                SELECT question_id
-                FROM questions
-                WHERE subject = ?)""",(subject,))
-        result_total = cursor_total.fetchone()[0]
-        
-        # Nombre total de réponses (result_total)
-        cursor_correct = self.conn.execute("""
-            SELECT COUNT(*)
-            FROM answers
-            WHERE question_id IN (
-                SELECT question_id
-                FROM questions
-                WHERE subject = ? AND is_correct = 1);""",(subject,))
-    
-        result_correct = cursor_correct.fetchone()[0]
-        return result_correct / result_total if result_total > 0 else 0.0
+        # Nombres total et de bonnes réponses en une jointure (index des questions par subject
+        # puis des réponses par question_id)
+        cursor = self.reader.execute("""
+            SELECT COUNT(*), SUM(CASE WHEN answers.is_correct = 1 THEN 1 ELSE 0 END)
+            FROM questions
+            JOIN answers ON answers.question_id = questions.question_id
+            WHERE questions.subject = ?;""", (subject,))
+        result_total, result_correct = cursor.fetchone()
+        return (result_correct or 0) / result_total if result_total > 0 else 0.0
 
     def get_taux_reussite_chapter(self, chapter: str) -> float:
         """
@@ -604,25 +851,15 @@ class QuizDatabase:
         Returns :
             (float) : taux de réponses correctes
         """
-        # Nombre de bonnes réponses (result_correct)
-        cursor_total = self.conn.execute("""
-            SELECT COUNT(*)
-            FROM answers
-            WHERE question_id IN (
-                SELECT question_id
-                FROM questions
-                WHERE chapter = ?)""",(chapter,))
-        result_total = cursor_total.fetchone()[0]
-        # Nombre total de réponses (result_total)
-        cursor_correct = self.conn.execute("""
-            SELECT COUNT(*)
-            FROM answers
-            WHERE question_id IN (
-                SELECT question_id
-                FROM questions
-                WHERE chapter = ? AND is_correct = 1);""",(chapter,))
-        result_correct = cursor_correct.fetchone()[0]
-        return result_correct / result_total if result_total > 0 else 0.0
+        # Nombres total et de bonnes réponses en une jointure (index des questions par chapter
+        # puis des réponses par question_id)
+        cursor = self.reader.execute("""
+            SELECT COUNT(*), SUM(CASE WHEN answers.is_correct = 1 THEN 1 ELSE 0 END)
+            FROM questions
+            JOIN answers ON answers.question_id = questions.question_id
+            WHERE questions.chapter = ?;""", (chapter,))
+        result_total, result_correct = cursor.fetchone()
+        return (result_correct or 0) / result_total if result_total > 0 else 0.0
 
     def get_subjects(self) -> List[str]:
         """
@@ -661,7 +898,7 @@ class QuizDatabase:
         Returns:
             float: Taux de réussite (entre 0.0 et 1.0).
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT COUNT(*) as total, 
                SUM(CASE WHEN answers.is_correct = 1 THEN 1 ELSE 0 END) as correct
         FROM answers
@@ -688,7 +925,7 @@ class QuizDatabase:
         Returns:
             List[Dict[str, Any]]: Liste de dictionnaires contenant le sujet et le taux de réussite.
         """
-        cursor = self.conn.execute(f"""
+        cursor = self.reader.execute(f"""
             SELECT 
                 questions.{topics},
                 CAST(SUM(CASE WHEN answers.is_correct = 1 THEN 1 ELSE 0 END) AS FLOAT) / 
@@ -716,7 +953,7 @@ class QuizDatabase:
         Returns:
             int: Nombre total d'utilisateurs.
         """
-        cursor = self.conn.execute("SELECT COUNT(*) FROM users where super_user != 1;")
+        cursor = self.reader.execute("SELECT COUNT(*) FROM users where super_user != 1;")
         return cursor.fetchone()[0]
 
     def get_total_questions(self) -> int:
@@ -726,12 +963,12 @@ class QuizDatabase:
         Returns:
             int: Nombre total de questions.
         """
-        cursor = self.conn.execute("SELECT COUNT(DISTINCT question_id) FROM answers;")
+        cursor = self.reader.execute("SELECT COUNT(DISTINCT question_id) FROM answers;")
         return cursor.fetchone()[0]
     
 
     def get_questions_metrics(self) -> List[Dict[str, Any]]:
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT question_text, 
                     AVG(CASE WHEN is_correct = 1 THEN 1.0 ELSE 0.0 END) as correct_rate
             FROM questions
@@ -742,7 +979,7 @@ class QuizDatabase:
 
 
     def get_users_data(self) -> List[Dict[str, Any]]:
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT username, COUNT(quizzes.quiz_id) as quiz_count
             FROM users
             JOIN quizzes ON users.user_id = quizzes.user_id
@@ -769,7 +1006,7 @@ class QuizDatabase:
         Returns:
             List[Dict[str, Any]]: Liste de dictionnaires contenant 'username' et 'success_rate'.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT users.username,
                    CAST(SUM(CASE WHEN answers.is_correct = 1 THEN 1 ELSE 0 END) AS FLOAT) / 
                    COUNT(answers.answer_id) AS success_rate
@@ -788,7 +1025,7 @@ class QuizDatabase:
         Returns:
             List[Dict[str, Any]]: Liste de dictionnaires contenant les métriques des utilisateurs.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT 
             users.username,
             COUNT(DISTINCT answers.quiz_id) as total_quizzes,
@@ -818,7 +1055,7 @@ class QuizDatabase:
         Returns:
             List[Dict[str, Any]]: Liste de dictionnaires contenant les métriques des utilisateurs.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT 
             users.username,
             COUNT(DISTINCT answers.quiz_id) as total_quizzes,
@@ -848,7 +1085,7 @@ class QuizDatabase:
         Returns:
             List[Dict[str, Any]]: Liste de dictionnaires contenant les métriques des utilisateurs.
         """
-        cursor = self.conn.execute("""
+        cursor = self.reader.execute("""
             SELECT 
                 users.username,
                 COUNT(DISTINCT quizzes.quiz_id) as total_quizzes,
@@ -991,6 +1228,58 @@ class QuizDatabase:
                 })
             return questions
 
+    def sample_question_ids_by_subject(self, subject: str, n: int) -> List[int]:
+        """
+        Tire au hasard, dans SQLite, les identifiants d'au plus `n` questions exploitables d'une matière.
+
+        Args:
+            subject (str): Nom de la matière.
+            n (int): Nombre de questions à tirer.
+
+        Returns:
+            List[int]: Identifiants des questions tirées.
+        """
+        cursor = self.conn.execute("""
+            SELECT question_id FROM questions
+            WHERE subject = ? AND correct_index BETWEEN 0 AND 3 AND option4 IS NOT NULL AND option4 != 'N/A'
+            ORDER BY RANDOM()
+            LIMIT ?;
+        """, (subject, n))
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_questions_by_ids(self, question_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Récupère les questions correspondant aux identifiants donnés, dans le même ordre.
+
+        Args:
+            question_ids (List[int]): Identifiants des questions.
+
+        Returns:
+            List[Dict[str, Any]]: Questions au format de `get_all_questions_by_subject`.
+        """
+        if not question_ids:
+            return []
+        placeholders = ", ".join("?" for _ in question_ids)
+        cursor = self.conn.execute(f"""
+            SELECT question_id, question_text, option1, option2, option3, option4,
+                correct_index, chapter, hint, explanation
+            FROM questions
+            WHERE question_id IN ({placeholders});
+        """, tuple(question_ids))
+        by_id = {
+            row[0]: {
+                "question_id": row[0],
+                "question_text": row[1],
+                "options": [row[2], row[3], row[4], row[5]],
+                "correct_index": row[6],
+                "chapter": row[7],
+                "hint": row[8],
+                "explanation": row[9]
+            }
+            for row in cursor.fetchall()
+        }
+        return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
     def save_brevet_result(self, user_id: int, results: Dict[str, Dict[str, Any]]) -> None:
         """Sauvegarde les résultats du brevet blanc."""
         for subject, data in results.items():
@@ -998,4 +1287,27 @@ class QuizDatabase:
                 INSERT INTO brevet_results (user_id, subject, score, level)
                 VALUES (?, ?, ?, ?);
             """, (user_id, subject, data["score"], data["level"]))
-        self.conn.commit()
\ No newline at end of file
+        self.conn.commit()
+
+
+_default_quiz_db = None
+_default_courses_db = None
+_default_db_lock = threading.Lock()
+
+
+def get_default_quiz_db() -> QuizDatabase:
+    """Retourne la base des quiz partagée par toutes les instances de RAGPipeline du processus."""
+    global _default_quiz_db
+    with _default_db_lock:
+        if _default_quiz_db is None:
+            _default_quiz_db = QuizDatabase()
+        return _default_quiz_db
+
+
+def get_default_courses_db() -> CoursesDatabase:
+    """Retourne la base des cours partagée par toutes les instances de RAGPipeline du processus."""
+    global _default_courses_db
+    with _default_db_lock:
+        if _default_courses_db is None:
+            _default_courses_db = CoursesDatabase()
+        return _default_courses_db
@@ -0,0 +1,34 @@
+# FILE: src/dedup.py
+from typing import Iterable, List
+
+from rapidfuzz import fuzz, process, utils
+
+
+class QuestionDeduplicator:
+    """
+    Détecte localement les questions quasi identiques à celles d'une banque existante.
+
+    La similarité est le score `token_sort_ratio` de rapidfuzz (0 à 100) calculé sur les
+    textes normalisés (minuscules, sans ponctuation) : une question est considérée comme
+    un doublon dès que son score avec une question connue atteint `threshold`.
+    """
+
+    def __init__(self, existing: Iterable[str] = (), threshold: float = 85.0) -> None:
+        self.threshold = threshold
+        self.known: List[str] = []
+        for text in existing:
+            self.add(text)
+
+    def add(self, text: str) -> None:
+        processed = utils.default_process(text or "")
+        if processed:
+            self.known.append(processed)
+
+    def is_duplicate(self, text: str) -> bool:
+        processed = utils.default_process(text or "")
+        if not processed or not self.known:
+            return False
+        match = process.extractOne(
+            processed, self.known, scorer=fuzz.token_sort_ratio, score_cutoff=self.threshold
+        )
+        return match is not None
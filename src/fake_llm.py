@@ -0,0 +1,132 @@
+# FILE: src/fake_llm.py
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+from src.chunking import TOKEN_PATTERN, count_tokens
+
+
+class FakeLLMProvider:
+    """
+    Fournisseur local qui imite `litellm.completion` sans appel réseau, pour les tests de
+    charge et les benchmarks.
+
+    Les réponses sont bien formées : un objet JSON {"questions": [...]} pour les prompts
+    de quiz (autant de questions que demandé, construites à partir du contexte), un texte
+    pour les résumés. La latence suit une loi log-normale (délai avant le premier token)
+    plus un débit de génération en tokens/s. Les tokens sont comptés localement, et des
+    impacts EcoLogits fictifs, proportionnels aux tokens, sont joints à chaque réponse.
+    Une fraction `error_rate` des appels échoue avec une erreur transitoire (503).
+    """
+
+    def __init__(
+        self,
+        ttft_median: float = 0.4,
+        ttft_sigma: float = 0.5,
+        tokens_per_second: float = 150.0,
+        error_rate: float = 0.0,
+        summary_tokens: int = 250,
+        energy_per_token: float = 2e-6,
+        gwp_per_token: float = 1e-6,
+        seed: int = None
+    ) -> None:
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.summary_tokens = summary_tokens
+        self.energy_per_token = energy_per_token
+        self.gwp_per_token = gwp_per_token
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int = None,
+        stream: bool = False,
+        timeout: float = None,
+        **kwargs: Any
+    ) -> Any:
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.error_rate
+            ttft = self._random.lognormvariate(0, self.ttft_sigma) * self.ttft_median
+            seed = self._random.random()
+        if failed:
+            time.sleep(ttft)
+            raise _service_unavailable(model)
+
+        content = self._content(messages, max_tokens, random.Random(seed))
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        completion_tokens = count_tokens(content)
+        duration = ttft + completion_tokens / self.tokens_per_second
+        if timeout is not None and duration > timeout:
+            time.sleep(timeout)
+            raise _timeout(model, timeout)
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        impacts = self._impacts(prompt_tokens + completion_tokens)
+        if stream:
+            return self._stream(content, ttft, usage, impacts)
+        time.sleep(duration)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+            impacts=impacts,
+            model=model,
+        )
+
+    def _stream(self, content: str, ttft: float, usage: SimpleNamespace, impacts: SimpleNamespace) -> Iterator[SimpleNamespace]:
+        time.sleep(ttft)
+        pieces = re.findall(r"\S+\s*", content)
+        for piece in pieces:
+            time.sleep(count_tokens(piece) / self.tokens_per_second)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None, impacts=impacts)
+        yield SimpleNamespace(choices=[], usage=usage, impacts=impacts)
+
+    def _impacts(self, tokens: int) -> SimpleNamespace:
+        return SimpleNamespace(
+            energy=SimpleNamespace(value=tokens * self.energy_per_token),
+            gwp=SimpleNamespace(value=tokens * self.gwp_per_token),
+        )
+
+    def _content(self, messages: List[Dict[str, str]], max_tokens: int, rng: random.Random) -> str:
+        instructions = " ".join(message["content"] for message in messages[:-1])
+        context = messages[-1]["content"]
+        words = [w for w in TOKEN_PATTERN.findall(context) if len(w) > 3 and w.isalpha()] or ["notion", "cours", "chapitre"]
+        if '"questions"' in instructions:
+            match = re.search(r"Génère (\d+) nouvelles", instructions)
+            return json.dumps({"questions": [self._question(words, rng) for _ in range(int(match.group(1)) if match else 1)]}, ensure_ascii=False)
+        length = min(self.summary_tokens, max_tokens or self.summary_tokens)
+        return " ".join(rng.choice(words) for _ in range(length)) + "."
+
+    @staticmethod
+    def _question(words: List[str], rng: random.Random) -> Dict[str, Any]:
+        sample = [rng.choice(words) for _ in range(8)]
+        return {
+            "question": f"Quel lien entre {sample[0]}, {sample[1]} et {sample[2]} ({rng.randint(1, 10**6)}) ?",
+            "options": [f"{sample[3 + i]} ({i + 1})" for i in range(4)],
+            "correct_index": rng.randint(0, 3),
+            "explanation": f"Le cours relie {sample[0]} et {sample[7]}.",
+            "hint": f"Pense à {sample[1]}.",
+        }
+
+
+def _service_unavailable(model: str) -> Exception:
+    import litellm
+    return litellm.ServiceUnavailableError("Erreur simulée du fournisseur local.", "fake", model)
+
+
+def _timeout(model: str, timeout: float) -> Exception:
+    import litellm
+    return litellm.Timeout(f"Délai de {timeout}s dépassé (fournisseur local).", model, "fake")
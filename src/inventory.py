@@ -0,0 +1,239 @@
+# FILE: src/inventory.py
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from src.single_flight import SQLiteLease
+
+
+class QuestionInventoryWorker:
+    """
+    Service d'arrière-plan qui maintient un stock de questions pour chaque chapitre.
+
+    Le worker parcourt périodiquement les couples (matière, chapitre) des cours et, pour
+    ceux dont le nombre de questions exploitables dans `QuizDatabase.questions` est sous
+    le seuil bas (`low_water_mark`), génère les questions manquantes jusqu'à
+    `target_count` puis les enregistre avec `save_questions`. Les demandes explicites
+    (`request_refill`, par exemple un quiz ouvert sur un chapitre vide) passent avant le
+    parcours périodique : elles sont servies entre deux lots de questions d'un
+    réapprovisionnement d'arrière-plan. Le parcours interactif ne fait ainsi que lire SQLite.
+
+    Chaque processus Streamlit démarre son worker : un chapitre n'est réapprovisionné
+    que par le processus qui détient son bail (`lease`, voir SQLiteLease), et le nombre
+    de questions manquantes est recompté une fois le bail obtenu.
+
+    La génération se fait dans le thread du worker, avec un RAGPipeline créé par
+    `pipeline_factory`. Ce pipeline partage les bases du processus (voir
+    src.sqlite_connections) : le worker y écrit par les connexions de son propre thread,
+    sans bloquer les lectures des sessions. Il devrait avoir la priorité "background"
+    pour céder le pas aux appels interactifs.
+    """
+
+    def __init__(
+        self,
+        pipeline_factory: Callable[[], "RAGPipeline"],
+        low_water_mark: int = 10,
+        target_count: Optional[int] = None,
+        batch_size: int = 5,
+        poll_interval: float = 300.0,
+        lease: Optional[SQLiteLease] = None,
+        lease_ttl: float = 600.0
+    ) -> None:
+        self.pipeline_factory = pipeline_factory
+        self.lease = lease
+        self.lease_ttl = lease_ttl
+        self.low_water_mark = low_water_mark
+        self.target_count = max(target_count or low_water_mark, low_water_mark)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._requests: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pipeline = None
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            self._pipeline = self.pipeline_factory()
+        return self._pipeline
+
+    def start(self) -> "QuestionInventoryWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="question-inventory", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        self._stop.set()
+        self._requests.put(None)  # Réveille le worker
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def request_refill(self, subject: str, chapter: str) -> None:
+        """
+        Demande le réapprovisionnement prioritaire d'un chapitre (sans attendre la génération).
+        """
+        with self._lock:
+            if (subject, chapter) in self._requested:
+                return
+            self._requested.add((subject, chapter))
+        self._requests.put((subject, chapter))
+
+    def is_pending(self, subject: str, chapter: str) -> bool:
+        with self._lock:
+            return (subject, chapter) in self._requested
+
+    def deficits(self) -> List[Tuple[str, str, int]]:
+        """
+        Retourne les couples (matière, chapitre) sous le seuil bas, avec le nombre de
+        questions à générer, les chapitres les moins fournis en premier.
+        """
+        counts = self.pipeline.quizdb.count_questions_by_chapter()
+        missing = []
+        for subject in self.pipeline.coursesdb.get_matiere():
+            for chapter in self.pipeline.coursesdb.get_themes_by_matiere(subject):
+                count = counts.get((subject, chapter), 0)
+                if count < self.low_water_mark:
+                    missing.append((subject, chapter, self.target_count - count))
+        return sorted(missing, key=lambda item: -item[2])
+
+    def refill(self, subject: str, chapter: str, nbr_questions: int = None, priority: bool = True) -> int:
+        """
+        Génère et enregistre les questions manquantes d'un chapitre, par lots de
+        `batch_size` questions enregistrés au fil de l'eau. Sans rien faire si un autre
+        processus détient le bail du chapitre.
+
+        Args:
+            subject (str): Matière du chapitre.
+            chapter (str): Chapitre à réapprovisionner.
+            nbr_questions (int, optionnel): Nombre maximal de questions à générer. Par défaut,
+                de quoi atteindre `target_count`.
+            priority (bool): False pour un réapprovisionnement d'arrière-plan, qui sert les
+                demandes prioritaires entre deux lots.
+
+        Returns:
+            int: Nombre de questions enregistrées.
+        """
+        key = f"inventory:{subject}:{chapter}"
+        if self.lease is not None and not self.lease.acquire(key, self.lease_ttl):
+            print(f"Inventory: {subject} / {chapter} is being refilled by another worker.")
+            return 0
+        try:
+            # Recompté une fois le bail obtenu : un autre processus a pu le réapprovisionner entre-temps
+            count = self.pipeline.quizdb.count_questions_by_chapter().get((subject, chapter), 0)
+            remaining = self.target_count - count
+            if nbr_questions is not None:
+                remaining = min(remaining, nbr_questions)
+            if remaining <= 0:
+                return 0
+            print(f"Inventory: generating {remaining} questions for {subject} / {chapter}...")
+            saved = 0
+            while remaining > 0 and not self._stop.is_set():
+                questions = self.pipeline.generate_quizz_questions(
+                    chapter, nbr_questions=min(self.batch_size, remaining), batch_size=self.batch_size
+                )
+                remaining -= min(self.batch_size, remaining)
+                # Seules les questions exploitables sont mises en stock
+                questions = [q for q in questions if self.pipeline.is_valid_question(q)]
+                if questions:
+                    self.pipeline.save_questions(questions, subject=subject, chapter=chapter)
+                    saved += len(questions)
+                if remaining > 0:
+                    if self.lease is not None:
+                        self.lease.renew(key, self.lease_ttl)
+                    if not priority:
+                        # Une demande prioritaire n'attend pas la fin d'un réapprovisionnement d'arrière-plan
+                        saved += self._drain_requests()
+            return saved
+        finally:
+            if self.lease is not None:
+                self.lease.release(key)
+
+    def run_once(self) -> int:
+        """
+        Réapprovisionne tous les chapitres sous le seuil bas.
+
+        Returns:
+            int: Nombre total de questions enregistrées.
+        """
+        saved = 0
+        for subject, chapter, missing in self.deficits():
+            if self._stop.is_set():
+                break
+            saved += self._safe_refill(subject, chapter, missing, priority=False)
+            # Les demandes prioritaires sont aussi servies entre deux chapitres du parcours
+            saved += self._drain_requests()
+        return saved
+
+    def _safe_refill(self, subject: str, chapter: str, nbr_questions: int = None, priority: bool = True) -> int:
+        try:
+            return self.refill(subject, chapter, nbr_questions, priority=priority)
+        except Exception as e:
+            print(f"Inventory: refill failed for {subject} / {chapter}: {e}")
+            return 0
+
+    def _serve(self, request: Tuple[str, str]) -> int:
+        try:
+            return self._safe_refill(*request)
+        finally:
+            with self._lock:
+                self._requested.discard(request)
+
+    def _drain_requests(self) -> int:
+        saved = 0
+        while not self._stop.is_set():
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                saved += self._serve(request)
+        return saved
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Inventory: scan failed: {e}")
+            # Attente du prochain parcours, interrompue par les demandes prioritaires
+            try:
+                request = self._requests.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+            if request is not None and not self._stop.is_set():
+                self._serve(request)
+                self._drain_requests()
+
+
+_inventory_worker = None
+_inventory_worker_lock = threading.Lock()
+
+
+def get_inventory_worker(**kwargs) -> QuestionInventoryWorker:
+    """
+    Retourne le worker d'inventaire du processus, démarré au premier appel.
+    Les arguments sont transmis à QuestionInventoryWorker lors de sa création.
+    """
+    global _inventory_worker
+    with _inventory_worker_lock:
+        if _inventory_worker is None:
+            kwargs.setdefault("pipeline_factory", _default_pipeline)
+            # Bail partagé avec les workers des autres processus Streamlit
+            kwargs.setdefault("lease", SQLiteLease())
+            _inventory_worker = QuestionInventoryWorker(**kwargs).start()
+        return _inventory_worker
+
+
+def _default_pipeline():
+    # Import différé : src.rag charge litellm et EcoLogits
+    from src.rag import RAGPipeline
+    return RAGPipeline(
+        max_tokens=900,
+        temperature=0.5,
+        top_n=1,
+        priority="background",
+    )
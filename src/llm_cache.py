@@ -0,0 +1,193 @@
+# FILE: src/llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from src.sqlite_connections import get_connection_manager
+
+
+class LLMResponseCache:
+    """
+    Cache persistant (SQLite) des réponses du modèle, adressé par le contenu de la requête.
+
+    La clé est un hash SHA-256 de la requête complète (modèle, messages, température,
+    max_tokens). Les entrées les moins récemment utilisées sont évincées dès que le
+    nombre d'entrées ou la taille totale dépasse la limite, et une durée de vie
+    optionnelle (ttl_seconds) invalide les entrées trop anciennes.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "src/db/llm_cache.db",
+        max_entries: int = 5000,
+        max_bytes: int = 50 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None
+    ) -> None:
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # Protège les compteurs de hits/misses ; chaque thread a sa propre connexion
+        self._lock = threading.Lock()
+        self.connections = get_connection_manager(self.db_path)
+        self.create_table()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread courant (voir src.sqlite_connections)."""
+        return self.connections.connection()
+
+    def create_table(self) -> None:
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """
+        Calcule la clé de cache d'une requête à partir de l'ensemble de ses paramètres.
+        """
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[SimpleNamespace]:
+        """
+        Retourne la réponse en cache pour cette clé, ou None si elle est absente ou expirée.
+        La réponse retournée expose `choices[0].message.content` et `usage` comme une
+        réponse litellm, avec l'attribut `cache_hit` à True.
+        """
+        now = time.time()
+        conn = self.conn
+        row = conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute(
+            "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+        )
+        conn.commit()
+        with self._lock:
+            self.hits += 1
+        return self._to_response(json.loads(row[0]))
+
+    def set(self, key: str, response: Any, model: str = None) -> None:
+        """
+        Enregistre une réponse du modèle puis évince les entrées les plus anciennes si besoin.
+        """
+        payload = json.dumps({
+            "content": response.choices[0].message.content,
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "model": model,
+        }, ensure_ascii=False)
+        now = time.time()
+        conn = self.conn
+        # L'insertion ouvre la transaction d'écriture : l'éviction voit un état cohérent
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache (key, model, response, size_bytes, created_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, (key, model, payload, len(payload.encode("utf-8")), now, now))
+        self._evict()
+        conn.commit()
+
+    def _evict(self) -> None:
+        """Supprime les entrées les moins récemment utilisées au-delà des limites (transaction en cours)."""
+        count, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+        ).fetchone()
+        if count > self.max_entries:
+            self.conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
+        while size > self.max_bytes:
+            row = self.conn.execute(
+                "SELECT key, size_bytes FROM llm_cache ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (row[0],))
+            size -= row[1]
+
+    @staticmethod
+    def _to_response(data: Dict[str, Any]) -> SimpleNamespace:
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=data["content"]))],
+            usage=SimpleNamespace(
+                prompt_tokens=data["prompt_tokens"],
+                completion_tokens=data["completion_tokens"],
+            ),
+            model=data.get("model"),
+            cache_hit=True,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs de hits/misses du processus et l'occupation du cache.
+        """
+        entries, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+    def clear(self) -> None:
+        conn = self.conn
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+
+    def close(self) -> None:
+        self.connections.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> LLMResponseCache:
+    """
+    Retourne le cache partagé par toutes les instances de RAGPipeline du processus,
+    afin que les compteurs de hits/misses soient globaux.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
@@ -1,13 +1,44 @@
 # FILE: src/metrics_database.py
+import atexit
+import os
 import sqlite3
+import threading
 from typing import List, Dict, Any
 from datetime import datetime
+from src.metrics_rollup import (
+    backfill_rollups, create_rollup_tables, read_event_counts, read_rollups, summarize, update_event_rollups, update_rollups
+)
+from src.metrics_writer import MetricsWriter
+from src.sqlite_connections import get_connection_manager
+from src.telemetry import timed_queries
 
+@timed_queries("metrics")
 class RAGMetricsDatabase:
-    def __init__(self, db_path: str = "src/db/rag_metrics.db") -> None:
+    def __init__(self, db_path: str = "src/db/rag_metrics.db", async_writes: bool = False, **writer_options: Any) -> None:
+        """
+        With async_writes, inserts are queued and written in batches by a background
+        thread (see src.metrics_writer.MetricsWriter); reads may then lag the latest
+        calls by up to one flush interval. writer_options are passed to MetricsWriter.
+        """
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connections = get_connection_manager(self.db_path)
+        # Les insertions peuvent venir de plusieurs threads (génération parallèle)
+        self._lock = threading.Lock()
         self.create_table()
+        self.writer = MetricsWriter(self.db_path, on_batch=self._on_rows_written, **writer_options) if async_writes else None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Read-write connection of the current thread (see src.sqlite_connections)."""
+        return self.connections.connection()
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """
+        Read-only connection of the current thread, used by the dashboard queries so
+        that they never hold up metric inserts.
+        """
+        return self.connections.reader()
 
     def create_table(self) -> None:
         cursor = self.conn.cursor()
@@ -21,10 +52,67 @@ class RAGMetricsDatabase:
                 price_output REAL,
                 latency REAL,
                 gwp REAL,
-                energy_usage REAL
+                energy_usage REAL,
+                question_count INTEGER,
+                cache_hit INTEGER DEFAULT 0,
+                ttft REAL,
+                duplicate_count INTEGER,
+                operation TEXT,
+                input_budget INTEGER,
+                budget_action TEXT,
+                budget_tokens_dropped INTEGER,
+                model TEXT,
+                coalesced INTEGER DEFAULT 0,
+                queue_wait REAL,
+                queue_depth INTEGER,
+                invalid_count INTEGER,
+                provider_latency REAL
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME,
+                model TEXT,
+                operation TEXT,
+                event TEXT,
+                attempt INTEGER,
+                elapsed REAL,
+                error TEXT
+            )
+        """)
+        self.add_missing_columns(cursor, {
+            "question_count": "INTEGER",
+            "cache_hit": "INTEGER DEFAULT 0",
+            "ttft": "REAL",
+            "duplicate_count": "INTEGER",
+            "operation": "TEXT",
+            "input_budget": "INTEGER",
+            "budget_action": "TEXT",
+            "budget_tokens_dropped": "INTEGER",
+            "model": "TEXT",
+            "coalesced": "INTEGER DEFAULT 0",
+            "queue_wait": "REAL",
+            "queue_depth": "INTEGER",
+            "invalid_count": "INTEGER",
+            "provider_latency": "REAL"
+        })
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rag_metrics_timestamp ON rag_metrics (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rag_metrics_model_operation ON rag_metrics (model, operation, id)")
+        # Per-minute and per-hour rollups (see src.metrics_rollup), built from the history on first use
+        create_rollup_tables(cursor)
         self.conn.commit()
+        backfill_rollups(self.conn)
+
+    def add_missing_columns(self, cursor: sqlite3.Cursor, columns: Dict[str, str]) -> None:
+        """
+        Ajoute à rag_metrics les colonnes absentes d'une base créée avec un schéma antérieur.
+        """
+        cursor.execute("PRAGMA table_info(rag_metrics)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, sql_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE rag_metrics ADD COLUMN {name} {sql_type}")
 
     def insert_metric(
         self,
@@ -35,55 +123,201 @@ class RAGMetricsDatabase:
         latency: float,
         gwp: float,
         energy_usage: float,
-        timestamp: str = None
-        
+        timestamp: str = None,
+        question_count: int = None,
+        cache_hit: bool = False,
+        ttft: float = None,
+        duplicate_count: int = None,
+        invalid_count: int = None,
+        operation: str = None,
+        input_budget: int = None,
+        budget_action: str = None,
+        budget_tokens_dropped: int = None,
+        model: str = None,
+        coalesced: bool = False,
+        queue_wait: float = None,
+        queue_depth: int = None,
+        provider_latency: float = None
     ) -> int:
         """
         Inserts a new metric record into the rag_metrics table.
         If timestamp is not provided, current datetime in ISO format is used.
+        question_count is the number of quiz questions produced by the call
+        (None for calls that do not generate questions, such as summaries).
+        cache_hit flags calls served by the response cache (recorded at zero cost).
+        ttft is the time to first token of streamed calls (None otherwise).
+        duplicate_count is the number of those questions rejected as near-duplicates.
+        invalid_count is the number of requested questions missing from the answer or
+        failing validation (parse failures).
+        operation, input_budget, budget_action and budget_tokens_dropped record the
+        prompt budget decision (see src.token_budget.PromptBudgeter).
+        model is the model the call was routed to (see src.model_router.ModelRouter).
+        coalesced flags callers that shared another caller's in-flight call (recorded at zero cost).
+        queue_wait is the time spent waiting for the rate limiter, and queue_depth the
+        number of calls already queued when this one was enqueued.
+        provider_latency is the time spent in the provider call alone (retries included),
+        without the rate limiter queue or the wait for a coalesced call; None for calls
+        served by the cache or by another caller.
         """
         if timestamp is None:
             timestamp = datetime.now().isoformat()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO rag_metrics (timestamp, input_tokens, output_tokens, price_input, price_output, latency , gwp, energy_usage)
-            VALUES (?, ?, ?, ?, ?, ? , ?, ?)
-        """, (timestamp, input_tokens, output_tokens, price_input, price_output, latency, gwp, energy_usage))
-        self.conn.commit()
+        return self._insert("rag_metrics", {
+            "timestamp": timestamp,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "price_input": price_input,
+            "price_output": price_output,
+            "latency": latency,
+            "gwp": gwp,
+            "energy_usage": energy_usage,
+            "question_count": question_count,
+            "cache_hit": int(cache_hit),
+            "ttft": ttft,
+            "duplicate_count": duplicate_count,
+            "operation": operation,
+            "input_budget": input_budget,
+            "budget_action": budget_action,
+            "budget_tokens_dropped": budget_tokens_dropped,
+            "model": model,
+            "coalesced": int(coalesced),
+            "queue_wait": queue_wait,
+            "queue_depth": queue_depth,
+            "invalid_count": invalid_count,
+            "provider_latency": provider_latency
+        })
+
+    def _insert(self, table: str, row: Dict[str, Any]) -> int:
+        """
+        Inserts a row, or queues it when writes are asynchronous.
+        Returns the new row id, or None for queued rows.
+        """
+        if self.writer is not None and not self.writer.closed:
+            self.writer.submit(table, row)
+            return None
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" * len(row))
+        conn = self.conn
+        with self._lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values()))
+            self._on_rows_written(conn, table, [row])
         return cursor.lastrowid
 
+    @staticmethod
+    def _on_rows_written(conn: sqlite3.Connection, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Keeps the rollup tables in step with rag_metrics and llm_events, in the insert transaction."""
+        if table == "rag_metrics":
+            update_rollups(conn, rows)
+        elif table == "llm_events":
+            update_event_rollups(conn, rows)
+
+    def flush(self) -> None:
+        """Waits until every queued row has been written (no-op for synchronous writes)."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def get_rollup_stats(self, since: datetime = None, model: str = None, operation: str = None) -> Dict[str, Any]:
+        """
+        Returns totals, rates and average/p50/p95/p99 latency over a window, read from
+        the per-minute or per-hour rollups (see src.metrics_rollup): the cost depends on
+        the window length, not on the number of recorded calls. since=None covers the
+        whole history. Latency percentiles are within 2 % of the exact values.
+        """
+        return summarize(list(read_rollups(self.reader, since, model, operation).values()))
+
+    def get_rollup_breakdown(self, since: datetime = None) -> List[Dict[str, Any]]:
+        """
+        Returns the rollup statistics of the window per model and operation, busiest first.
+        """
+        groups = read_rollups(self.reader, since)
+        breakdown = [
+            {"model": model or None, "operation": operation or None, **summarize([group])}
+            for (model, operation), group in groups.items()
+        ]
+        return sorted(breakdown, key=lambda row: -row["calls"])
+
     def get_all_metrics(self) -> List[Dict[str, Any]]:
-        cursor = self.conn.cursor()
+        cursor = self.reader.cursor()
         cursor.execute("SELECT * FROM rag_metrics")
         rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
         return [dict(zip(columns, row)) for row in rows]
 
     def get_average_metrics(self) -> Dict[str, float]:
-        cursor = self.conn.cursor()
+        """
+        Returns the average latency and TTFT and the price, GWP and energy totals over
+        the whole history, read from the hourly rollups (None when nothing is recorded).
+        """
+        stats = self.get_rollup_stats()
+        keys = ["price_input_total", "price_output_total", "price_total", "gwp_total", "energy_usage_total"]
+        if not stats["calls"]:
+            return {"avg_latency": None, "avg_ttft": None, **{key: None for key in keys}}
+        return {"avg_latency": stats["avg_latency"], "avg_ttft": stats["avg_ttft"], **{key: stats[key] for key in keys}}
+
+    def insert_event(self, model: str, operation: str, event: str, attempt: int = 0, elapsed: float = None, error: str = None, timestamp: str = None) -> int:
+        """
+        Inserts a resilience event (attempt, retry, error, hedge, hedge_won, hedge_skipped,
+        cancelled, abandoned, circuit_open, circuit_opened, deadline_exceeded) into the llm_events table.
+        """
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        return self._insert("llm_events", {
+            "timestamp": timestamp,
+            "model": model,
+            "operation": operation,
+            "event": event,
+            "attempt": attempt,
+            "elapsed": elapsed,
+            "error": error
+        })
+
+    def get_event_counts(self, since: datetime = None) -> Dict[str, int]:
+        """
+        Returns the number of resilience events by type since `since` (to the hour),
+        read from the hourly event counts. since=None covers the whole history.
+        """
+        return read_event_counts(self.reader, since)
+
+    def get_recent_latencies(self, model: str, operation: str, limit: int = 50) -> List[float]:
+        """
+        Returns the provider latencies of the last `limit` calls of a model for an
+        operation, oldest first. Calls served by the response cache or coalesced, and
+        rows recorded before provider_latency existed, are ignored: local queueing must
+        not make a healthy model look slow to the router.
+        """
+        cursor = self.reader.cursor()
         cursor.execute("""
-            SELECT 
-                AVG(latency) AS avg_latency,
-                SUM(price_input) AS price_input_total,
-                SUM(price_output) AS price_output_total,
-                SUM(price_input) + SUM(price_output) AS price_total,
-                SUM(gwp) AS gwp_total,
-                SUM(energy_usage) AS energy_usage_total
-            FROM rag_metrics
-        """)
-        row = cursor.fetchone()
-        return {
-            "avg_latency": row[0],
-            "price_input_total": row[1],
-            "price_output_total": row[2],
-            "price_total": row[3],
-            "gwp_total": row[4],
-            "energy_usage_total": row[5]
-            
-        }
+            SELECT provider_latency FROM rag_metrics
+            WHERE model = ? AND operation = ? AND provider_latency IS NOT NULL
+            ORDER BY id DESC
+            LIMIT ?
+        """, (model, operation, limit))
+        return [row[0] for row in reversed(cursor.fetchall())]
 
     def close(self) -> None:
-        self.conn.close()
+        if self.writer is not None:
+            self.writer.close()
+        self.connections.close()
+
+_default_metrics_db = None
+_default_metrics_db_lock = threading.Lock()
+
+
+def get_default_metrics_db() -> RAGMetricsDatabase:
+    """
+    Return the metrics database shared by every RAGPipeline (and the model router)
+    of the process.
+    Its writes are asynchronous unless METRICS_ASYNC_WRITES=0; the queue is drained
+    when the interpreter exits.
+    """
+    global _default_metrics_db
+    with _default_metrics_db_lock:
+        if _default_metrics_db is None:
+            _default_metrics_db = RAGMetricsDatabase(async_writes=os.getenv("METRICS_ASYNC_WRITES", "1") != "0")
+            if _default_metrics_db.writer is not None:
+                atexit.register(_default_metrics_db.writer.close)
+        return _default_metrics_db
+
 
 # Example usage (can be removed in production)
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+# FILE: src/metrics_rollup.py
+import json
+import math
+import time
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+# Tables d'agrégats : nom -> nombre de caractères du timestamp ISO conservés pour le créneau
+# ("2026-10-18T14:05" pour la minute, "2026-10-18T14" pour l'heure)
+ROLLUP_TABLES = {
+    "minute": ("rag_metrics_minute", 16),
+    "hour": ("rag_metrics_hour", 13),
+}
+# Comptage des événements de résilience (llm_events) par heure, modèle, opération et type
+EVENT_ROLLUP_TABLE = "llm_events_hour"
+# Au-delà de cette fenêtre, les agrégats horaires sont lus à la place des agrégats par minute
+MINUTE_ROLLUP_MAX_WINDOW = timedelta(hours=6)
+# Les agrégats par minute plus anciens ne sont plus jamais lus : ils sont supprimés (marge d'une heure)
+MINUTE_ROLLUP_RETENTION = MINUTE_ROLLUP_MAX_WINDOW + timedelta(hours=1)
+# Intervalle minimal entre deux purges des agrégats par minute, en secondes
+PRUNE_INTERVAL = 60.0
+_last_pruned = 0.0
+
+# Colonne d'agrégat -> contribution d'une ligne de rag_metrics
+SUM_COLUMNS: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    "calls": lambda row: 1,
+    "input_tokens": lambda row: row.get("input_tokens") or 0,
+    "output_tokens": lambda row: row.get("output_tokens") or 0,
+    "price_input": lambda row: row.get("price_input") or 0.0,
+    "price_output": lambda row: row.get("price_output") or 0.0,
+    "gwp": lambda row: row.get("gwp") or 0.0,
+    "energy_usage": lambda row: row.get("energy_usage") or 0.0,
+    "latency_sum": lambda row: row.get("latency") or 0.0,
+    "ttft_sum": lambda row: row.get("ttft") or 0.0,
+    "ttft_count": lambda row: int(row.get("ttft") is not None),
+    "question_count": lambda row: row.get("question_count") or 0,
+    "question_calls": lambda row: int((row.get("question_count") or 0) > 0),
+    "question_price": lambda row: (row.get("price_input") or 0.0) + (row.get("price_output") or 0.0) if (row.get("question_count") or 0) > 0 else 0.0,
+    "duplicate_count": lambda row: row.get("duplicate_count") or 0,
+    "invalid_count": lambda row: row.get("invalid_count") or 0,
+    "cache_hits": lambda row: int(bool(row.get("cache_hit"))),
+    "coalesced": lambda row: int(bool(row.get("coalesced"))),
+    "queue_wait_sum": lambda row: row.get("queue_wait") or 0.0,
+    "queue_count": lambda row: int(row.get("queue_wait") is not None),
+}
+# Colonne d'esquisse -> colonne de rag_metrics dont on suit la distribution
+SKETCH_COLUMNS = {
+    "latency_sketch": "latency",
+    "queue_wait_sketch": "queue_wait",
+}
+
+
+class LatencySketch:
+    """
+    Esquisse de distribution fusionnable (à la DDSketch) : les valeurs sont comptées dans
+    des intervalles de largeur géométrique, si bien que tout quantile est restitué avec une
+    erreur relative d'au plus `relative_accuracy`. Deux esquisses se fusionnent en sommant
+    leurs compteurs, et leur taille ne dépend que de l'étendue des valeurs (quelques
+    centaines d'intervalles entre la milliseconde et la dizaine de minutes), pas de leur nombre.
+    """
+
+    MIN_VALUE = 1e-6
+
+    def __init__(self, relative_accuracy: float = 0.02, bins: Dict[int, int] = None, zero_count: int = 0) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = dict(bins or {})
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value is None:
+            return
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + count
+
+    def merge(self, other: "LatencySketch") -> None:
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valeur du quantile `q` (entre 0 et 1), None si l'esquisse est vide."""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Milieu de l'intervalle ]gamma^(i-1), gamma^i] au sens de l'erreur relative
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_json(self) -> str:
+        return json.dumps({"a": self.relative_accuracy, "z": self.zero_count, "b": {str(i): c for i, c in self.bins.items()}})
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "LatencySketch":
+        if not data:
+            return cls()
+        payload = json.loads(data)
+        return cls(payload["a"], {int(i): c for i, c in payload["b"].items()}, payload["z"])
+
+
+def create_rollup_tables(cursor: sqlite3.Cursor) -> None:
+    """
+    Crée les tables d'agrégats par minute et par heure, par modèle et par opération, et
+    la table des comptes d'événements par heure.
+    """
+    sums = ",\n".join(f"                {name} REAL NOT NULL DEFAULT 0" for name in SUM_COLUMNS)
+    sketches = ",\n".join(f"                {name} TEXT" for name in SKETCH_COLUMNS)
+    for table, _ in ROLLUP_TABLES.values():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                model TEXT NOT NULL,
+                operation TEXT NOT NULL,
+{sums},
+{sketches},
+                PRIMARY KEY (bucket, model, operation)
+            )
+        """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EVENT_ROLLUP_TABLE} (
+            bucket TEXT NOT NULL,
+            model TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            event TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, model, operation, event)
+        )
+    """)
+
+
+def update_rollups(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    """
+    Ajoute des lignes de rag_metrics aux agrégats, dans la transaction en cours de `conn`.
+    Les lignes sont d'abord regroupées par créneau, modèle et opération, si bien qu'un lot
+    ne met à jour qu'une ligne d'agrégat par groupe et par table.
+    """
+    global _last_pruned
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        for table, width in ROLLUP_TABLES.values():
+            key = (table, (row.get("timestamp") or "")[:width], row.get("model") or "", row.get("operation") or "")
+            groups.setdefault(key, []).append(row)
+
+    columns = list(SUM_COLUMNS) + list(SKETCH_COLUMNS)
+    for (table, bucket, model, operation), group in groups.items():
+        existing = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE bucket = ? AND model = ? AND operation = ?",
+            (bucket, model, operation)
+        ).fetchone()
+        current = dict(zip(columns, existing)) if existing else {}
+        values = []
+        for name, contribution in SUM_COLUMNS.items():
+            values.append(current.get(name, 0) + sum(contribution(row) for row in group))
+        for name, source in SKETCH_COLUMNS.items():
+            sketch = LatencySketch.from_json(current.get(name))
+            for row in group:
+                sketch.add(row.get(source))
+            values.append(sketch.to_json())
+        conn.execute(
+            f"INSERT OR REPLACE INTO {table} (bucket, model, operation, {', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+            (bucket, model, operation, *values)
+        )
+    if time.monotonic() - _last_pruned >= PRUNE_INTERVAL:
+        _last_pruned = time.monotonic()
+        prune_minute_rollups(conn)
+
+
+def prune_minute_rollups(conn: sqlite3.Connection, now: datetime = None) -> int:
+    """
+    Supprime les agrégats par minute antérieurs à MINUTE_ROLLUP_RETENTION, dans la transaction
+    en cours de `conn` : `read_rollups` ne les lit que pour les fenêtres courtes, les agrégats
+    horaires couvrent le reste. Appelée au plus une fois par minute lors des écritures, et
+    après la reprise de l'historique. Retourne le nombre de lignes supprimées.
+    """
+    table, width = ROLLUP_TABLES["minute"]
+    cutoff = ((now or datetime.now()) - MINUTE_ROLLUP_RETENTION).isoformat()[:width]
+    return conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (cutoff,)).rowcount
+
+
+def update_event_rollups(conn: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+    """Ajoute des lignes de llm_events aux comptes horaires, dans la transaction en cours de `conn`."""
+    width = ROLLUP_TABLES["hour"][1]
+    counts: Dict[tuple, int] = {}
+    for row in rows:
+        key = ((row.get("timestamp") or "")[:width], row.get("model") or "", row.get("operation") or "", row.get("event") or "")
+        counts[key] = counts.get(key, 0) + 1
+    conn.executemany(f"""
+        INSERT INTO {EVENT_ROLLUP_TABLE} (bucket, model, operation, event, count) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (bucket, model, operation, event) DO UPDATE SET count = count + excluded.count
+    """, [(*key, count) for key, count in counts.items()])
+
+
+# Table d'agrégats -> (table source, fonction de mise à jour) pour la reprise de l'historique
+BACKFILLS = {
+    ROLLUP_TABLES["hour"][0]: ("rag_metrics", update_rollups),
+    EVENT_ROLLUP_TABLE: ("llm_events", update_event_rollups),
+}
+
+
+def backfill_rollups(conn: sqlite3.Connection, batch_size: int = 5000) -> int:
+    """
+    Construit les agrégats à partir de tout l'historique de rag_metrics et de llm_events,
+    si leurs tables d'agrégats sont vides (base créée avant leur introduction). La reprise
+    se fait dans une transaction exclusive et l'état des tables est relu une fois le verrou
+    d'écriture pris : deux processus démarrés ensemble ne comptent pas deux fois les mêmes
+    lignes. Retourne le nombre de lignes agrégées.
+    """
+    def pending() -> List[str]:
+        return [table for table in BACKFILLS if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None]
+
+    if not pending():
+        return 0
+    total = 0
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in pending():
+            source, update = BACKFILLS[table]
+            cursor = conn.execute(f"SELECT * FROM {source} ORDER BY id")
+            names = [description[0] for description in cursor.description]
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                update(conn, [dict(zip(names, row)) for row in batch])
+                total += len(batch)
+        prune_minute_rollups(conn)
+    return total
+
+
+def read_rollups(
+    conn: sqlite3.Connection,
+    since: datetime = None,
+    model: str = None,
+    operation: str = None
+) -> Dict[tuple, Dict[str, Any]]:
+    """
+    Fusionne les agrégats d'une fenêtre par (modèle, opération). La table par minute est
+    lue pour les fenêtres courtes, la table horaire sinon : le nombre de lignes lues
+    dépend de la durée de la fenêtre, pas du nombre d'appels enregistrés.
+
+    Returns:
+        Dict[tuple, Dict[str, Any]]: Sommes et esquisses fusionnées par (modèle, opération).
+    """
+    granularity = "minute" if since is not None and datetime.now() - since <= MINUTE_ROLLUP_MAX_WINDOW else "hour"
+    table, width = ROLLUP_TABLES[granularity]
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("bucket >= ?")
+        params.append(since.isoformat()[:width])
+    if model is not None:
+        conditions.append("model = ?")
+        params.append(model)
+    if operation is not None:
+        conditions.append("operation = ?")
+        params.append(operation)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = list(SUM_COLUMNS) + list(SKETCH_COLUMNS)
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for row in conn.execute(f"SELECT model, operation, {', '.join(columns)} FROM {table} {where}", params):
+        values = dict(zip(columns, row[2:]))
+        group = merged.setdefault((row[0], row[1]), {
+            **{name: 0 for name in SUM_COLUMNS}, **{name: LatencySketch() for name in SKETCH_COLUMNS}
+        })
+        for name in SUM_COLUMNS:
+            group[name] += values[name]
+        for name in SKETCH_COLUMNS:
+            group[name].merge(LatencySketch.from_json(values[name]))
+    return merged
+
+
+def read_event_counts(conn: sqlite3.Connection, since: datetime = None) -> Dict[str, int]:
+    """Nombre d'événements de résilience par type depuis `since` (à l'heure près), lu dans les comptes horaires."""
+    where, params = "", ()
+    if since is not None:
+        where, params = "WHERE bucket >= ?", (since.isoformat()[:ROLLUP_TABLES["hour"][1]],)
+    return dict(conn.execute(f"SELECT event, SUM(count) FROM {EVENT_ROLLUP_TABLE} {where} GROUP BY event", params))
+
+
+def summarize(groups: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Indicateurs (totaux, taux, latences moyenne et p50/p95/p99) d'un ensemble d'agrégats fusionnés."""
+    totals = {name: sum(group[name] for group in groups) for name in SUM_COLUMNS}
+    sketches = {name: LatencySketch() for name in SKETCH_COLUMNS}
+    for group in groups:
+        for name in SKETCH_COLUMNS:
+            sketches[name].merge(group[name])
+    calls = totals["calls"]
+    questions = totals["question_count"]
+
+    def ratio(numerator: float, denominator: float) -> float:
+        return numerator / denominator if denominator else 0.0
+
+    return {
+        "calls": int(calls),
+        "input_tokens": int(totals["input_tokens"]),
+        "output_tokens": int(totals["output_tokens"]),
+        "price_input_total": totals["price_input"],
+        "price_output_total": totals["price_output"],
+        "price_total": totals["price_input"] + totals["price_output"],
+        "gwp_total": totals["gwp"],
+        "energy_usage_total": totals["energy_usage"],
+        "avg_latency": ratio(totals["latency_sum"], calls),
+        "p50_latency": sketches["latency_sketch"].quantile(0.50),
+        "p95_latency": sketches["latency_sketch"].quantile(0.95),
+        "p99_latency": sketches["latency_sketch"].quantile(0.99),
+        "avg_ttft": ratio(totals["ttft_sum"], totals["ttft_count"]) if totals["ttft_count"] else None,
+        "questions_total": int(questions),
+        "calls_per_question": ratio(totals["question_calls"], questions),
+        "price_per_question": ratio(totals["question_price"], questions),
+        "cache_hit_rate": ratio(totals["cache_hits"], calls),
+        "coalesced_rate": ratio(totals["coalesced"], calls),
+        "duplicate_rate": ratio(totals["duplicate_count"], questions),
+        "parse_failure_rate": ratio(totals["invalid_count"], questions + totals["invalid_count"]),
+        "avg_queue_wait": ratio(totals["queue_wait_sum"], totals["queue_count"]),
+        "p95_queue_wait": sketches["queue_wait_sketch"].quantile(0.95) or 0.0,
+    }
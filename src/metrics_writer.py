@@ -0,0 +1,150 @@
+# FILE: src/metrics_writer.py
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.sqlite_connections import connect
+
+# Marqueur de fin placé dans la file par `close`
+_STOP = object()
+
+
+class MetricsWriter:
+    """
+    Écriture différée des métriques : les enregistrements sont placés dans une file
+    bornée et insérés par un thread dédié, par lots (`executemany` dans une seule
+    transaction), dès que `batch_size` enregistrements sont en attente ou que
+    `flush_interval` secondes se sont écoulées depuis le premier.
+
+    Le thread de requête ne fait donc ni INSERT ni commit. Quand la file est pleine,
+    l'appelant attend au plus `put_timeout` secondes, puis l'enregistrement est
+    abandonné (et compté dans `dropped`) : la génération n'est jamais bloquée
+    durablement par la base. En cas d'arrêt brutal, au plus un intervalle de
+    métriques est perdu ; `close` vide la file avant l'arrêt normal.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10_000,
+        put_timeout: float = 0.5,
+        on_batch: Callable[[sqlite3.Connection, str, List[Dict[str, Any]]], None] = None
+    ) -> None:
+        self.db_path = db_path
+        # Appelé dans la transaction de chaque lot, par table (mise à jour des agrégats, ...)
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, table: str, row: Dict[str, Any]) -> bool:
+        """
+        Place un enregistrement dans la file.
+
+        Args:
+            table (str): Table de destination.
+            row (Dict[str, Any]): Valeurs par nom de colonne.
+
+        Returns:
+            bool: False si l'enregistrement a été abandonné (file pleine ou écrivain fermé).
+        """
+        if self.closed:
+            return False
+        try:
+            self._queue.put((table, tuple(row), tuple(row.values())), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 100 == 0:
+                print(f"File des métriques pleine : {dropped} enregistrement(s) abandonné(s).")
+            return False
+
+    def pending(self) -> int:
+        """Nombre d'enregistrements en attente d'écriture."""
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Attend que tous les enregistrements déjà soumis soient écrits."""
+        self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Écrit les enregistrements en attente puis arrête le thread d'écriture."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        conn = connect(self.db_path, busy_timeout=30)
+        try:
+            stopping = False
+            while not stopping:
+                batch: List[Tuple[str, Tuple[str, ...], Tuple[Any, ...]]] = []
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        self._queue.task_done()
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if stopping:
+                    # Enregistrements soumis pendant la fermeture : écrits avec le dernier lot
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is not _STOP:
+                            batch.append(item)
+                        else:
+                            self._queue.task_done()
+                self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple[str, Tuple[str, ...], Tuple[Any, ...]]]) -> None:
+        """Insère un lot en une transaction, avec un `executemany` par table et jeu de colonnes."""
+        if not batch:
+            return
+        groups: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[Any, ...]]] = {}
+        for table, columns, values in batch:
+            groups.setdefault((table, columns), []).append(values)
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for (table, columns), rows in groups.items():
+                    conn.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+                    )
+                    if self.on_batch is not None:
+                        self.on_batch(conn, table, [dict(zip(columns, values)) for values in rows])
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            print(f"Échec de l'écriture de {len(batch)} métrique(s) : {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
@@ -1,4 +1,3 @@
-from sklearn.ensemble import RandomForestClassifier
 from itertools import product
 
 def get_thresholds():
@@ -93,7 +92,8 @@ def generate_recommendations(classifications):
     # Ensure the number of samples in X_train and y_train are consistent
     assert len(X_train) == len(y_train), "Inconsistent number of samples in X_train and y_train"
 
-    # Train the model
+    # Train the model (scikit-learn is imported on first use to keep page startup fast)
+    from sklearn.ensemble import RandomForestClassifier
     model = RandomForestClassifier()
     model.fit(X_train, y_train)
 
@@ -0,0 +1,210 @@
+# FILE: src/model_router.py
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from src.metrics_database import get_default_metrics_db
+
+# Modèles disponibles : fournisseur litellm, prix en $ par million de tokens, taille de contexte
+MODEL_REGISTRY: Dict[str, Dict[str, Any]] = {
+    "mistral-large-latest": {"provider": "mistral", "input_price": 1.8, "output_price": 5.4, "context_window": 128000},
+    "mistral-small-latest": {"provider": "mistral", "input_price": 0.1, "output_price": 0.3, "context_window": 32000},
+    "ministral-8b-latest": {"provider": "mistral", "input_price": 0.09, "output_price": 0.09, "context_window": 128000},
+    "ministral-3b-latest": {"provider": "mistral", "input_price": 0.04, "output_price": 0.04, "context_window": 128000},
+}
+
+# Politique de routage par opération : modèle principal, replis (du préféré au moins
+# préféré) et objectif de latence p95 (SLO, en secondes) au-delà duquel on bascule
+ROUTING_POLICIES: Dict[str, Dict[str, Any]] = {
+    "quiz": {"primary": "mistral-large-latest", "fallbacks": ["mistral-small-latest", "ministral-8b-latest"], "p95_slo": 25.0},
+    "summary": {"primary": "ministral-8b-latest", "fallbacks": ["ministral-3b-latest"], "p95_slo": 10.0},
+    "default": {"primary": "mistral-large-latest", "fallbacks": ["mistral-small-latest"], "p95_slo": 30.0},
+}
+
+
+class ModelRouter:
+    """
+    Choisit le modèle de chaque appel selon l'opération, la taille du prompt et la latence observée.
+
+    Pour chaque couple (modèle, opération), le routeur suit une moyenne mobile
+    exponentielle (EWMA) et le p95 des dernières latences. Ces latences sont amorcées
+    depuis rag_metrics, puis rechargées toutes les `refresh_interval` secondes pour
+    intégrer les appels des autres processus, et complétées en continu par `observe`.
+    Le modèle principal de l'opération est utilisé tant que son p95 respecte le SLO de la
+    politique. Sinon, le premier repli qui le respecte est choisi, et à défaut le modèle
+    dont l'EWMA est la plus basse. Un modèle écarté est de nouveau essayé (sonde) au plus
+    toutes les `probe_interval` secondes, afin de détecter la fin d'un ralentissement.
+
+    Le registre et les politiques peuvent être surchargés sans modifier le code par un
+    fichier JSON {"models": {...}, "policies": {...}}, indiqué par la variable
+    d'environnement MODEL_ROUTING_CONFIG.
+    """
+
+    def __init__(
+        self,
+        metrics_db=None,
+        registry: Dict[str, Dict[str, Any]] = None,
+        policies: Dict[str, Dict[str, Any]] = None,
+        config_path: Optional[str] = None,
+        window: int = 50,
+        min_samples: int = 5,
+        ewma_alpha: float = 0.2,
+        refresh_interval: float = 60.0,
+        probe_interval: float = 60.0
+    ) -> None:
+        self.registry = {name: dict(spec) for name, spec in MODEL_REGISTRY.items()}
+        self.policies = {name: dict(policy) for name, policy in ROUTING_POLICIES.items()}
+        config_path = config_path or os.getenv("MODEL_ROUTING_CONFIG")
+        if config_path and os.path.exists(config_path):
+            with open(config_path, encoding="utf-8") as f:
+                config = json.load(f)
+            self.registry.update(config.get("models", {}))
+            self.policies.update(config.get("policies", {}))
+        self.registry.update(registry or {})
+        self.policies.update(policies or {})
+        self.metrics_db = metrics_db
+        self.window = window
+        self.min_samples = min_samples
+        self.ewma_alpha = ewma_alpha
+        self.refresh_interval = refresh_interval
+        self.probe_interval = probe_interval
+        self._last_used: Dict[tuple, float] = {}
+        self._latencies: Dict[tuple, deque] = {}
+        self._ewma: Dict[tuple, float] = {}
+        self._loaded_at: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def policy_for(self, operation: str) -> Dict[str, Any]:
+        return self.policies.get(operation, self.policies["default"])
+
+    def provider_model(self, model: str) -> str:
+        """Nom du modèle au format litellm ("fournisseur/modèle")."""
+        provider = self.registry.get(model, {}).get("provider", "mistral")
+        return f"{provider}/{model}"
+
+    def get_price(self, model: str, input_tokens: int, output_tokens: int) -> tuple[float, float]:
+        """
+        Coût (entrée, sortie) en $ d'un appel. Un modèle absent du registre est compté à zéro.
+        """
+        spec = self.registry.get(model)
+        if spec is None:
+            print(f"Model {model} missing from the registry: cost recorded as 0.")
+            return 0.0, 0.0
+        return (
+            (input_tokens / 1_000_000) * spec["input_price"],
+            (output_tokens / 1_000_000) * spec["output_price"],
+        )
+
+    def _refresh(self, model: str, operation: str) -> None:
+        """Recharge les dernières latences depuis rag_metrics si elles sont périmées (verrou détenu)."""
+        key = (model, operation)
+        now = time.time()
+        if self.metrics_db is None or now - self._loaded_at.get(key, 0) < self.refresh_interval:
+            return
+        self._loaded_at[key] = now
+        latencies = self.metrics_db.get_recent_latencies(model, operation, limit=self.window)
+        self._latencies[key] = deque(latencies, maxlen=self.window)
+        if latencies:
+            ewma = latencies[0]
+            for latency in latencies[1:]:
+                ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * ewma
+            self._ewma[key] = ewma
+
+    def observe(self, model: str, operation: str, latency: float) -> None:
+        """Enregistre la latence d'un appel effectué par ce processus."""
+        key = (model, operation)
+        with self._lock:
+            self._refresh(model, operation)
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency)
+            previous = self._ewma.get(key)
+            self._ewma[key] = latency if previous is None else (
+                self.ewma_alpha * latency + (1 - self.ewma_alpha) * previous
+            )
+
+    def stats(self, model: str, operation: str) -> Dict[str, Any]:
+        """
+        Retourne le nombre d'échantillons, l'EWMA et le p95 de la latence d'un modèle pour une opération.
+        """
+        key = (model, operation)
+        with self._lock:
+            self._refresh(model, operation)
+            latencies = sorted(self._latencies.get(key, ()))
+            ewma = self._ewma.get(key)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return {"samples": len(latencies), "ewma": ewma, "p95": p95}
+
+    def candidates(self, operation: str) -> List[str]:
+        policy = self.policy_for(operation)
+        return [policy["primary"]] + [m for m in policy.get("fallbacks", []) if m != policy["primary"]]
+
+    def route(self, operation: str = "default", prompt_tokens: int = 0, max_tokens: int = 0, exclude: List[str] = ()) -> str:
+        """
+        Choisit le modèle d'un appel.
+
+        Args:
+            operation (str): Opération de l'appel ("quiz", "summary", ...).
+            prompt_tokens (int): Taille estimée du prompt, en tokens.
+            max_tokens (int): Nombre maximal de tokens générés.
+            exclude (List[str]): Modèles indisponibles (disjoncteur ouvert), écartés s'il reste un candidat.
+
+        Returns:
+            str: Nom du modèle retenu.
+        """
+        policy = self.policy_for(operation)
+        slo = policy.get("p95_slo")
+        # Raison pour laquelle chaque modèle écarté ne sert pas l'appel, pour le message de repli
+        reasons: Dict[str, str] = {}
+        candidates = []
+        for model in self.candidates(operation):
+            context_window = self.registry.get(model, {}).get("context_window", float("inf"))
+            if prompt_tokens + max_tokens <= context_window:
+                candidates.append(model)
+            else:
+                reasons[model] = f"{prompt_tokens + max_tokens} tokens exceed its {context_window}-token context window"
+        candidates = candidates or self.candidates(operation)
+        available = [model for model in candidates if model not in exclude]
+        for model in candidates:
+            if model in exclude and available:
+                reasons[model] = "circuit breaker open"
+        candidates = available or candidates
+
+        fallback, fallback_ewma = None, float("inf")
+        for model in candidates:
+            stats = self.stats(model, operation)
+            if slo is None or stats["samples"] < self.min_samples or stats["p95"] <= slo or self._should_probe(model, operation):
+                return self._use(model, operation, reasons)
+            reasons[model] = f"p95 {stats['p95']:.2f}s above the {slo}s SLO"
+            if stats["ewma"] is not None and stats["ewma"] < fallback_ewma:
+                fallback, fallback_ewma = model, stats["ewma"]
+        return self._use(fallback or candidates[0], operation, reasons)
+
+    def _should_probe(self, model: str, operation: str) -> bool:
+        with self._lock:
+            return time.time() - self._last_used.get((model, operation), time.time()) >= self.probe_interval
+
+    def _use(self, model: str, operation: str, reasons: Dict[str, str] = None) -> str:
+        primary = self.candidates(operation)[0]
+        if model != primary and reasons:
+            print(f"Routing {operation} to {model}: {primary} skipped ({reasons.get(primary, 'no better candidate')}).")
+        with self._lock:
+            self._last_used[(model, operation)] = time.time()
+        return model
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_default_router() -> ModelRouter:
+    """
+    Retourne le routeur partagé par toutes les instances de RAGPipeline du processus,
+    afin que les latences observées soient communes.
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter(metrics_db=get_default_metrics_db())
+        return _default_router
@@ -1,36 +1,85 @@
 import os
-from typing import Any, List, Dict
-from dotenv import load_dotenv, find_dotenv
-import litellm  
-from src.metrics_database import RAGMetricsDatabase
+import json
+import random
+from typing import Any, List, Dict, Iterator, Optional, TYPE_CHECKING
+from src.metrics_database import get_default_metrics_db
+from src.llm_cache import LLMResponseCache, get_default_cache
+from src.chunking import merge_chunks
+from src.dedup import QuestionDeduplicator
+from src.token_budget import PromptBudgeter
+from src.model_router import ModelRouter, get_default_router
+from src.resilience import ResilientCaller, get_default_caller
+from src.single_flight import SingleFlight, get_default_single_flight
+from src.rate_limiter import RateLimiter, RateLimitTimeoutError, get_default_limiter
 from src.ml_model import generate_recommendations, get_thresholds
+from src.telemetry import LLM_EVENTS, observe_llm_call
+from src.tracing import annotate, configure_tracing_from_env, propagate, span, traced
 
 
 import re
-import numpy as np
-from ecologits import EcoLogits
 from src.db import utils as db_utils
 import time
-from functools import wraps
-# Charger les variables d'environnement
-load_dotenv(find_dotenv())
-print("Chargement des variables d'environnement...")
-
-if os.getenv("MISTRAL_API_KEY") is None:
-    raise ValueError("La clé d'API MISTRAL n'a pas été trouvée. Veuillez vérifier votre fichier .env.")
-else:
-    print("Clé d'API MISTRAL trouvée.")
-
-def track_latency(func):
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        start_time = time.time()
-        result = func(self, *args, **kwargs)  # Pass self explicitly here.
-        end_time = time.time()
-        latency = end_time - start_time
-        self.latency = latency
-        return result
-    return wrapper
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+if TYPE_CHECKING:
+    # Dépendances lourdes (litellm, numpy) importées à la première utilisation
+    import litellm
+    from src.retrieval import EmbeddingIndex
+
+_env_loaded = False
+_ecologits_initialized = False
+_runtime_lock = threading.Lock()
+
+
+def init_runtime(instrument_litellm: bool = True) -> None:
+    """
+    Initialisation faite une seule fois par processus, à la création du premier
+    RAGPipeline : variables d'environnement, puis instrumentation EcoLogits de litellm
+    (inutile quand le pipeline utilise un fournisseur local).
+    """
+    global _env_loaded, _ecologits_initialized
+    with _runtime_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv, find_dotenv
+            # Charger les variables d'environnement
+            load_dotenv(find_dotenv())
+            print("Chargement des variables d'environnement...")
+            if os.getenv("MISTRAL_API_KEY") is None:
+                # Pas d'erreur : un fournisseur local (LLM_PROVIDER=fake) fonctionne sans clé
+                print("Clé d'API MISTRAL absente : seuls les fournisseurs locaux sont utilisables.")
+            else:
+                print("Clé d'API MISTRAL trouvée.")
+            # Spans exportés selon TRACE_JSONL / TRACE_OTEL (voir src.tracing)
+            configure_tracing_from_env()
+            _env_loaded = True
+        if instrument_litellm and not _ecologits_initialized:
+            from ecologits import EcoLogits
+            EcoLogits.init(providers="litellm", electricity_mix_zone="FRA")
+            _ecologits_initialized = True
+
+# État du dernier appel au modèle (latence, modèle, attente du limiteur) dans le contexte
+# courant : propre à chaque thread, et à chaque tâche lancée avec src.tracing.propagate
+_call_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("rag_call_state", default=None)
+
+
+# Angles pédagogiques attribués à l'avance à chaque question d'un quiz.
+# Ils diversifient les questions sans renvoyer l'historique des questions
+# déjà posées, et permettent de lancer les appels en parallèle.
+QUESTION_ANGLES = [
+    "une définition ou une notion clé du cours",
+    "une relation de cause à conséquence",
+    "l'application d'une notion à un exemple concret",
+    "la comparaison entre deux éléments du cours",
+    "une erreur fréquente ou une idée reçue à corriger",
+    "la chronologie ou les étapes d'un processus",
+    "l'interprétation d'un document, d'une donnée ou d'une expérience",
+    "le vocabulaire spécifique de la discipline",
+    "un raisonnement en plusieurs étapes",
+    "une synthèse reliant plusieurs notions du chapitre",
+]
 
 
 class RAGPipeline:
@@ -39,42 +88,150 @@ class RAGPipeline:
 
     def __init__(
         self,
-        generation_model: str,
+        generation_model: str = None,
         max_tokens: int = 2000,
         top_n: int = 1,
-        temperature: float = 0.5
+        temperature: float = 0.5,
+        max_concurrency: int = 10,
+        cache: LLMResponseCache = None,
+        cached_operations: tuple = ("summary",),
+        index: "EmbeddingIndex" = None,
+        summary_max_chunks: int = 8,
+        duplicate_threshold: float = 85.0,
+        max_regeneration_rounds: int = 2,
+        input_budgets: Dict[str, int] = None,
+        router: ModelRouter = None,
+        resilience: ResilientCaller = None,
+        single_flight: SingleFlight = None,
+        coalesced_operations: tuple = ("summary",),
+        limiter: RateLimiter = None,
+        priority: str = "interactive",
+        provider: Any = None
         
     ) -> None:
+        # Modèle imposé à tous les appels ; sans modèle, le routeur choisit par opération
         self.llm = generation_model
+        self.router = router if router is not None else get_default_router()
+        # Échéances, relances, disjoncteurs et requêtes doublées autour des appels au fournisseur
+        self.resilience = resilience if resilience is not None else get_default_caller()
+        # Coalescence des requêtes identiques en cours, pour les opérations listées
+        self.single_flight = single_flight if single_flight is not None else get_default_single_flight()
+        self.coalesced_operations = set(coalesced_operations or ())
+        # Limiteur de débit partagé : les appels "interactive" passent avant les appels "background"
+        self.limiter = limiter if limiter is not None else get_default_limiter()
+        self.priority = priority
+        # Fournisseur exposant `completion(**kwargs)` comme litellm ; LLM_PROVIDER=fake
+        # sélectionne le fournisseur local (src.fake_llm), par défaut litellm
+        if provider is None and os.getenv("LLM_PROVIDER") == "fake":
+            from src.fake_llm import FakeLLMProvider
+            provider = FakeLLMProvider()
+        self.provider = provider
         self.max_tokens = max_tokens
         self.top_n = top_n
         self.temperature = temperature
-        EcoLogits.init(providers="litellm", electricity_mix_zone="FRA")
-        self.metrics_db = RAGMetricsDatabase()
-        self.quizdb = db_utils.QuizDatabase()
-        self.coursesdb = db_utils.CoursesDatabase()
+        self.max_concurrency = max_concurrency
+        # Cache des réponses, activé uniquement pour les opérations listées
+        self.cache = cache if cache is not None else get_default_cache()
+        self.cached_operations = set(cached_operations or ())
+        # Index vectoriel des cours imposé ; sinon l'index partagé du processus (voir get_course_index)
+        self._index = index
+        # Nombre maximal de morceaux du chapitre envoyés pour un résumé
+        self.summary_max_chunks = summary_max_chunks
+        # Filtrage local des quasi-doublons (score rapidfuzz) et relances des questions rejetées
+        self.duplicate_threshold = duplicate_threshold
+        self.max_regeneration_rounds = max_regeneration_rounds
+        # Budget de tokens d'entrée par opération ("quiz", "summary", ...)
+        self.budgeter = PromptBudgeter(input_budgets)
+        init_runtime(instrument_litellm=self.provider is None)
+        # Connexions partagées par les pipelines du processus
+        self.metrics_db = get_default_metrics_db()
+        self.quizdb = db_utils.get_default_quiz_db()
+        self.coursesdb = db_utils.get_default_courses_db()
+
+    def _new_call(self) -> Dict[str, Any]:
+        """Démarre l'état d'un nouvel appel dans le contexte courant."""
+        state = {"pipeline": self}
+        _call_state.set(state)
+        return state
+
+    def _current_call(self) -> Dict[str, Any]:
+        """État du dernier appel de ce pipeline dans le contexte courant (vide s'il n'y en a pas)."""
+        state = _call_state.get()
+        return state if state is not None and state["pipeline"] is self else {}
+
+    def _update_call(self, **values: Any) -> None:
+        state = self._current_call() or self._new_call()
+        state.update(values)
+
+    @property
+    def latency(self) -> float:
+        """Latence du dernier appel à `generate` effectué dans le contexte courant."""
+        return self._current_call().get("latency", 0)
+
+    @latency.setter
+    def latency(self, value: float) -> None:
+        self._update_call(latency=value)
+
+    @property
+    def model(self) -> str:
+        """Modèle utilisé par le dernier appel effectué dans le contexte courant."""
+        return self._current_call().get("model", self.llm)
+
+    @model.setter
+    def model(self, value: str) -> None:
+        self._update_call(model=value)
+
+    def select_model(self, prompt: List[Dict[str, str]], operation: str, max_tokens: int) -> str:
+        """
+        Retourne le modèle imposé (self.llm) s'il y en a un, sinon celui choisi par le routeur
+        pour l'opération, selon la taille du prompt et la latence récente des modèles.
+        """
+        if self.llm:
+            return self.llm
+        return self.router.route(
+            operation, self.budgeter.prompt_tokens(prompt), max_tokens, exclude=self.resilience.open_models()
+        )
+
+    @traced("rate_limit.wait")
+    def wait_for_slot(self, reserved_tokens: int) -> None:
+        """
+        Attend le tour de l'appel dans la file du limiteur de débit, selon `self.priority`.
+        L'attente et la profondeur de la file sont conservées pour les métriques de l'appel.
+        """
+        ticket = self.limiter.acquire(reserved_tokens, priority=self.priority, max_wait=self.resilience.deadline)
+        self._update_call(queue_wait=ticket["wait"], queue_depth=ticket["queue_depth"])
+
+    def completion(self, **kwargs) -> Any:
+        """Appelle le fournisseur du pipeline (litellm par défaut, résolu à l'appel pour l'instrumentation EcoLogits)."""
+        if self.provider is not None:
+            return self.provider.completion(**kwargs)
+        import litellm
+        return litellm.completion(**kwargs)
 
-  
+    def record_event(self, event: Dict[str, Any]) -> None:
+        """Enregistre un événement de résilience (voir ResilientCaller) dans la table llm_events."""
+        LLM_EVENTS.inc(model=event["model"], operation=event["operation"], event=event["event"])
+        self.metrics_db.insert_event(**event)
 
 
-    def _get_energy_usage(self, response : litellm.ModelResponse) -> tuple[float, float]:
-        energy_usage = getattr(response.impacts.energy.value, "min", response.impacts.energy.value)
-        gwp = getattr(response.impacts.gwp.value, "min", response.impacts.gwp.value)
+    def _get_energy_usage(self, response: "litellm.ModelResponse") -> tuple[float, float]:
+        impacts = getattr(response, "impacts", None)
+        if impacts is None:
+            # Aucun impact EcoLogits (flux sans impacts, modèle inconnu) : compté à zéro, comme un appel servi par le cache
+            return 0.0, 0.0
+        energy_usage = getattr(impacts.energy.value, "min", impacts.energy.value)
+        gwp = getattr(impacts.gwp.value, "min", impacts.gwp.value)
         return energy_usage, gwp
     
     def get_price_query(self, model: str, input_tokens: int, output_tokens: int) -> tuple[float, float]:
-       
-        pricing = {
-            "ministral-8b-latest": {"input": 0.09, "output": 0.09},
-            "mistral-large-latest": {"input": 1.8, "output": 5.4}}
-        cost_input = (input_tokens / 1_000_000) * pricing[model]["input"]
-        cost_output = (output_tokens / 1_000_000) * pricing[model]["output"]
-        return cost_input, cost_output
+        # Les prix proviennent du registre des modèles (src.model_router.MODEL_REGISTRY)
+        return self.router.get_price(model, input_tokens, output_tokens)
 
  
  
    
-    def build_prompt(self, context_course: List[str], topic: str, previous_questions: List[Dict[str, str]] = None, role: str = "assistant") -> List[Dict[str, str]]:
+    @traced("build_prompt")
+    def build_prompt(self, context_course: List[str], topic: str, role: str = "assistant", nbr_questions: int = 1, angles: List[str] = None) -> List[Dict[str, str]]:
         """
         Construit un prompt pour générer une nouvelle question à choix multiples sur un sujet donné.
         Le prompt inclut des instructions pour varier la formulation et la difficulté des questions.
@@ -82,8 +239,9 @@ class RAGPipeline:
         Args:
             context_course (List[str]): Liste des éléments de contexte du cours.
             topic (str): Le sujet pour lequel générer la question.
-            previous_questions (List[Dict[str, str]], optionnel): Liste de questions déjà posées pour éviter les répétitions.
             role (str): Le rôle pour lequel construire le prompt. Par défaut "assistant".
+            nbr_questions (int): Nombre de questions demandées dans une seule complétion. Par défaut 1.
+            angles (List[str], optionnel): Angle pédagogique imposé à chaque question (voir QUESTION_ANGLES).
         
         Returns:
             List[Dict[str, str]]: Le prompt structuré au format (role, content).
@@ -94,37 +252,40 @@ class RAGPipeline:
         if role == "assistant":
             
             
-            # Construction de l'historique des questions déjà posées, le cas échéant
-            history_text = ""
-            if previous_questions:
-                history_text = "\nQuestions déjà posées:\n" + "\n".join(
-                    [f"{i+1}. {q['question']}" for i, q in enumerate(previous_questions)]
+            # Consigne de quantité et angles imposés à chaque question
+            if nbr_questions > 1:
+                request_text = (
+                    f"Génère {nbr_questions} nouvelles questions à choix multiples, toutes différentes, "
+                    f"sur le topic '{topic}' qui demandent réflexion. "
+                    f"La liste \"questions\" doit contenir {nbr_questions} éléments, dans l'ordre. "
                 )
+            else:
+                request_text = f"Génère une nouvelle question à choix multiples sur le topic '{topic}' qui demande réflexion. "
+            angle_text = ""
+            if angles and nbr_questions > 1:
+                angle_text = " ".join(
+                    f"La question {i+1} doit porter sur {angle}." for i, angle in enumerate(angles)
+                ) + " "
+            elif angles:
+                angle_text = f"La question doit porter sur {angles[0]}. "
             
             # Assemblage du prompt complet avec une instruction pour varier la difficulté et la formulation
             prompt = [
                 {"role": "system", "content": "Tu es un assistant pédagogique pour le programme de collège français."},
                 {"role": "assistant", "content": (
-                    f"Génère une nouvelle question à choix multiples sur le topic '{topic}' qui demande réflexion. "
-                    "Essaie de varier la difficulté et la formulation par rapport aux questions déjà posées. "
-                    "Si les questions précédentes étaient de difficulté standard, propose une question plus difficile "
-                    "en approfondissant certains aspects ou en abordant des angles moins évidents."
-                    "Tu ne dois pas répéter les questions déjà posées.\n\n"
-                    "Tu dois respecter le format suivant :\n"
-                    "--------------------------------------------------\n"
-                    "Question: [Votre question ici]\n"
-                    "1. [Première option]\n"
-                    "2. [Deuxième option]\n"
-                    "3. [Troisième option]\n"
-                    "4. [Quatrième option]\n"
-                    "Correct Answer: [Numéro de l'option correcte]\n"
-                    "Explanation: [Explication détaillée ici]\n"
-                    "Hint: [Indice utile ici]\n"
-                    "--------------------------------------------------\n\n"
-                    "Assure-toi que la question comporte exactement quatre options dont une seule est correcte, "
-                    "et qu'un indice est fourni sans révéler la réponse."
+                    f"{request_text}"
+                    f"{angle_text}"
+                    "Varie la difficulté et la formulation, en approfondissant certains aspects "
+                    "ou en abordant des angles moins évidents.\n\n"
+                    "Réponds uniquement avec un objet JSON respectant le format suivant :\n"
+                    '{"questions": [{"question": "...", "options": ["...", "...", "...", "..."], '
+                    '"correct_index": 0, "explanation": "...", "hint": "..."}]}\n\n'
+                    "- \"options\" contient exactement quatre propositions différentes, dont une seule est correcte ;\n"
+                    "- \"correct_index\" est la position (de 0 à 3) de la bonne réponse dans \"options\" ;\n"
+                    "- \"explanation\" explique la réponse en détail ;\n"
+                    "- \"hint\" donne un indice utile sans révéler la réponse."
                 )},
-                {"role": "user", "content": f"Contexte du cours : {', '.join(context_course)}' Questions deja générées :' {history_text}"},
+                {"role": "user", "content": f"Contexte du cours : {', '.join(context_course)}"},
             ]
             
             return prompt
@@ -162,29 +323,256 @@ class RAGPipeline:
 
 
 
-    @track_latency
-    def generate(self, prompt: List[Dict[str, str]]) -> litellm.ModelResponse:
+    def generate(self, prompt: List[Dict[str, str]], operation: str = "default", max_tokens: int = None, response_format: dict = None) -> "litellm.ModelResponse":
         """
         Sends the prompt to the language model using default provider and model from self.
+        If `operation` is listed in self.cached_operations, the response is served from
+        (and stored in) the persistent response cache. If it is listed in
+        self.coalesced_operations, concurrent identical requests share a single call:
+        callers other than the one making it get a copy flagged `coalesced`.
+        `max_tokens` overrides self.max_tokens for this call (e.g. batched quiz calls), and
+        `response_format` is passed to the provider (e.g. {"type": "json_object"}).
+        The latency and model of the call are kept in the caller's context (see `latency`
+        and `model`), so concurrent callers of a shared pipeline never see each other's.
         """
-        response = litellm.completion(
-            model=f"mistral/{self.llm}",
-            messages=prompt,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-        )
+        state = self._new_call()
+        start_time = time.time()
+        max_tokens = max_tokens or self.max_tokens
+        with span("llm.generate", operation=operation) as generate_span:
+            try:
+                model = state["model"] = self.select_model(prompt, operation, max_tokens)
+                generate_span.set_attribute("model", model)
+                if operation not in self.coalesced_operations:
+                    return self._complete(prompt, operation, model, max_tokens, response_format)
+                response, leader = self.single_flight.do(
+                    self._cache_key(prompt, model, max_tokens),
+                    lambda: self._complete(prompt, operation, model, max_tokens, response_format),
+                    use_lease=operation in self.cached_operations,
+                )
+                generate_span.set_attribute("coalesced", not leader)
+                return response if leader else self._coalesced_response(response.choices[0].message.content)
+            finally:
+                state["latency"] = time.time() - start_time
+
+    def _complete(self, prompt: List[Dict[str, str]], operation: str, model: str, max_tokens: int, response_format: dict = None) -> "litellm.ModelResponse":
+        """Appel au modèle (ou au cache), avec le limiteur de débit et la politique de résilience."""
+        self._update_call(model=model, queue_wait=0.0, queue_depth=None, provider_latency=None)
+        use_cache = operation in self.cached_operations
+        if use_cache:
+            key = self._cache_key(prompt, model, max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                annotate(cache_hit=True)
+                return cached
+        reserved = self.budgeter.prompt_tokens(prompt) + max_tokens
+        self.wait_for_slot(reserved)
+        start_time = time.time()
+        options = {"response_format": response_format} if response_format else {}
+        with span("llm.call", model=model, operation=operation) as call_span:
+            response = self.resilience.call(
+                lambda timeout: self.completion(
+                    model=self.router.provider_model(model),
+                    messages=prompt,
+                    max_tokens=max_tokens,
+                    temperature=self.temperature,
+                    timeout=timeout,
+                    **options,
+                ),
+                model=model,
+                operation=operation,
+                on_event=self.record_event,
+                on_hedge=lambda: self._hedge_slot(reserved),
+                on_discarded=propagate(lambda discarded: self._record_discarded(discarded, model, operation, reserved, start_time)),
+            )
+            call_span.set_attribute("prompt_tokens", response.usage.prompt_tokens)
+            call_span.set_attribute("completion_tokens", response.usage.completion_tokens)
+        # Temps passé chez le fournisseur seul (sans la file du limiteur) : c'est lui que suit le routeur
+        provider_latency = time.time() - start_time
+        self._update_call(provider_latency=provider_latency)
+        self.router.observe(model, operation, provider_latency)
+        self.limiter.settle(reserved, response.usage.prompt_tokens + response.usage.completion_tokens)
+        if use_cache:
+            self.cache.set(key, response, model=model)
         return response
 
-    def metrics(self, response: litellm.ModelResponse) -> dict:
+    def _hedge_slot(self, reserved: int) -> bool:
+        """Réserve une place auprès du limiteur pour une requête doublée, sans attendre : à défaut, elle n'est pas envoyée."""
+        try:
+            self.limiter.acquire(reserved, priority=self.priority, max_wait=0)
+        except RateLimitTimeoutError:
+            return False
+        return True
+
+    def _record_discarded(self, response: Optional["litellm.ModelResponse"], model: str, operation: str, reserved: int, start_time: float) -> None:
+        """
+        Compte la réponse écartée d'un appel doublé : ses tokens sont réglés auprès du limiteur
+        et son coût est enregistré comme celui d'un appel. Sans réponse (requête annulée ou en
+        échec), la réservation reste prélevée, comme pour un appel en échec.
+        """
+        if response is None:
+            return
+        usage = response.usage
+        self.limiter.settle(reserved, usage.prompt_tokens + usage.completion_tokens)
+        energy_usage, gwp = self._get_energy_usage(response)
+        price_input, price_output = self.get_price_query(model, usage.prompt_tokens, usage.completion_tokens)
+        self.record_metrics({
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "energy_usage": energy_usage,
+            "gwp": gwp,
+            "price_input": price_input,
+            "price_output": price_output,
+            # Pas de provider_latency : comme `router.observe`, le routeur ne suit que les réponses retenues
+            "latency": time.time() - start_time,
+            "model": model,
+            "budget": {"operation": operation},
+        })
+
+    def _cache_key(self, prompt: List[Dict[str, str]], model: str, max_tokens: int = None) -> str:
+        return self.cache.make_key(model, prompt, self.temperature, max_tokens or self.max_tokens)
+
+    @staticmethod
+    def _coalesced_response(content: str) -> SimpleNamespace:
+        """Réponse partagée avec un autre appelant : son coût est compté une seule fois, par ce dernier."""
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0),
+            coalesced=True,
+        )
+
+    def generate_stream(self, prompt: List[Dict[str, str]], operation: str = "default", budget: dict = None) -> Iterator[str]:
+        """
+        Streaming variant of `generate`: yields the text deltas as they arrive.
+
+        Usage, EcoLogits impacts and latency are collected at the end of the stream and
+        recorded in rag_metrics, together with the time to first token (ttft) and the
+        budget decision made for the prompt, if any. Concurrent identical streams of
+        an operation listed in self.coalesced_operations share a single call, read by
+        a dedicated thread: the other callers record a zero-cost row flagged `coalesced`.
+        """
+        state = self._new_call()
+        model = state["model"] = self.select_model(prompt, operation, self.max_tokens)
+        if operation not in self.coalesced_operations:
+            yield from self._stream(prompt, operation, model, budget)
+            return
+        start_time = time.time()
+        ttft = None
+        parts = []
+        deltas, leader = self.single_flight.stream(
+            self._cache_key(prompt, model),
+            lambda: self._stream(prompt, operation, model, budget),
+            use_lease=operation in self.cached_operations,
+        )
+        for delta in deltas:
+            if ttft is None:
+                ttft = time.time() - start_time
+            parts.append(delta)
+            yield delta
+        if not leader:
+            self.latency = time.time() - start_time
+            metrics = self.metrics(self._coalesced_response("".join(parts)))
+            metrics["ttft"] = ttft if ttft is not None else self.latency
+            metrics["budget"] = budget
+            self.record_metrics(metrics)
+
+    def _stream(self, prompt: List[Dict[str, str]], operation: str, model: str, budget: dict = None) -> Iterator[str]:
+        """Appel en streaming au modèle (ou au cache), métriques enregistrées en fin de flux."""
+        self._update_call(model=model, queue_wait=0.0, queue_depth=None, provider_latency=None)
+        use_cache = operation in self.cached_operations
+        if use_cache:
+            key = self._cache_key(prompt, model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.latency = 0
+                metrics = self.metrics(cached)
+                metrics["ttft"] = 0
+                metrics["budget"] = budget
+                self.record_metrics(metrics)
+                yield cached.choices[0].message.content
+                return
+
+        reserved = self.budgeter.prompt_tokens(prompt) + self.max_tokens
+        self.wait_for_slot(reserved)
+        start_time = time.time()
+        ttft = None
+        chunks, parts = [], []
+        usage, impacts = None, None
+        with span("llm.call", model=model, operation=operation, stream=True):
+            # Seule l'ouverture du flux est relancée : les morceaux déjà affichés ne peuvent pas l'être
+            stream = self.resilience.call(
+                lambda timeout: self.completion(
+                    model=self.router.provider_model(model),
+                    messages=prompt,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout,
+                ),
+                model=model,
+                operation=operation,
+                on_event=self.record_event,
+                hedge=False,
+            )
+            for chunk in stream:
+                chunks.append(chunk)
+                # Les impacts EcoLogits sont cumulés : le dernier chunk porte le total
+                impacts = getattr(chunk, "impacts", None) or impacts
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                    parts.append(delta)
+                    yield delta
+        self.latency = time.time() - start_time
+        self._update_call(provider_latency=self.latency)
+        self.router.observe(model, operation, self.latency)
+
+        if usage is None:
+            import litellm
+            usage = litellm.stream_chunk_builder(chunks, messages=prompt).usage
+        self.limiter.settle(reserved, usage.prompt_tokens + usage.completion_tokens)
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="".join(parts)))],
+            usage=usage,
+            impacts=impacts,
+        )
+        metrics = self.metrics(response)
+        metrics["ttft"] = ttft if ttft is not None else self.latency
+        metrics["budget"] = budget
+        self.record_metrics(metrics)
+        if use_cache:
+            self.cache.set(key, response, model=model)
+
+    def metrics(self, response: "litellm.ModelResponse") -> dict:
+        txt = response.choices[0].message.content
+        latency = getattr(self, "latency", 0)
+        # Une réponse servie par le cache, ou partagée avec un autre appelant, n'a rien coûté : métriques à zéro
+        coalesced = getattr(response, "coalesced", False)
+        if getattr(response, "cache_hit", False) or coalesced:
+            return {
+                "response": txt,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "energy_usage": 0.0,
+                "gwp": 0.0,
+                "price_input": 0.0,
+                "price_output": 0.0,
+                "latency": latency,
+                "cache_hit": not coalesced,
+                "coalesced": coalesced,
+                "model": self.model,
+                "queue_wait": self._current_call().get("queue_wait", 0.0),
+                "queue_depth": self._current_call().get("queue_depth")
+            }
         energy_usage, gwp = self._get_energy_usage(response)
         # Use prompt_tokens and completion_tokens instead of non-existent input_tokens/output_tokens
         price_input, price_output = self.get_price_query(
-            self.llm,
+            self.model,
             response.usage.prompt_tokens,
             response.usage.completion_tokens
         )
-        txt = response.choices[0].message.content
-        latency = getattr(self, "latency", 0)
         
         return {
             "response": txt,
@@ -194,23 +582,30 @@ class RAGPipeline:
             "gwp": gwp,
             "price_input": price_input,
             "price_output": price_output,
-            "latency": latency
+            "latency": latency,
+            "cache_hit": False,
+            "coalesced": False,
+            "model": self.model,
+            "queue_wait": self._current_call().get("queue_wait", 0.0),
+            "queue_depth": self._current_call().get("queue_depth"),
+            "provider_latency": self._current_call().get("provider_latency")
         }
 
 
-    def fetch_context(self, topic: str) -> List[str]:
+    @traced("insert_metric")
+    def record_metrics(self, metrics: dict, question_count: int = None, duplicate_count: int = None, invalid_count: int = None) -> None:
         """
-        Fetches the context from the database based on the topic.
+        Enregistre les métriques d'un appel au modèle dans la base rag_metrics et les
+        expose au format Prometheus (voir src.telemetry).
+
+        Args:
+            metrics (dict): Métriques retournées par `self.metrics`.
+            question_count (int, optionnel): Nombre de questions valides produites par l'appel.
+            duplicate_count (int, optionnel): Nombre de ces questions rejetées comme quasi-doublons.
+            invalid_count (int, optionnel): Nombre de questions demandées absentes ou invalides.
         """
-        context = db_utils.get_contents_per_theme_as_dict(db_path='src/db/courses.db', theme=topic)
-        return context
-    
-    
-    
-    def generate_summary(self,chapitre : str,  txt: str) -> str:
-        prompt = self.build_prompt( context_course=[txt], topic=chapitre, role="summary")
-        response = self.generate(prompt)
-        metrics = self.metrics(response)
+        budget = metrics.get("budget") or {}
+        observe_llm_call(metrics, question_count, duplicate_count, invalid_count)
         self.metrics_db.insert_metric(
             input_tokens=metrics["prompt_tokens"],
             output_tokens=metrics["completion_tokens"],
@@ -218,81 +613,346 @@ class RAGPipeline:
             price_output=metrics["price_output"],
             latency=metrics["latency"],
             gwp=metrics["gwp"],
-            energy_usage=metrics["energy_usage"]
+            energy_usage=metrics["energy_usage"],
+            question_count=question_count,
+            cache_hit=metrics.get("cache_hit", False),
+            ttft=metrics.get("ttft"),
+            duplicate_count=duplicate_count,
+            invalid_count=invalid_count,
+            operation=budget.get("operation"),
+            input_budget=budget.get("budget"),
+            budget_action=budget.get("action"),
+            budget_tokens_dropped=budget.get("tokens_dropped"),
+            model=metrics.get("model"),
+            coalesced=metrics.get("coalesced", False),
+            queue_wait=metrics.get("queue_wait"),
+            queue_depth=metrics.get("queue_depth"),
+            provider_latency=metrics.get("provider_latency")
         )
+
+    @property
+    def index(self) -> "EmbeddingIndex":
+        if self._index is not None:
+            return self._index
+        # Index partagé du processus, reconstruit quand le contenu des cours change
+        from src.retrieval import get_course_index
+        return get_course_index(self.coursesdb)
+
+    @traced("fetch_context")
+    def fetch_context(self, topic: str, query: str = None) -> List[str]:
+        """
+        Fetches the `self.top_n` course passages of the topic most relevant to the query
+        (cosine similarity over the embedding index). The query defaults to the topic.
+        """
+        results = self.index.search(query or topic, top_n=self.top_n, theme=topic)
+        return [f"{passage['chapitre']} : {passage['content']}" for _, passage in results]
+    
+    
+    
+    @traced("summary_context")
+    def summary_context(self, chapitre: str, txt: str = None) -> List[str]:
+        """
+        Sélectionne les morceaux du chapitre envoyés pour le résumé : tous s'ils sont peu
+        nombreux, sinon `self.summary_max_chunks` morceaux répartis sur tout le texte
+        (début et fin inclus). Sans morceaux en base, le texte complet est utilisé.
+
+        Les morceaux du chapitre sont d'abord redécoupés si son contenu a changé depuis
+        leur création : le résumé mis en cache sous l'empreinte du texte courant ne doit
+        pas être construit à partir de l'ancien texte.
+        """
+        self.coursesdb.sync_chunks(chapitre=chapitre)
+        chunks = self.coursesdb.get_chunks_by_chapter(chapitre)
+        if not chunks:
+            return [txt] if txt else []
+        if len(chunks) > self.summary_max_chunks:
+            step = (len(chunks) - 1) / (self.summary_max_chunks - 1) if self.summary_max_chunks > 1 else 0
+            positions = (i * step for i in range(self.summary_max_chunks))
+            chunks = [chunks[i] for i in sorted(set(int(round(p)) for p in positions))]
+        return merge_chunks(chunks)
+
+    def fit_prompt(self, operation: str, context: List[str], **prompt_kwargs) -> tuple[List[Dict[str, str]], dict]:
+        """
+        Construit le prompt avec `build_prompt` en ajustant le contexte au budget
+        d'entrée de l'opération (voir PromptBudgeter).
+
+        Args:
+            operation (str): Opération dont le budget s'applique ("quiz", "summary", ...).
+            context (List[str]): Passages de contexte, du plus au moins pertinent.
+            **prompt_kwargs: Autres arguments de `build_prompt` (topic, role, ...).
+
+        Returns:
+            tuple: Le prompt et la décision du budgeteur, enregistrée avec les métriques de l'appel.
+        """
+        prompt, decision = self.budgeter.fit(
+            operation, context, lambda passages: self.build_prompt(context_course=passages, **prompt_kwargs)
+        )
+        if decision["action"] != "none":
+            print(f"Prompt {operation}: {decision['tokens_before']} -> {decision['tokens_after']} tokens ({decision['action']}).")
+        return prompt, decision
+
+    @traced("summary")
+    def generate_summary(self,chapitre : str,  txt: str = None) -> str:
+        annotate(chapter=chapitre)
+        prompt, budget = self.fit_prompt("summary", self.summary_context(chapitre, txt), topic=chapitre, role="summary")
+        response = self.generate(prompt, operation="summary")
+        metrics = self.metrics(response)
+        metrics["budget"] = budget
+        self.record_metrics(metrics)
         return response.choices[0].message.content
+
+    def generate_summary_stream(self, chapitre: str, txt: str = None) -> Iterator[str]:
+        """
+        Génère le résumé d'un chapitre en streaming, morceau par morceau,
+        pour un affichage progressif via `st.write_stream`.
+        """
+        with span("summary", chapter=chapitre, stream=True):
+            prompt, budget = self.fit_prompt("summary", self.summary_context(chapitre, txt), topic=chapitre, role="summary")
+            yield from self.generate_stream(prompt, operation="summary", budget=budget)
         
 
 
-    def generate_quizz_questions(self, topic: str, nbr_questions: int = 5) -> List[Dict[str, Any]]:
-        context_course_dict = self.fetch_context(topic)
+    @traced("quiz.batch")
+    def _generate_question_batch(self, topic: str, plans: List[tuple[str, str]]) -> tuple[List[Dict[str, Any]], dict]:
+        """
+        Génère en une seule complétion une question par couple (chapitre, angle) de `plans`.
+        Le contexte envoyé est formé des passages du cours les plus proches de chaque couple,
+        dans la limite du budget d'entrée "quiz". Appelée depuis les threads de `generate_quizz_questions`.
+
+        Returns:
+            tuple: Les questions, alignées sur `plans` (None pour chaque question absente
+                ou invalide, à régénérer), et les métriques de l'appel.
+        """
+        # Passages classés par rang : le meilleur passage de chaque couple d'abord,
+        # pour que le budget écarte en priorité les passages les moins pertinents
+        results = [self.fetch_context(topic, query=f"{chapter} : {angle}") for chapter, angle in plans]
+        contexts = list(dict.fromkeys(
+            passages[rank]
+            for rank in range(self.top_n)
+            for passages in results
+            if rank < len(passages)
+        ))
+        prompt, budget = self.fit_prompt(
+            "quiz",
+            contexts,
+            topic=topic,
+            role="assistant",
+            nbr_questions=len(plans),
+            angles=[angle for _, angle in plans]
+        )
+        # max_tokens s'entend par question : un lot de K questions dispose de K fois plus de tokens
+        response = self.generate(
+            prompt=prompt,
+            operation="quiz",
+            max_tokens=self.max_tokens * len(plans),
+            response_format={"type": "json_object"}
+        )
+        # La latence est propre au contexte de l'appel, les métriques sont donc calculées ici
+        metrics = self.metrics(response)
+        metrics["budget"] = budget
+        # Chaque question est validée individuellement : seules les invalides seront régénérées
+        parsed = self.parse_questions(response.choices[0].message.content)[:len(plans)]
+        questions = [q if self.is_valid_question(q) else None for q in parsed]
+        questions += [None] * (len(plans) - len(questions))
+        metrics["question_count"] = sum(1 for q in questions if q is not None)
+        metrics["invalid_count"] = len(plans) - metrics["question_count"]
+        return questions, metrics
+
+    @traced("quiz")
+    def generate_quizz_questions(self, topic: str, nbr_questions: int = 5, concurrency: int = None, batch_size: int = 1) -> List[Dict[str, Any]]:
+        """
+        Génère `nbr_questions` questions pour un topic en parallèle.
+
+        Chaque question reçoit à l'avance un chapitre du topic et un angle pédagogique
+        distincts (voir QUESTION_ANGLES), ce qui permet d'émettre les appels simultanément.
+        Avec `batch_size` > 1, chaque appel demande plusieurs questions en une seule
+        complétion, ce qui évite de renvoyer le prompt système et le contexte pour chaque question.
+
+        Les questions invalides (voir `validate_question`) et celles quasi identiques à la
+        banque du chapitre (ou à une question déjà acceptée) sont rejetées localement, et
+        seules celles-ci sont régénérées, avec un nouvel angle, au plus
+        `self.max_regeneration_rounds` fois.
+
+        Args:
+            topic (str): Le topic (thème) pour lequel générer les questions.
+            nbr_questions (int): Nombre de questions à générer.
+            concurrency (int, optionnel): Nombre maximal d'appels simultanés.
+                Par défaut `self.max_concurrency`; 1 pour une génération séquentielle.
+            batch_size (int): Nombre de questions demandées par appel. Par défaut 1.
+
+        Returns:
+            List[Dict[str, Any]]: Les questions valides, dans l'ordre de leur attribution
+                (les questions rejetées non remplacées sont écartées).
+
+        Raises:
+            Exception: L'erreur du dernier lot en échec, si aucune question n'a été produite.
+        """
+        annotate(topic=topic, questions=nbr_questions, batch_size=batch_size)
+        chapters = self.coursesdb.get_all_chapters_by_theme(theme=topic)
         
-        if not context_course_dict:
+        if not chapters:
             raise ValueError(f"Aucun contexte trouvé pour le topic '{topic}'.")
 
-        generated_questions = []
-        for i in range(nbr_questions):
-            print(f"Generating question {i}...")
-            idx = np.random.randint(0, len(context_course_dict))
-            context_course = list(context_course_dict.keys())[idx]
-
-            prompt = self.build_prompt(
-                context_course=[context_course],  # Expecting a List[str]
-                topic=topic, 
-                previous_questions=generated_questions, 
-                role="assistant"
-            )
-            response = self.generate(prompt=prompt)
-            metrics = self.metrics(response)
-            self.metrics_db.insert_metric(
-                input_tokens=metrics["prompt_tokens"],
-                output_tokens=metrics["completion_tokens"],
-                price_input=metrics["price_input"],
-                price_output=metrics["price_output"],
-                latency=metrics["latency"],
-                gwp=metrics["gwp"],
-                energy_usage=metrics["energy_usage"]
-            )
-            # Parse la question générée
-            new_question = self.parse_questions(response.choices[0].message.content)
-            # Si le parse retourne plusieurs questions, prendre la première
-            if new_question and isinstance(new_question, list):
-                generated_questions.append(new_question[0])
-            else:
-                # En cas d'erreur de format, on ajoute une question d'erreur pour éviter la répétition
-                generated_questions.append({
-                    "question": "Erreur de format lors de la génération de la question.",
-                    "options": [],
-                    "correct_index": -1,
-                    "explanation": "",
-                    "hint": ""
-                })
-        return generated_questions
+        # Attribution des chapitres et des angles avant de lancer les appels
+        random.shuffle(chapters)
+        angles = list(QUESTION_ANGLES)
+        random.shuffle(angles)
+        batch_size = max(1, batch_size)
+        deduplicator = QuestionDeduplicator(
+            self.quizdb.get_question_texts_by_chapter(topic), threshold=self.duplicate_threshold
+        )
+
+        slots: List[Dict[str, Any]] = [None] * nbr_questions
+        pending = list(range(nbr_questions))
+        errors: List[Exception] = []
+        for round_index in range(self.max_regeneration_rounds + 1):
+            # Chaque relance décale les angles pour éviter de reproduire le même doublon
+            plans = {
+                slot: (chapters[slot % len(chapters)], angles[(slot + round_index * nbr_questions) % len(angles)])
+                for slot in pending
+            }
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            workers = max(1, min(concurrency or self.max_concurrency, len(batches)))
+            print(f"Generating {len(pending)} questions in {len(batches)} calls with {workers} workers...")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # executor.map conserve l'ordre des lots ; propagate rattache les spans des lots au quiz
+                results = list(executor.map(
+                    propagate(lambda batch: self._generate_question_batch_safely(topic, [plans[slot] for slot in batch])),
+                    batches
+                ))
+
+            rejected = []
+            for batch, (questions, metrics) in zip(batches, results):
+                if isinstance(metrics, Exception):
+                    # Lot en échec (disjoncteur, échéance, limite de débit...) : ses questions sont relancées
+                    errors.append(metrics)
+                    rejected.extend(batch)
+                    continue
+                duplicates = 0
+                for slot, question in zip(batch, questions):
+                    if question is None:
+                        rejected.append(slot)
+                        continue
+                    if deduplicator.is_duplicate(question["question"]):
+                        duplicates += 1
+                        rejected.append(slot)
+                        continue
+                    slots[slot] = question
+                    deduplicator.add(question["question"])
+                self.record_metrics(
+                    metrics,
+                    question_count=metrics["question_count"],
+                    duplicate_count=duplicates,
+                    invalid_count=metrics["invalid_count"]
+                )
+            if not rejected:
+                break
+            print(f"{len(rejected)} invalid, near-duplicate or failed questions to regenerate.")
+            pending = rejected
+
+        questions = [question for question in slots if question is not None]
+        if not questions and errors:
+            raise errors[-1]
+        return questions
+
+    def _generate_question_batch_safely(self, topic: str, plans: List[tuple]) -> tuple:
+        """
+        Appelle `_generate_question_batch` ; en cas d'échec, retourne un lot de questions
+        vides et l'erreur à la place des métriques, pour que les autres lots du quiz soient conservés.
+        """
+        try:
+            return self._generate_question_batch(topic, plans)
+        except Exception as e:
+            print(f"Échec d'un lot de {len(plans)} question(s) sur '{topic}' : {type(e).__name__}: {e}")
+            return [None] * len(plans), e
+
+    def validate_question(self, question: Dict[str, Any]) -> List[str]:
+        """
+        Vérifie une question parsée : énoncé présent, quatre options non vides et distinctes,
+        index de réponse entier compris entre 0 et 3, explication et indice présents.
+
+        Returns:
+            List[str]: Les erreurs relevées (liste vide si la question est valide).
+        """
+        if not isinstance(question, dict):
+            return ["la question n'est pas un objet"]
+        errors = []
+        if not str(question.get("question") or "").strip():
+            errors.append("énoncé manquant")
+        options = question.get("options")
+        if not isinstance(options, list) or len(options) != 4:
+            errors.append("il faut exactement quatre options")
+        else:
+            normalized = [str(option or "").strip().casefold() for option in options]
+            if not all(normalized):
+                errors.append("option vide")
+            elif len(set(normalized)) != 4:
+                errors.append("options en double")
+        correct_index = question.get("correct_index")
+        if isinstance(correct_index, bool) or not isinstance(correct_index, int) or not 0 <= correct_index < 4:
+            errors.append("index de réponse invalide")
+        if not str(question.get("explanation") or "").strip():
+            errors.append("explication manquante")
+        if not str(question.get("hint") or "").strip():
+            errors.append("indice manquant")
+        return errors
+
+    def is_valid_question(self, question: Dict[str, Any]) -> bool:
+        """
+        Indique si une question parsée passe toutes les vérifications de `validate_question`.
+        """
+        return not self.validate_question(question)
             
        
     
-    def parse_questions(self,content: str) -> list:
+    @traced("parse_questions")
+    def parse_questions(self, content: str) -> list:
         """
         Parse le contenu généré par le modèle et extrait une liste de questions formatées.
-        
-        Chaque question doit suivre le format :
-            Question: [Votre question ici]
-            1. [Première option]
-            2. [Deuxième option]
-            3. [Troisième option]
-            4. [Quatrième option]
-            Correct Answer: [Numéro de l'option correcte]
-            Explanation: [Explication détaillée ici]
-            Hint: [Indice utile ici]
-            
+
+        Le format attendu est l'objet JSON demandé par `build_prompt` :
+            {"questions": [{"question": "...", "options": ["...", "...", "...", "..."],
+                            "correct_index": 0, "explanation": "...", "hint": "..."}]}
+        Une liste de questions, une question seule ou un bloc ```json sont aussi acceptés,
+        ainsi que l'ancien format texte (Question: / 1. / ... / Correct Answer: / Explanation: / Hint:).
+
         Args:
             content (str): Le texte contenant une ou plusieurs questions.
-            
+
         Returns:
             list: Une liste de dictionnaires avec les clés "question", "options",
-                "correct_index", "explanation" et "hint".
-                Si aucun format n'est détecté, une liste contenant un message d'erreur est retournée.
+                "correct_index", "explanation" et "hint", non validés (voir `validate_question`).
+                La liste est vide si aucun format n'est reconnu.
         """
+        text = (content or "").strip()
+        fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+        if fenced:
+            text = fenced.group(1).strip()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return self._parse_text_questions(text)
+        if isinstance(data, dict):
+            data = data.get("questions", [data])
+        if not isinstance(data, list):
+            return []
+        questions = []
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            correct_index = item.get("correct_index")
+            if isinstance(correct_index, str) and correct_index.strip().isdigit():
+                correct_index = int(correct_index)
+            questions.append({
+                "question": str(item.get("question") or "").strip(),
+                "options": [str(option).strip() for option in item.get("options") or []],
+                "correct_index": correct_index,
+                "explanation": str(item.get("explanation") or "").strip(),
+                "hint": str(item.get("hint") or "").strip()
+            })
+        return questions
+
+    def _parse_text_questions(self, content: str) -> list:
+        """Parse l'ancien format texte des questions (réponses générées avant le mode JSON)."""
         pattern = re.compile(
             r"Question:\s*(.*?)\s*\r?\n+"
             r"1\.\s*(.*?)\s*\r?\n+"
@@ -304,43 +964,33 @@ class RAGPipeline:
             r"Hint:\s*(.*?)(?:\r?\n|$)",
             re.DOTALL | re.IGNORECASE
         )
-        
         questions = []
         for match in pattern.finditer(content.strip()):
             question_text, opt1, opt2, opt3, opt4, correct_str, explanation, hint = match.groups()
-            correct_index = int(correct_str) - 1  # Passage en index 0-based
             questions.append({
                 "question": question_text.strip(),
                 "options": [opt1.strip(), opt2.strip(), opt3.strip(), opt4.strip()],
-                "correct_index": correct_index,
+                "correct_index": int(correct_str) - 1,  # Passage en index 0-based
                 "explanation": explanation.strip(),
                 "hint": hint.strip()
             })
-        
-        if not questions:
-            # Si aucun match n'est trouvé, retourner un message d'erreur
-            return [{
-                "question": "Format incorrect ou information incomplète.",
-                "options": [],
-                "correct_index": -1,
-                "explanation": "",
-                "hint": ""
-            }]
-        
         return questions
 
+    @traced("save_questions")
     def save_questions(self, questions: List[Dict[str, Any]], subject: str, chapter: str) -> None:
         """
         Enregistre les questions générées dans la base de données.
+        Les questions invalides (voir `validate_question`) sont écartées et ne sont jamais enregistrées.
         
         Args:
             questions (List[Dict[str, Any]]): Une liste de dictionnaires contenant les questions à enregistrer.
         """
         for question in questions:
-                # Récupère les options, et complète avec "N/A" si moins de 4 options sont disponibles.
-                options = question.get("options", [])
-                while len(options) < 4:
-                    options.append("N/A")
+                errors = self.validate_question(question)
+                if errors:
+                    print(f"Question ignorée ({', '.join(errors)}) : {question.get('question', '')[:80]}")
+                    continue
+                options = question["options"]
                 
                 self.quizdb.insert_question(
                     question_text=question["question"],
@@ -365,56 +1015,74 @@ class RAGPipeline:
         self.subjects = self.coursesdb.get_matiere()
         return self.subjects
     
-    def generate_brevet_quiz(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Génère un quiz type brevet avec exactement 20 questions par matière."""
-        brevet_quiz = {}
+    @traced("brevet")
+    def generate_brevet_quiz(self, questions_per_subject: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Génère un quiz type brevet avec exactement `questions_per_subject` questions par matière.
+
+        Les questions sont tirées au hasard directement dans SQLite, sans charger toute la
+        banque de la matière. Les questions manquantes des matières trop peu fournies sont
+        réparties entre les chapitres de la matière, générées simultanément pour toutes
+        les matières, enregistrées dès que chaque chapitre est prêt, puis tirées comme les
+        autres. Un chapitre en échec est ignoré : la matière est alors complétée avec les
+        questions disponibles.
+
+        Args:
+            questions_per_subject (int): Nombre de questions par matière. Par défaut 20.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Les questions de chaque matière, au format
+                de `QuizDatabase.get_all_questions_by_subject`.
+        """
         self.fetch_subjects()
-        for subject in self.subjects:
-            print(f"Generating questions for {subject}...")
-            questions = self.quizdb.get_all_questions_by_subject(subject)
-            print(f"Found {len(questions) if questions else 0} existing questions for {subject}")
-            
-            brevet_quiz[subject] = []
-            
-            # Si nous avons plus de 20 questions, en sélectionner 20 aléatoirement
-            if questions and len(questions) >= 20:
-                selected_questions = list(np.random.choice(questions, size=20, replace=False))
-                brevet_quiz[subject] = selected_questions
-                print(f"Selected 20 random questions from {len(questions)} existing questions for {subject}")
-            else:
-                # Ajouter toutes les questions existantes
-                existing_count = len(questions) if questions else 0
-                if existing_count > 0:
-                    brevet_quiz[subject].extend(questions)
-                    print(f"Added {existing_count} existing questions for {subject}")
-                
-                # Générer les questions manquantes
-                remaining = 20 - len(brevet_quiz[subject])
-                print(f"Need to generate {remaining} new questions for {subject}")
-                
-                while len(brevet_quiz[subject]) < 20:
-                    # Obtenir un chapitre aléatoire pour la matière
-                    topic = self.quizdb.get_random_topic_by_subject(subject)
-                    if not topic:
-                        print(f"No topics found for {subject}")
-                        break
-                    
-                    print(f"Generating questions for topic: {topic}")
-                    new_questions = self.generate_quizz_questions(topic, nbr_questions=min(5, 20 - len(brevet_quiz[subject])))
-                    
-                    if new_questions:
-                        # Ajouter les nouvelles questions
-                        brevet_quiz[subject].extend(new_questions)
-                        # Sauvegarder les nouvelles questions
-                        # self.save_questions(new_questions, subject=subject, chapter=topic)
-                        print(f"Generated {len(new_questions)} new questions for {subject}")
-            
-            # Vérification finale
-            if len(brevet_quiz[subject]) != 20:
-                print(f"Warning: Could only generate {len(brevet_quiz[subject])} questions for {subject} instead of 20")
-            else:
-                print(f"Successfully generated 20 questions for {subject}")
-        
+        sampled = {
+            subject: self.quizdb.sample_question_ids_by_subject(subject, questions_per_subject)
+            for subject in self.subjects
+        }
+
+        # Répartition des questions manquantes entre les chapitres de chaque matière
+        jobs = []
+        for subject, question_ids in sampled.items():
+            missing = questions_per_subject - len(question_ids)
+            if missing <= 0:
+                continue
+            chapters = self.coursesdb.get_themes_by_matiere(subject)
+            if not chapters:
+                print(f"No topics found for {subject}")
+                continue
+            random.shuffle(chapters)
+            chapters = chapters[:missing]
+            for i, chapter in enumerate(chapters):
+                jobs.append((subject, chapter, missing // len(chapters) + (1 if i < missing % len(chapters) else 0)))
+            print(f"Need to generate {missing} new questions for {subject}")
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(jobs))) as executor:
+                futures = {
+                    executor.submit(propagate(lambda job: self.generate_quizz_questions(job[1], nbr_questions=job[2])), job): job
+                    for job in jobs
+                }
+                # Chaque job est enregistré dès qu'il se termine, depuis le thread principal : l'échec
+                # d'un chapitre ne fait pas perdre les questions déjà générées (et payées) des autres
+                for future in as_completed(futures):
+                    subject, chapter, _ = futures[future]
+                    try:
+                        questions = future.result()
+                    except Exception as e:
+                        print(f"Échec de la génération des questions de {subject} / {chapter} : {type(e).__name__}: {e}")
+                        continue
+                    questions = [q for q in questions if self.is_valid_question(q)]
+                    if questions:
+                        self.save_questions(questions, subject=subject, chapter=chapter)
+            # Tirage parmi les questions enregistrées, quels que soient les jobs en échec
+            for subject in {subject for subject, _, _ in jobs}:
+                sampled[subject] = self.quizdb.sample_question_ids_by_subject(subject, questions_per_subject)
+
+        brevet_quiz = {}
+        for subject, question_ids in sampled.items():
+            brevet_quiz[subject] = self.quizdb.get_questions_by_ids(question_ids)
+            if len(brevet_quiz[subject]) != questions_per_subject:
+                print(f"Warning: Could only gather {len(brevet_quiz[subject])} questions for {subject} instead of {questions_per_subject}")
         return brevet_quiz
 
     def evaluate_brevet_performance(self, results: Dict[str, List[Dict[str, bool]]]) -> Dict[str, str]:
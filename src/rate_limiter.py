@@ -0,0 +1,252 @@
+# FILE: src/rate_limiter.py
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Tuple
+
+from src.sqlite_connections import connect
+
+# Priorités de la file d'attente : les valeurs basses passent en premier
+PRIORITIES = {
+    "interactive": 0,  # résumés, quiz demandés par un élève
+    "background": 1,   # réapprovisionnement des questions, pré-génération
+}
+
+
+class RateLimitTimeoutError(TimeoutError):
+    """Levée quand un appel attend son tour plus longtemps que `max_wait`."""
+
+
+class RateLimiter:
+    """
+    Limiteur de débit (requêtes/min et tokens/min) partagé par les threads et les
+    processus d'une même machine, précédé d'une file d'attente à priorités.
+
+    L'état des deux seaux à jetons (token buckets) et la file d'attente sont stockés
+    dans une base SQLite (mode WAL) et modifiés dans des transactions exclusives. Un
+    appelant prélève ses jetons si les seaux en contiennent assez pour lui et pour tous
+    les appels inscrits avant lui (priorité plus haute, puis plus ancien) : les appels
+    interactifs passent donc avant les appels d'arrière-plan de tous les processus, sans
+    que la file ne serve les appels un par un tant que la capacité suffit. Sans appel en
+    attente, `acquire` ne coûte qu'une transaction.
+
+    Les appelants du processus sont réveillés par une condition dès qu'un appel est servi,
+    quitte la file ou rend des tokens ; les changements venus d'autres processus sont
+    relus au plus tard toutes les `poll_interval` secondes. Chaque attente rafraîchit son
+    inscription, qui est purgée si son processus disparaît.
+
+    Les tokens d'un appel sont réservés à l'avance (prompt + max_tokens), puis ajustés
+    à la consommation réelle avec `settle`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "src/db/rate_limit.db",
+        requests_per_minute: float = 120,
+        tokens_per_minute: float = 500_000,
+        burst_seconds: float = 10.0,
+        poll_interval: float = 0.5,
+        waiter_ttl: float = 5.0
+    ) -> None:
+        self.db_path = db_path
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        # Capacité des seaux : le débit de `burst_seconds` secondes, au moins une requête
+        self.request_capacity = max(1.0, self.request_rate * burst_seconds)
+        self.token_capacity = max(1.0, self.token_rate * burst_seconds)
+        self.poll_interval = min(poll_interval, waiter_ttl / 2)
+        self.waiter_ttl = waiter_ttl
+        self._lock = threading.Lock()
+        # Signalée à chaque changement de la file ou des seaux fait par ce processus
+        self._changed = threading.Condition(self._lock)
+        self.conn = connect(self.db_path, busy_timeout=30)
+        self.conn.isolation_level = None  # Transactions explicites (BEGIN IMMEDIATE)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.create_tables()
+
+    def create_tables(self) -> None:
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT PRIMARY KEY,
+                    level REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_waiters (
+                    id TEXT PRIMARY KEY,
+                    priority INTEGER NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    tokens REAL NOT NULL DEFAULT 0
+                )
+            """)
+
+            def add_tokens_column() -> None:
+                # File créée avant la réservation de capacité pour les appels en attente
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(rate_waiters)")}
+                if "tokens" not in columns:
+                    self.conn.execute("ALTER TABLE rate_waiters ADD COLUMN tokens REAL NOT NULL DEFAULT 0")
+            self._transaction(add_tokens_column)
+            now = time.time()
+            self.conn.execute(
+                "INSERT OR IGNORE INTO rate_buckets (name, level, updated_at) VALUES ('requests', ?, ?), ('tokens', ?, ?)",
+                (self.request_capacity, now, self.token_capacity, now)
+            )
+
+    def _levels(self, now: float) -> Dict[str, float]:
+        """Niveau courant des seaux, remplis depuis leur dernière mise à jour (transaction ouverte)."""
+        rates = {"requests": (self.request_rate, self.request_capacity), "tokens": (self.token_rate, self.token_capacity)}
+        levels = {}
+        for name, level, updated_at in self.conn.execute("SELECT name, level, updated_at FROM rate_buckets"):
+            rate, capacity = rates[name]
+            levels[name] = min(capacity, level + max(0.0, now - updated_at) * rate)
+        return levels
+
+    def _store(self, levels: Dict[str, float], now: float) -> None:
+        for name, level in levels.items():
+            self.conn.execute("UPDATE rate_buckets SET level = ?, updated_at = ? WHERE name = ?", (level, now, name))
+
+    def acquire(self, tokens: int, priority: str = "interactive", max_wait: float = None) -> Dict[str, float]:
+        """
+        Attend son tour puis prélève une requête et `tokens` tokens.
+
+        Args:
+            tokens (int): Tokens réservés pour l'appel (prompt + max_tokens).
+            priority (str): "interactive" ou "background" (voir PRIORITIES).
+            max_wait (float, optionnel): Attente maximale, en secondes.
+
+        Returns:
+            Dict[str, float]: "wait" (secondes d'attente) et "queue_depth" (appels en
+                attente, tous processus confondus, à l'arrivée).
+
+        Raises:
+            RateLimitTimeoutError: Si l'attente dépasse `max_wait`.
+        """
+        tokens = min(float(tokens), self.token_capacity)
+        waiter = (PRIORITIES.get(priority, 0), time.time(), uuid.uuid4().hex)
+        start = waiter[1]
+        with self._lock:
+            delay, queue_depth = self._transaction(lambda: self._enqueue(waiter, tokens))
+            if delay == 0:
+                return {"wait": time.time() - start, "queue_depth": queue_depth}
+            try:
+                while True:
+                    if max_wait is not None and time.time() - start + delay > max_wait:
+                        raise RateLimitTimeoutError(f"Limite de débit : attente supérieure à {max_wait}s.")
+                    # Libère le verrou pendant l'attente ; réveillé par les autres appelants du processus
+                    self._changed.wait(min(delay, self.poll_interval))
+                    delay = self._transaction(lambda: self._try_take(waiter, tokens))
+                    if delay == 0:
+                        return {"wait": time.time() - start, "queue_depth": queue_depth}
+            except BaseException:
+                self._transaction(lambda: self.conn.execute("DELETE FROM rate_waiters WHERE id = ?", (waiter[2],)))
+                raise
+            finally:
+                # Servi ou parti : la capacité réservée pour cet appel est libérée pour les suivants
+                self._changed.notify_all()
+
+    def _enqueue(self, waiter: Tuple[int, float, str], tokens: float) -> Tuple[float, int]:
+        """
+        Sert l'appelant immédiatement si la capacité le permet, sinon l'inscrit dans la file
+        (transaction ouverte). Retourne l'attente estimée (0 si servi) et la profondeur de la file.
+        """
+        priority, now, waiter_id = waiter
+        self.conn.execute("DELETE FROM rate_waiters WHERE expires_at < ?", (now,))
+        queue_depth = self.conn.execute("SELECT COUNT(*) FROM rate_waiters").fetchone()[0]
+        delay = self._take(waiter, tokens, now)
+        if delay:
+            self.conn.execute(
+                "INSERT INTO rate_waiters (id, priority, enqueued_at, expires_at, tokens) VALUES (?, ?, ?, ?, ?)",
+                (waiter_id, priority, now, now + self.waiter_ttl, tokens)
+            )
+        return delay, queue_depth
+
+    def _try_take(self, waiter: Tuple[int, float, str], tokens: float) -> float:
+        """Nouvel essai d'un appelant inscrit (transaction ouverte) ; il quitte la file s'il est servi."""
+        now = time.time()
+        self.conn.execute("DELETE FROM rate_waiters WHERE expires_at < ?", (now,))
+        self.conn.execute("UPDATE rate_waiters SET expires_at = ? WHERE id = ?", (now + self.waiter_ttl, waiter[2]))
+        delay = self._take(waiter, tokens, now)
+        if delay == 0:
+            self.conn.execute("DELETE FROM rate_waiters WHERE id = ?", (waiter[2],))
+        return delay
+
+    def _take(self, waiter: Tuple[int, float, str], tokens: float, now: float) -> float:
+        """
+        Prélève les jetons si les seaux couvrent l'appelant et les appels inscrits avant lui ;
+        retourne l'attente estimée (0 si servi).
+        """
+        ahead_requests, ahead_tokens = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM rate_waiters WHERE (priority, enqueued_at, id) < (?, ?, ?)",
+            waiter
+        ).fetchone()
+        levels = self._levels(now)
+        needed_requests = ahead_requests + 1
+        needed_tokens = ahead_tokens + tokens
+        if levels["requests"] >= needed_requests and levels["tokens"] >= needed_tokens:
+            levels["requests"] -= 1
+            levels["tokens"] -= tokens
+            self._store(levels, now)
+            return 0
+        return max(
+            (needed_requests - levels["requests"]) / self.request_rate if levels["requests"] < needed_requests else 0,
+            (needed_tokens - levels["tokens"]) / self.token_rate if levels["tokens"] < needed_tokens else 0,
+        )
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """Rend (ou prélève) l'écart entre les tokens réservés et ceux réellement consommés."""
+        delta = min(float(reserved), self.token_capacity) - float(actual)
+        if not delta:
+            return
+
+        def adjust() -> None:
+            now = time.time()
+            levels = self._levels(now)
+            levels["tokens"] = min(self.token_capacity, levels["tokens"] + delta)
+            self._store(levels, now)
+        with self._lock:
+            self._transaction(adjust)
+            self._changed.notify_all()
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Nombre d'appels en attente par priorité, tous processus confondus."""
+        names = {value: name for name, value in PRIORITIES.items()}
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT priority, COUNT(*) FROM rate_waiters WHERE expires_at >= ? GROUP BY priority", (time.time(),)
+            ).fetchall()
+        return {names.get(priority, str(priority)): count for priority, count in rows}
+
+    def _transaction(self, fn):
+        """Exécute `fn` dans une transaction exclusive entre processus (verrou détenu)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn()
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return result
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> RateLimiter:
+    """
+    Retourne le limiteur partagé par toutes les instances de RAGPipeline du processus.
+    Les limites se règlent avec les variables d'environnement MISTRAL_REQUESTS_PER_MINUTE
+    et MISTRAL_TOKENS_PER_MINUTE.
+    """
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                requests_per_minute=float(os.getenv("MISTRAL_REQUESTS_PER_MINUTE", 120)),
+                tokens_per_minute=float(os.getenv("MISTRAL_TOKENS_PER_MINUTE", 500_000)),
+            )
+        return _default_limiter
@@ -0,0 +1,290 @@
+# FILE: src/resilience.py
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+# Codes HTTP pour lesquels une nouvelle tentative a des chances d'aboutir
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Levée quand le disjoncteur d'un modèle est ouvert : l'appel n'est pas tenté."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Levée quand l'échéance d'un appel est atteinte avant une réponse valide."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Indique si une erreur du fournisseur est transitoire : délai dépassé, limite de débit,
+    erreur serveur (5xx) ou de connexion. Les erreurs de requête (4xx) ne sont pas relancées.
+    """
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un modèle : après `failure_threshold` échecs consécutifs, les appels
+    sont refusés pendant `reset_timeout` secondes, puis un seul appel d'essai est
+    autorisé (demi-ouvert). Son succès referme le disjoncteur, son échec le rouvre.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Enregistre un échec ; retourne True si le disjoncteur vient de s'ouvrir."""
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+            self._trial_running = False
+            return self.opened_at is not None and not was_open
+
+
+class ResilientCaller:
+    """
+    Encadre les appels au fournisseur : échéance globale, délai par tentative, nouvelles
+    tentatives avec attente exponentielle aléatoire (full jitter) sur les erreurs
+    transitoires, disjoncteur par modèle et, en option, requête doublée (hedging).
+
+    Avec `hedge_after`, si une tentative n'a pas répondu après ce délai, une requête
+    identique est envoyée en parallèle et la première réponse est conservée ; l'autre
+    est annulée si elle n'a pas démarré, abandonnée sinon. La requête doublée passe par
+    le callback `on_hedge` de l'appel (réservation d'une place auprès du limiteur de
+    débit), et la réponse écartée est transmise à `on_discarded` une fois reçue, pour
+    que son coût soit compté.
+
+    Chaque événement (tentative, relance, erreur, requête doublée, annulation,
+    disjoncteur ouvert, échéance dépassée) est transmis au callback `on_event` de
+    l'appel, depuis le thread appelant.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 90.0,
+        attempt_timeout: float = 45.0,
+        hedge_after: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_workers: int = 32
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_workers = max_workers
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[model]
+
+    def open_models(self) -> List[str]:
+        """Modèles dont le disjoncteur est ouvert."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return [model for model, breaker in breakers.items() if breaker.state == "open"]
+
+    def call(
+        self,
+        fn: Callable[[float], Any],
+        model: str,
+        operation: str = "default",
+        on_event: Callable[[Dict[str, Any]], None] = None,
+        hedge: bool = True,
+        on_hedge: Callable[[], bool] = None,
+        on_discarded: Callable[[Optional[Any]], None] = None
+    ) -> Any:
+        """
+        Appelle `fn(timeout)` avec la politique de résilience du modèle.
+
+        Args:
+            fn (Callable): Appel au fournisseur, recevant le délai maximal de la tentative (s).
+            model (str): Modèle appelé (un disjoncteur par modèle).
+            operation (str): Opération de l'appel, reportée dans les événements.
+            on_event (Callable, optionnel): Reçoit chaque événement sous forme de dict
+                ("model", "operation", "event", "attempt", "elapsed", "error").
+            hedge (bool): Autorise la requête doublée pour cet appel (désactivée en streaming).
+            on_hedge (Callable, optionnel): Appelé avant l'envoi d'une requête doublée ;
+                s'il retourne False, elle n'est pas envoyée (événement "hedge_skipped").
+            on_discarded (Callable, optionnel): Reçoit la réponse de la requête écartée
+                (la plus lente des deux), ou None si elle a été annulée ou a échoué.
+
+        Returns:
+            Any: La réponse de la première tentative réussie.
+
+        Raises:
+            CircuitOpenError: Si le disjoncteur du modèle est ouvert.
+            DeadlineExceededError: Si l'échéance est atteinte.
+            Exception: La dernière erreur, si elle n'est pas transitoire ou si les tentatives sont épuisées.
+        """
+        start = time.time()
+
+        def emit(event: str, attempt: int = 0, error: Exception = None) -> None:
+            if on_event is not None:
+                on_event({
+                    "model": model,
+                    "operation": operation,
+                    "event": event,
+                    "attempt": attempt,
+                    "elapsed": time.time() - start,
+                    "error": f"{type(error).__name__}: {error}"[:300] if error is not None else None,
+                })
+
+        breaker = self.breaker(model)
+        last_error: Optional[Exception] = None
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = self.deadline - (time.time() - start)
+            if remaining <= 0:
+                emit("deadline_exceeded", attempt, last_error)
+                raise DeadlineExceededError(f"Échéance de {self.deadline}s dépassée pour {model}.") from last_error
+            if not breaker.allow():
+                emit("circuit_open", attempt)
+                raise CircuitOpenError(f"Disjoncteur ouvert pour {model}.")
+            timeout = min(self.attempt_timeout, remaining)
+            emit("attempt", attempt)
+            try:
+                response = self._attempt(fn, timeout, attempt, emit, hedge, on_hedge, on_discarded)
+            except Exception as e:
+                last_error = e
+                emit("error", attempt, e)
+                retryable = is_retryable(e)
+                if retryable and breaker.record_failure():
+                    emit("circuit_opened", attempt, e)
+                if not retryable:
+                    # Erreur de requête : le modèle n'est pas en cause
+                    breaker.record_success()
+                    raise
+                if attempt == self.max_attempts:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if time.time() - start + delay >= self.deadline:
+                    emit("deadline_exceeded", attempt, e)
+                    raise DeadlineExceededError(f"Échéance de {self.deadline}s dépassée pour {model}.") from e
+                emit("retry", attempt, e)
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return response
+        raise last_error
+
+    def _attempt(
+        self,
+        fn: Callable[[float], Any],
+        timeout: float,
+        attempt: int,
+        emit: Callable,
+        hedge: bool,
+        on_hedge: Callable[[], bool] = None,
+        on_discarded: Callable[[Optional[Any]], None] = None
+    ) -> Any:
+        """Une tentative, doublée après `hedge_after` secondes sans réponse si le hedging est actif."""
+        if not hedge or self.hedge_after is None or self.hedge_after >= timeout:
+            return fn(timeout)
+        executor = self._get_executor()
+        primary = executor.submit(fn, timeout)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        if on_hedge is not None and not on_hedge():
+            emit("hedge_skipped", attempt)
+            return primary.result()
+
+        emit("hedge", attempt)
+        hedged = executor.submit(fn, timeout - self.hedge_after)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is None:
+                error = next(iter(done)).exception()
+                continue
+            if winner is hedged:
+                emit("hedge_won", attempt)
+            for other in pending:
+                # Un appel déjà en cours ne peut pas être interrompu : sa réponse est ignorée
+                emit("cancelled" if other.cancel() else "abandoned", attempt)
+            if on_discarded is not None:
+                loser = primary if winner is hedged else hedged
+                loser.add_done_callback(lambda future: on_discarded(
+                    future.result() if not future.cancelled() and future.exception() is None else None
+                ))
+            return winner.result()
+        if on_discarded is not None:
+            on_discarded(None)
+        raise error
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+
+_default_caller = None
+_default_caller_lock = threading.Lock()
+
+
+def get_default_caller() -> ResilientCaller:
+    """
+    Retourne la politique de résilience partagée par le processus, afin que les
+    disjoncteurs de chaque modèle soient communs à toutes les instances de RAGPipeline.
+    """
+    global _default_caller
+    with _default_caller_lock:
+        if _default_caller is None:
+            _default_caller = ResilientCaller()
+        return _default_caller
@@ -0,0 +1,170 @@
+# FILE: src/retrieval.py
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Petit modèle multilingue (français), exécutable sur CPU
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class EmbeddingIndex:
+    """
+    Index vectoriel en mémoire des passages (morceaux) de cours.
+
+    Les embeddings sont normalisés et stockés dans une matrice NumPy float32 contiguë,
+    triée par thème : les passages d'un thème forment une tranche contiguë de la matrice,
+    et une requête top-n se résume à un seul produit matriciel sur cette tranche.
+    Les vecteurs sont persistés sur disque et ne sont recalculés que pour les passages
+    nouveaux ou modifiés.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        cache_path: Optional[str] = "src/db/course_embeddings.npz",
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        device: str = "cpu"
+    ) -> None:
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.device = device
+        self._encoder = encoder
+        # Le modèle est chargé une seule fois, même si plusieurs threads encodent en même temps
+        self._encoder_lock = threading.Lock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.passages: List[Dict[str, Any]] = []
+        self.theme_slices: Dict[str, Tuple[int, int]] = {}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._encoder is None:
+            with self._encoder_lock:
+                if self._encoder is None:
+                    # Import différé : sentence-transformers (et torch) sont lourds à charger
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(self.model_name, device=self.device)
+                    self._encoder = lambda batch: model.encode(
+                        batch, batch_size=32, convert_to_numpy=True, show_progress_bar=False
+                    )
+        vectors = np.asarray(self._encoder(texts), dtype=np.float32)
+        return _normalize(vectors)
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def build(self, passages: Sequence[Dict[str, Any]]) -> None:
+        """
+        Construit l'index à partir de passages {"id", "theme", "chapitre", "content"}.
+        Les vecteurs déjà calculés (même id, même contenu, même modèle) sont réutilisés.
+        """
+        passages = sorted(passages, key=lambda p: (p["theme"] or "", p["id"]))
+        hashes = [self._hash(p["content"] or "") for p in passages]
+        cached = self._load_cache()
+
+        missing = [i for i, (p, h) in enumerate(zip(passages, hashes)) if (p["id"], h) not in cached]
+        fresh_rows = {}
+        if missing:
+            fresh = self._encode([passages[i]["content"] or "" for i in missing])
+            fresh_rows = dict(zip(missing, fresh))
+        rows = [
+            fresh_rows[i] if i in fresh_rows else cached[(p["id"], h)]
+            for i, (p, h) in enumerate(zip(passages, hashes))
+        ]
+        vectors = np.stack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+        self.passages = list(passages)
+        self.ids = np.array([p["id"] for p in passages], dtype=np.int64)
+        self.vectors = np.ascontiguousarray(vectors)
+        self.theme_slices = {}
+        for i, p in enumerate(passages):
+            start, _ = self.theme_slices.get(p["theme"], (i, i))
+            self.theme_slices[p["theme"]] = (start, i + 1)
+        if missing:
+            self._save_cache(hashes)
+        print(f"Embedding index built: {len(passages)} passages ({len(missing)} encoded).")
+
+    def search(self, query: str, top_n: int = 1, theme: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Retourne les `top_n` passages les plus proches de la requête (similarité cosinus),
+        éventuellement restreints à un thème.
+        """
+        if theme is not None:
+            if theme not in self.theme_slices:
+                return []
+            start, end = self.theme_slices[theme]
+        else:
+            start, end = 0, len(self.passages)
+        if end <= start or top_n <= 0:
+            return []
+        matrix = self.vectors[start:end]  # vue, sans copie
+        scores = matrix @ self._encode([query])[0]
+        top_n = min(top_n, len(scores))
+        best = np.argpartition(-scores, top_n - 1)[:top_n]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), self.passages[start + i]) for i in best]
+
+    def _load_cache(self) -> Dict[Tuple[int, str], np.ndarray]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        data = np.load(self.cache_path, allow_pickle=False)
+        if str(data["model"]) != self.model_name:
+            return {}
+        return {
+            (int(i), str(h)): v for i, h, v in zip(data["ids"], data["hashes"], data["vectors"])
+        }
+
+    def _save_cache(self, hashes: List[str]) -> None:
+        if not self.cache_path:
+            return
+        np.savez(
+            self.cache_path,
+            model=np.array(self.model_name),
+            ids=self.ids,
+            hashes=np.array(hashes),
+            vectors=self.vectors,
+        )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# Intervalle minimal (secondes) entre deux vérifications du contenu des cours
+COURSE_INDEX_REFRESH_SECONDS = float(os.getenv("COURSE_INDEX_REFRESH_SECONDS", 60))
+
+_course_index = None
+_course_index_version = None
+_course_index_checked_at = 0.0
+_course_index_lock = threading.Lock()
+
+
+def get_course_index(coursesdb) -> EmbeddingIndex:
+    """
+    Retourne l'index des morceaux de cours partagé par le processus, construit au premier
+    appel après une mise à jour incrémentale de la table course_chunks.
+
+    Toutes les COURSE_INDEX_REFRESH_SECONDS secondes au plus, course_chunks est remise à
+    jour et l'index est reconstruit si les morceaux ont changé depuis sa construction (cours
+    modifiés, y compris par le redécoupage d'un chapitre avant son résumé) : seuls les
+    passages nouveaux ou modifiés sont alors encodés.
+    """
+    global _course_index, _course_index_version, _course_index_checked_at
+    with _course_index_lock:
+        now = time.monotonic()
+        if _course_index is not None and now - _course_index_checked_at < COURSE_INDEX_REFRESH_SECONDS:
+            return _course_index
+        _course_index_checked_at = now
+        coursesdb.sync_chunks()
+        version = coursesdb.get_chunks_version()
+        if _course_index is None or version != _course_index_version:
+            index = EmbeddingIndex()
+            index.build(coursesdb.get_all_chunks())
+            _course_index, _course_index_version = index, version
+        return _course_index
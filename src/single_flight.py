@@ -0,0 +1,227 @@
+# FILE: src/single_flight.py
+import contextvars
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.sqlite_connections import get_connection_manager
+
+
+class SQLiteLease:
+    """
+    Bail (lease) inter-processus stocké dans SQLite : un seul processus à la fois détient
+    le bail d'une clé, jusqu'à sa libération ou son expiration (`ttl`, en secondes).
+
+    Il étend la coalescence de SingleFlight aux différents processus Streamlit partageant
+    la même base : le processus qui n'obtient pas le bail attend sa libération, puis
+    relance l'appel, qui trouve alors la réponse dans le cache partagé.
+    """
+
+    def __init__(self, db_path: str = "src/db/llm_cache.db", poll_interval: float = 0.2) -> None:
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self.connections = get_connection_manager(self.db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread courant (voir src.sqlite_connections)."""
+        return self.connections.connection()
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        """Tente d'obtenir le bail d'une clé ; retourne False s'il est détenu par un autre processus."""
+        now = time.time()
+        conn = self.conn
+        conn.execute("DELETE FROM llm_leases WHERE key = ? AND expires_at < ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO llm_leases (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, self.owner, now + ttl)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def renew(self, key: str, ttl: float) -> bool:
+        """Prolonge le bail d'une clé détenu par ce processus ; retourne False s'il a été perdu."""
+        conn = self.conn
+        cursor = conn.execute(
+            "UPDATE llm_leases SET expires_at = ? WHERE key = ? AND owner = ?", (time.time() + ttl, key, self.owner)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def release(self, key: str) -> None:
+        conn = self.conn
+        conn.execute("DELETE FROM llm_leases WHERE key = ? AND owner = ?", (key, self.owner))
+        conn.commit()
+
+    def wait(self, key: str, timeout: float) -> None:
+        """Attend que le bail d'une clé soit libéré ou expiré, au plus `timeout` secondes."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            row = self.conn.execute(
+                "SELECT 1 FROM llm_leases WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+            if row is None:
+                return
+            time.sleep(self.poll_interval)
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Broadcast:
+    """Morceaux d'une réponse en streaming, diffusés à tous les lecteurs au fil de l'eau."""
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.condition = threading.Condition()
+
+    def follow(self) -> Iterator[str]:
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.parts) and not self.finished:
+                    self.condition.wait()
+                parts = self.parts[position:]
+                finished, error = self.finished, self.error
+            for part in parts:
+                yield part
+            position += len(parts)
+            if finished and position == len(self.parts):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Coalescence des requêtes identiques en cours : les appelants concurrents d'une même
+    clé attendent un unique appel (le premier arrivé, ou « leader ») et partagent son
+    résultat. La coalescence est en mémoire pour les threads du processus, et s'étend
+    aux autres processus via un bail optionnel (voir SQLiteLease).
+    """
+
+    def __init__(self, lease: Optional[SQLiteLease] = None, lease_ttl: float = 120.0) -> None:
+        self.lease = lease
+        self.lease_ttl = lease_ttl
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any], use_lease: bool = True) -> Tuple[Any, bool]:
+        """
+        Exécute `fn` une seule fois pour tous les appelants concurrents de `key`.
+
+        Args:
+            key (str): Clé de la requête (voir LLMResponseCache.make_key).
+            fn (Callable): Appel à effectuer.
+            use_lease (bool): Coalesce aussi entre processus. À réserver aux appels dont
+                le résultat est placé dans un cache partagé, que `fn` consulte d'abord.
+
+        Returns:
+            Tuple[Any, bool]: Le résultat, et True si l'appelant a effectué l'appel lui-même.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+        try:
+            call.result = self._with_lease(key, fn, use_lease)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, True
+
+    def stream(self, key: str, factory: Callable[[], Iterator[str]], use_lease: bool = True) -> Tuple[Iterator[str], bool]:
+        """
+        Variante de `do` pour les réponses en streaming : le flux du leader est lu par un
+        thread dédié et diffusé à tous les appelants, dont l'abandon n'interrompt pas la lecture.
+
+        Returns:
+            Tuple[Iterator[str], bool]: Les morceaux de la réponse, et True si l'appelant
+                a lancé l'appel lui-même.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._streams[key] = _Broadcast()
+        if leader:
+            # Le thread de lecture hérite du contexte de l'appelant (span courant, ...)
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._produce, key, factory, broadcast, use_lease),
+                name="single-flight-stream", daemon=True
+            ).start()
+        return broadcast.follow(), leader
+
+    def _produce(self, key: str, factory: Callable[[], Iterator[str]], broadcast: _Broadcast, use_lease: bool) -> None:
+        def run() -> None:
+            for part in factory():
+                with broadcast.condition:
+                    broadcast.parts.append(part)
+                    broadcast.condition.notify_all()
+        try:
+            self._with_lease(key, run, use_lease)
+        except BaseException as e:
+            broadcast.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with broadcast.condition:
+                broadcast.finished = True
+                broadcast.condition.notify_all()
+
+    def _with_lease(self, key: str, fn: Callable[[], Any], use_lease: bool) -> Any:
+        if self.lease is None or not use_lease:
+            return fn()
+        if not self.lease.acquire(key, self.lease_ttl):
+            # Un autre processus effectue l'appel : on attend qu'il ait rempli le cache
+            self.lease.wait(key, self.lease_ttl)
+            return fn()
+        try:
+            return fn()
+        finally:
+            self.lease.release(key)
+
+
+_default_single_flight = None
+_default_single_flight_lock = threading.Lock()
+
+
+def get_default_single_flight() -> SingleFlight:
+    """
+    Retourne la coalescence partagée par toutes les instances de RAGPipeline du processus,
+    avec un bail SQLite dans la base du cache des réponses.
+    """
+    global _default_single_flight
+    with _default_single_flight_lock:
+        if _default_single_flight is None:
+            _default_single_flight = SingleFlight(lease=SQLiteLease())
+        return _default_single_flight
@@ -0,0 +1,180 @@
+# FILE: src/sqlite_connections.py
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Dict, List, Tuple
+from urllib.request import pathname2url
+
+# Taille de la projection mémoire des bases (octets) : lectures sans copie dans le cache de pages
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def connect(
+    db_path: str,
+    read_only: bool = False,
+    busy_timeout: float = 5.0,
+    synchronous: str = "NORMAL",
+    mmap_size: int = DEFAULT_MMAP_SIZE
+) -> sqlite3.Connection:
+    """
+    Ouvre une connexion configurée pour un accès concurrent : attente de `busy_timeout`
+    secondes sur un verrou, `synchronous` (NORMAL suffit en mode WAL : une coupure de
+    courant peut perdre les dernières transactions, jamais corrompre la base) et
+    projection mémoire des lectures. Une connexion `read_only` refuse toute écriture.
+    """
+    if read_only:
+        uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    return conn
+
+
+class _Checkout:
+    """Connexion prêtée à un thread ; rendue au pool quand le thread se termine (voir ConnectionManager)."""
+
+    def __init__(self, conn: sqlite3.Connection, generation: int) -> None:
+        self.conn = conn
+        self.generation = generation
+
+
+class ConnectionManager:
+    """
+    Pool de connexions SQLite d'une base. Un thread reçoit une connexion à sa première
+    requête et la garde jusqu'à sa fin : les sessions Streamlit et les threads de
+    génération ne partagent pas une connexion (ni ses transactions en cours).
+
+    Streamlit exécute chaque interaction dans un nouveau thread : à la fin d'un thread, sa
+    connexion est rendue au pool (transaction en cours annulée) et reprise par le thread
+    suivant, au lieu d'être fermée puis rouverte. Au plus `max_idle` connexions inutilisées
+    sont conservées par rôle, les suivantes sont fermées.
+
+    La base passe en mode WAL à la première connexion : les lectures ne bloquent plus
+    les écritures, et inversement. `reader()` fournit une seconde connexion par thread,
+    en lecture seule, pour les tableaux de bord : leurs requêtes d'agrégation lisent un
+    instantané de la base pendant que les réponses continuent d'être enregistrées.
+
+    `close` ferme toutes les connexions (elles sont rouvertes à la demande).
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout: float = 5.0,
+        synchronous: str = "NORMAL",
+        mmap_size: int = DEFAULT_MMAP_SIZE,
+        max_idle: int = 8
+    ) -> None:
+        self.db_path = db_path
+        self.options = {"busy_timeout": busy_timeout, "synchronous": synchronous, "mmap_size": mmap_size}
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Connexions prêtées : id(connexion) -> (thread, rôle, connexion)
+        self._checked_out: Dict[int, Tuple[threading.Thread, str, sqlite3.Connection]] = {}
+        self._idle: Dict[str, List[sqlite3.Connection]] = {"writer": [], "reader": []}
+        # Incrémenté par `close` : les connexions prêtées aux threads sont alors périmées
+        self._generation = 0
+        self._wal_enabled = False
+        self.opened = 0
+        self.reused = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """Connexion en lecture-écriture du thread courant."""
+        return self._get("writer", read_only=False)
+
+    def reader(self) -> sqlite3.Connection:
+        """Connexion en lecture seule du thread courant."""
+        if not self._wal_enabled:
+            # La base (et le mode WAL) doivent exister avant une ouverture en lecture seule
+            self.connection()
+        return self._get("reader", read_only=True)
+
+    def _get(self, role: str, read_only: bool) -> sqlite3.Connection:
+        checkout = getattr(self._local, role, None)
+        if checkout is not None and checkout.generation == self._generation:
+            return checkout.conn
+        with self._lock:
+            self._reclaim_dead_threads()
+            generation = self._generation
+            conn = self._idle[role].pop() if self._idle[role] else None
+        if conn is None:
+            conn = connect(self.db_path, read_only=read_only, **self.options)
+            with self._lock:
+                if not read_only and not self._wal_enabled:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                    self._wal_enabled = True
+                self.opened += 1
+        else:
+            self.reused += 1
+        with self._lock:
+            self._checked_out[id(conn)] = (threading.current_thread(), role, conn)
+        checkout = _Checkout(conn, generation)
+        # Rendue au pool quand le thread se termine et que ses variables locales sont libérées
+        weakref.finalize(checkout, self._release, conn, generation)
+        setattr(self._local, role, checkout)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, generation: int) -> None:
+        with self._lock:
+            entry = self._checked_out.pop(id(conn), None)
+            if entry is None or entry[2] is not conn:
+                return  # Déjà rendue (ou fermée par `close`)
+            role = entry[1]
+            if generation == self._generation and len(self._idle[role]) < self.max_idle:
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._idle[role].append(conn)
+                    return
+                except sqlite3.Error:
+                    pass
+        conn.close()
+
+    def _reclaim_dead_threads(self) -> None:
+        """Rend au pool les connexions des threads terminés dont la libération n'a pas eu lieu (verrou détenu)."""
+        for key, (thread, role, conn) in list(self._checked_out.items()):
+            if thread.is_alive():
+                continue
+            del self._checked_out[key]
+            if len(self._idle[role]) < self.max_idle and not conn.in_transaction:
+                self._idle[role].append(conn)
+            else:
+                conn.close()
+
+    def open_connections(self) -> int:
+        """Nombre de connexions ouvertes (lecture-écriture et lecture seule, prêtées ou au repos)."""
+        with self._lock:
+            return len(self._checked_out) + sum(len(idle) for idle in self._idle.values())
+
+    def close(self) -> None:
+        with self._lock:
+            self._generation += 1
+            for _, _, conn in self._checked_out.values():
+                conn.close()
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._checked_out = {}
+            self._idle = {"writer": [], "reader": []}
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """
+    Retourne le gestionnaire de connexions d'une base, partagé par toutes les instances
+    qui l'ouvrent dans le processus (une connexion par thread et par base, pas par instance).
+    """
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = ConnectionManager(db_path)
+        return _managers[key]
@@ -0,0 +1,339 @@
+# FILE: src/telemetry.py
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bornes des histogrammes, en secondes
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Métrique étiquetée : une valeur par combinaison d'étiquettes, protégée par un verrou."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError("Un compteur ne peut que croître.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Jauge, fixée avec `set` ou calculée au moment de la lecture par `callback`, qui
+    retourne une valeur ou un dict {tuple d'étiquettes: valeur}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), callback: Callable[[], Any] = None) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception as e:
+                print(f"Jauge {self.name} indisponible : {e}")
+                return []
+            values = result if isinstance(result, dict) else {(): result}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if value is None:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = {key: ([*state[0]], state[1], state[2]) for key, state in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exposées, rendu au format texte de Prometheus."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Enregistre une métrique ; retourne la métrique existante de même nom, le cas échéant."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+LLM_CALLS = REGISTRY.register(Counter(
+    "wikillm_llm_calls_total", "Appels au modèle, par modèle, opération et origine de la réponse (provider, cache, coalesced).",
+    ("model", "operation", "source")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "wikillm_llm_tokens_total", "Tokens consommés, par modèle, opération et sens (input, output).",
+    ("model", "operation", "direction")))
+LLM_COST = REGISTRY.register(Counter(
+    "wikillm_llm_cost_dollars_total", "Coût des appels en dollars, par modèle et opération.", ("model", "operation")))
+LLM_ENERGY = REGISTRY.register(Counter(
+    "wikillm_llm_energy_kwh_total", "Énergie estimée par EcoLogits, en kWh.", ("model", "operation")))
+LLM_GWP = REGISTRY.register(Counter(
+    "wikillm_llm_gwp_kgco2e_total", "Potentiel de réchauffement estimé par EcoLogits, en kgCO2e.", ("model", "operation")))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "wikillm_llm_latency_seconds", "Latence des appels au modèle servis par le fournisseur.", ("model", "operation")))
+LLM_TTFT = REGISTRY.register(Histogram(
+    "wikillm_llm_ttft_seconds", "Délai avant le premier token des appels en streaming.", ("model", "operation")))
+LLM_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "wikillm_llm_rate_limit_wait_seconds", "Attente dans la file du limiteur de débit.", ("operation",), QUEUE_WAIT_BUCKETS))
+LLM_EVENTS = REGISTRY.register(Counter(
+    "wikillm_llm_events_total", "Événements de résilience (attempt, retry, error, hedge, circuit_opened, ...).",
+    ("model", "operation", "event")))
+QUESTIONS_GENERATED = REGISTRY.register(Counter(
+    "wikillm_questions_generated_total", "Questions de quiz produites, par issue (valid, duplicate, invalid).", ("outcome",)))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "wikillm_db_query_duration_seconds", "Durée des méthodes d'accès aux bases SQLite.", ("db", "method"), DB_QUERY_BUCKETS))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "wikillm_db_query_errors_total", "Méthodes d'accès aux bases SQLite terminées par une erreur.", ("db", "method")))
+QUIZ_ANSWERS = REGISTRY.register(Counter(
+    "wikillm_quiz_answers_total", "Réponses aux quiz enregistrées, par résultat.", ("correct",)))
+
+
+def observe_llm_call(metrics: Dict[str, Any], question_count: int = None, duplicate_count: int = None, invalid_count: int = None) -> None:
+    """Alimente les métriques à partir des métriques d'un appel (voir RAGPipeline.metrics)."""
+    budget = metrics.get("budget") or {}
+    model = metrics.get("model") or ""
+    operation = budget.get("operation") or ""
+    source = "cache" if metrics.get("cache_hit") else "coalesced" if metrics.get("coalesced") else "provider"
+    LLM_CALLS.inc(model=model, operation=operation, source=source)
+    LLM_TOKENS.inc(metrics.get("prompt_tokens") or 0, model=model, operation=operation, direction="input")
+    LLM_TOKENS.inc(metrics.get("completion_tokens") or 0, model=model, operation=operation, direction="output")
+    LLM_COST.inc((metrics.get("price_input") or 0) + (metrics.get("price_output") or 0), model=model, operation=operation)
+    LLM_ENERGY.inc(metrics.get("energy_usage") or 0, model=model, operation=operation)
+    LLM_GWP.inc(metrics.get("gwp") or 0, model=model, operation=operation)
+    if source == "provider":
+        LLM_LATENCY.observe(metrics.get("latency"), model=model, operation=operation)
+        LLM_TTFT.observe(metrics.get("ttft"), model=model, operation=operation)
+        LLM_QUEUE_WAIT.observe(metrics.get("queue_wait"), operation=operation)
+    if question_count:
+        QUESTIONS_GENERATED.inc(question_count, outcome="valid")
+    if duplicate_count:
+        QUESTIONS_GENERATED.inc(duplicate_count, outcome="duplicate")
+    if invalid_count:
+        QUESTIONS_GENERATED.inc(invalid_count, outcome="invalid")
+
+
+def timed_queries(db: str) -> Callable[[type], type]:
+    """
+    Décorateur de classe : chronomètre chaque méthode publique d'une classe d'accès à
+    une base (wikillm_db_query_duration_seconds, étiquetée par base et par méthode).
+    Les méthodes statiques et de classe ne sont pas instrumentées.
+    """
+    def decorate(cls: type) -> type:
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_") or not callable(attribute) or isinstance(attribute, (staticmethod, classmethod)):
+                continue
+            setattr(cls, name, _timed(attribute, db, name))
+        return cls
+    return decorate
+
+
+def _timed(method: Callable, db: str, name: str) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.inc(db=db, method=name)
+            raise
+        finally:
+            DB_QUERY_DURATION.observe(time.perf_counter() - start, db=db, method=name)
+    return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Pas de journal par requête de collecte
+        pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sert /metrics sur `host:port` depuis un thread en arrière-plan."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_textfile(path: str) -> None:
+    """Écrit les métriques dans un fichier du textfile collector de node_exporter (écriture atomique)."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(temporary, path)
+
+
+def _write_textfile_forever(path: str, interval: float) -> None:
+    while True:
+        try:
+            write_textfile(path)
+        except OSError as e:
+            print(f"Écriture des métriques dans {path} impossible : {e}")
+        time.sleep(interval)
+
+
+def _register_runtime_gauges() -> None:
+    """Jauges lues au moment de la collecte : file du limiteur de débit et disjoncteurs ouverts."""
+    from src.rate_limiter import PRIORITIES, get_default_limiter
+    from src.resilience import get_default_caller
+
+    def queue_depth() -> Dict[tuple, int]:
+        depth = get_default_limiter().queue_depth()
+        return {(priority,): depth.get(priority, 0) for priority in PRIORITIES}
+
+    REGISTRY.register(Gauge(
+        "wikillm_rate_limit_queue_depth", "Appels en attente dans la file du limiteur de débit, par priorité.",
+        ("priority",), callback=queue_depth))
+    REGISTRY.register(Gauge(
+        "wikillm_llm_circuit_open", "Nombre de modèles dont le disjoncteur est ouvert.",
+        callback=lambda: len(get_default_caller().open_models())))
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port: Optional[int] = None, textfile: Optional[str] = None, interval: float = None) -> None:
+    """
+    Démarre l'exposition des métriques, une seule fois par processus : serveur HTTP local
+    (`port`, ou la variable d'environnement METRICS_PORT) et/ou fichier pour le textfile
+    collector (`textfile`, ou METRICS_TEXTFILE, réécrit toutes les METRICS_TEXTFILE_INTERVAL
+    secondes, 15 par défaut). Sans port ni fichier, les métriques sont seulement collectées,
+    et un appel suivant peut encore démarrer l'exposition : les variables d'environnement
+    (fichier `.env`) doivent être chargées avant l'appel.
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        port = port if port is not None else int(os.getenv("METRICS_PORT", 0)) or None
+        textfile = textfile or os.getenv("METRICS_TEXTFILE")
+        if interval is None:
+            interval = float(os.getenv("METRICS_TEXTFILE_INTERVAL", 15))
+        if port is None and not textfile:
+            return
+        _register_runtime_gauges()
+        if port is not None:
+            try:
+                serve(port, os.getenv("METRICS_HOST", "127.0.0.1"))
+                print(f"Métriques Prometheus exposées sur le port {port} (/metrics).")
+                _exporter_started = True
+            except OSError as e:
+                # Port déjà pris, par exemple par un autre processus Streamlit
+                print(f"Exposition des métriques sur le port {port} impossible : {e}")
+        if textfile:
+            threading.Thread(
+                target=_write_textfile_forever, args=(textfile, interval), name="metrics-textfile", daemon=True
+            ).start()
+            _exporter_started = True
@@ -0,0 +1,98 @@
+# FILE: src/token_budget.py
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.chunking import count_tokens, truncate_to_tokens
+
+# Budgets d'entrée par opération, en tokens estimés localement (voir src.chunking.count_tokens)
+DEFAULT_INPUT_BUDGETS = {
+    "quiz": 1500,
+    "summary": 2500,
+    "default": 3000,
+}
+
+# En dessous de ce nombre de tokens disponibles, un passage n'est pas tronqué mais écarté
+MIN_TRUNCATED_TOKENS = 50
+
+
+class PromptBudgeter:
+    """
+    Ajuste le contexte d'un prompt à un budget de tokens d'entrée propre à chaque opération.
+
+    Le budget couvre l'ensemble du prompt : la partie fixe (consignes, format) est mesurée
+    en construisant le prompt sans contexte, et le reste est réparti entre les passages.
+    Les passages sont supposés triés du plus au moins pertinent. Dans l'ordre, le
+    budgeteur compresse les espaces, conserve les passages qui tiennent dans le budget,
+    puis tronque le premier passage qui dépasse s'il reste assez de place.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, token_counter: Callable[[str], int] = count_tokens) -> None:
+        self.budgets = dict(DEFAULT_INPUT_BUDGETS)
+        if budgets:
+            self.budgets.update(budgets)
+        self.count_tokens = token_counter
+
+    def budget_for(self, operation: str) -> int:
+        return self.budgets.get(operation, self.budgets["default"])
+
+    def prompt_tokens(self, prompt: List[Dict[str, str]]) -> int:
+        return sum(self.count_tokens(message["content"]) for message in prompt)
+
+    def fit(
+        self,
+        operation: str,
+        context: List[str],
+        build: Callable[[List[str]], List[Dict[str, str]]]
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Construit le prompt de l'opération en ajustant le contexte au budget.
+
+        Args:
+            operation (str): Nom de l'opération ("quiz", "summary", ...).
+            context (List[str]): Passages de contexte, du plus au moins pertinent.
+            build (Callable): Fonction construisant le prompt à partir d'une liste de passages.
+
+        Returns:
+            Tuple: Le prompt ajusté et la décision du budgeteur ("operation", "budget",
+                "tokens_before", "tokens_after", "action", "tokens_dropped"), où "action"
+                vaut "none", "compress", "select" ou "truncate".
+        """
+        budget = self.budget_for(operation)
+        tokens_before = self.prompt_tokens(build(context))
+        action = "none"
+        fitted = context
+
+        if tokens_before > budget:
+            action = "compress"
+            fitted = [re.sub(r"\s+", " ", passage).strip() for passage in context]
+            available = budget - self.prompt_tokens(build([]))
+            kept = []
+            for passage in fitted:
+                size = self.count_tokens(passage)
+                if size <= available:
+                    kept.append(passage)
+                    available -= size
+                    continue
+                action = "select"
+                if available >= MIN_TRUNCATED_TOKENS:
+                    kept.append(truncate_to_tokens(passage, available))
+                    action = "truncate"
+                break
+            fitted = kept
+
+        prompt = build(fitted)
+        tokens_after = self.prompt_tokens(prompt)
+        # Les séparateurs ajoutés entre passages par `build` peuvent encore dépasser le budget
+        while tokens_after > budget and fitted:
+            last = truncate_to_tokens(fitted[-1], self.count_tokens(fitted[-1]) - (tokens_after - budget))
+            fitted = fitted[:-1] + ([last] if last else [])
+            prompt = build(fitted)
+            tokens_after = self.prompt_tokens(prompt)
+        return prompt, {
+            "operation": operation,
+            "budget": budget,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "action": action,
+            "tokens_dropped": tokens_before - tokens_after,
+        }
@@ -0,0 +1,251 @@
+# FILE: src/tracing.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Span courant du contexte (thread, ou copie de contexte propagée à un thread de travail)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("wikillm_span", default=None)
+
+
+class Span:
+    """
+    Étape chronométrée d'un traitement. Les spans ouverts pendant un autre span en sont
+    les enfants ; un span sans parent démarre une nouvelle trace.
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "start_time",
+                 "duration", "error", "_start", "_token", "_parent", "otel_span")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self._parent = _current_span.get()
+        self.trace_id = self._parent.trace_id if self._parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = self._parent.span_id if self._parent is not None else None
+        self.start_time = 0.0
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.otel_span: Any = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        self.tracer.on_start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.error = f"{exc_type.__name__}: {exc}"[:300]
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Générateur terminé dans un autre contexte que celui où il a démarré
+            _current_span.set(self._parent)
+        self.tracer.on_end(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+            "thread": threading.current_thread().name,
+        }
+
+
+class _NoopSpan:
+    """Span inerte retourné quand le traçage est désactivé : aucune allocation ni horloge."""
+
+    __slots__ = ()
+    duration = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    """Écrit chaque span terminé sur une ligne JSON d'un fichier (ajout)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+
+class MemoryExporter:
+    """Conserve les spans terminés en mémoire (benchmarks, diagnostic)."""
+
+    def __init__(self) -> None:
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span) -> None:
+        pass
+
+    def on_end(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span.to_dict())
+
+
+class OpenTelemetryExporter:
+    """
+    Reproduit les spans dans OpenTelemetry (paquet `opentelemetry-api`, optionnel), avec
+    le fournisseur de traces configuré par l'application ou l'auto-instrumentation.
+    """
+
+    def __init__(self, service_name: str = "wikillm") -> None:
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(service_name)
+
+    def on_start(self, span: Span) -> None:
+        parent = span._parent.otel_span if span._parent is not None else None
+        context = self._trace.set_span_in_context(parent) if parent is not None else None
+        span.otel_span = self._tracer.start_span(span.name, context=context, start_time=int(span.start_time * 1e9))
+
+    def on_end(self, span: Span) -> None:
+        if span.otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool, int, float)):
+                span.otel_span.set_attribute(key, value)
+        if span.error is not None:
+            span.otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        span.otel_span.end(end_time=int((span.start_time + span.duration) * 1e9))
+
+
+class Tracer:
+    """Point d'entrée du traçage : désactivé (aucun coût notable) tant qu'aucun exportateur n'est ajouté."""
+
+    def __init__(self) -> None:
+        self.exporters: List[Any] = []
+        self.enabled = False
+
+    def add_exporter(self, exporter: Any) -> None:
+        self.exporters.append(exporter)
+        self.enabled = True
+
+    def clear(self) -> None:
+        self.enabled = False
+        self.exporters = []
+
+    def on_start(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.on_start(span)
+
+    def on_end(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.on_end(span)
+            except Exception as e:
+                print(f"Export du span {span.name} impossible : {e}")
+
+
+TRACER = Tracer()
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """
+    Ouvre un span, à utiliser avec `with` :
+
+        with span("llm.call", model=model) as s:
+            ...
+            s.set_attribute("tokens", n)
+    """
+    if not TRACER.enabled:
+        return _NOOP_SPAN
+    return Span(TRACER, name, attributes)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Décorateur : exécute la fonction dans un span `name`."""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with Span(TRACER, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Retourne `func` exécutée dans une copie du contexte courant, pour que les spans ouverts
+    dans un thread de travail (ThreadPoolExecutor, ...) restent rattachés à leur parent.
+    Chaque appel utilise sa propre copie : les variables de contexte qu'il modifie ne
+    fuient pas vers les autres appels.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def configure_tracing(jsonl_path: str = None, otel: bool = False) -> None:
+    """
+    Active les exportateurs demandés : fichier JSON lines et/ou OpenTelemetry. Sans
+    `opentelemetry-api` installé, l'export OpenTelemetry est ignoré avec un avertissement.
+    """
+    if jsonl_path:
+        TRACER.add_exporter(JsonlExporter(jsonl_path))
+    if otel:
+        try:
+            TRACER.add_exporter(OpenTelemetryExporter())
+        except ImportError:
+            print("opentelemetry-api n'est pas installé : export OpenTelemetry des spans désactivé.")
+
+
+def configure_tracing_from_env() -> None:
+    """Active le traçage selon TRACE_JSONL (chemin du fichier) et TRACE_OTEL=1."""
+    configure_tracing(jsonl_path=os.getenv("TRACE_JSONL"), otel=os.getenv("TRACE_OTEL") == "1")
+
+
+def annotate(**attributes: Any) -> None:
+    """Ajoute des attributs au span courant (sans effet si le traçage est désactivé)."""
+    if not TRACER.enabled:
+        return
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)